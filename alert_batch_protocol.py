@@ -0,0 +1,118 @@
+from collections import OrderedDict
+import struct
+import numpy as np
+
+# --- Compact binary alert batch format (POST body of the batch endpoint) ---
+# Header (12 bytes, little-endian): magic 'GSAB' | version u8 | reserved u8 | record_count u16 | boot_id u32
+#                                   (version 1 batches have the 8-byte header without boot_id, read as boot 0)
+# Record (24 bytes, little-endian): sequence u32 | device_time_ms u32 (millis()) | event_code u8 | 3 pad bytes
+#                                   | window mean of ax, ay, az as float32
+# boot_id is drawn at random (esp_random()) on every boot and sequences restart at 0, so the server tracks
+# sequences per (device, boot) and devices sharing an address (NAT) do not share a counter.
+# Matches this C layout on the ESP32:
+#   struct __attribute__((packed)) AlertRecord { uint32_t seq; uint32_t t_ms; uint8_t code; uint8_t pad[3]; float mean[3]; };
+class AlertBatchProtocol:
+    BATCH_MAGIC = b'GSAB'
+    ACK_MAGIC = b'GSAK'
+    VERSION = 2
+    SUPPORTED_VERSIONS = (1, 2)
+    MAX_RECORDS_PER_BATCH = 1024
+    # Without a boot_id (version 1 firmware, boot 0), a batch starting at sequence 0 below the highest acknowledged
+    # sequence, or lying more than this far below it, is a restarted counter rather than a retransmission
+    SEQUENCE_RESET_GAP = 4 * MAX_RECORDS_PER_BATCH
+    # Event codes carried by the records, mapped to the event_type names used by the GET endpoint
+    EVENT_CODE_NAMES = {1: 'TremorDetected_DT_V3'}
+
+BATCH_HEADER = struct.Struct('<4sBBH')
+BATCH_BOOT_ID = struct.Struct('<I') # Follows BATCH_HEADER from version 2 on
+ACK_PAYLOAD = struct.Struct('<4sBHI') # magic | status (0 = ok) | records accepted | highest sequence acknowledged
+ALERT_RECORD_DTYPE = np.dtype([
+    ('sequence', '<u4'),
+    ('device_time_ms', '<u4'),
+    ('event_code', 'u1'),
+    ('padding', 'V3'),
+    ('window_mean', '<f4', (3,)),
+])
+
+def decode_alert_batch(payload):
+    """
+    Returns (boot_id, alert_records), the records as a structured array view of the payload (no per-field parsing).
+    Raises ValueError.
+    """
+    if len(payload) < BATCH_HEADER.size:
+        raise ValueError("Batch payload shorter than its header")
+    batch_magic, batch_version, _, record_count = BATCH_HEADER.unpack_from(payload)
+    if batch_magic != AlertBatchProtocol.BATCH_MAGIC or batch_version not in AlertBatchProtocol.SUPPORTED_VERSIONS:
+        raise ValueError(f"Unsupported batch format {batch_magic!r} v{batch_version}")
+    if record_count > AlertBatchProtocol.MAX_RECORDS_PER_BATCH:
+        raise ValueError(f"Batch of {record_count} records exceeds the limit of {AlertBatchProtocol.MAX_RECORDS_PER_BATCH}")
+    header_size = BATCH_HEADER.size if batch_version == 1 else BATCH_HEADER.size + BATCH_BOOT_ID.size
+    if len(payload) != header_size + record_count * ALERT_RECORD_DTYPE.itemsize:
+        raise ValueError(f"Batch length {len(payload)} does not match {record_count} records")
+    boot_id = 0 if batch_version == 1 else BATCH_BOOT_ID.unpack_from(payload, BATCH_HEADER.size)[0]
+    return boot_id, np.frombuffer(payload, dtype=ALERT_RECORD_DTYPE, count=record_count, offset=header_size)
+
+def encode_alert_batch(sequences, device_times_ms, event_codes, window_means, boot_id=0):
+    """Builds a batch payload (used by simulators and tests; the firmware fills the same packed struct)."""
+    alert_records = np.zeros(len(sequences), dtype=ALERT_RECORD_DTYPE)
+    alert_records['sequence'] = sequences
+    alert_records['device_time_ms'] = device_times_ms
+    alert_records['event_code'] = event_codes
+    alert_records['window_mean'] = window_means
+    batch_header = BATCH_HEADER.pack(AlertBatchProtocol.BATCH_MAGIC, AlertBatchProtocol.VERSION, 0, len(alert_records)) + BATCH_BOOT_ID.pack(boot_id)
+    return batch_header + alert_records.tobytes()
+
+def build_batch_ack(accepted_records, highest_sequence, status=0):
+    return ACK_PAYLOAD.pack(AlertBatchProtocol.ACK_MAGIC, status, accepted_records, highest_sequence)
+
+def event_name_for_code(event_code):
+    return AlertBatchProtocol.EVENT_CODE_NAMES.get(int(event_code), f"EventCode_{int(event_code)}")
+
+class DeviceSequenceTracker:
+    """
+    Remembers the highest sequence number acknowledged per device so retransmitted batches (e.g. after a lost ack)
+    are not counted twice, and counts sequence gaps. device_id should include the boot id, so a rebooted device
+    (counter back at 0) starts a fresh history; for devices without a boot id, restarted counters are detected
+    instead (detect_counter_resets, see AlertBatchProtocol.SEQUENCE_RESET_GAP). Bounded to max_devices (least
+    recently seen evicted first).
+    """
+    def __init__(self, max_devices=100000):
+        self.max_devices = max_devices
+        self.highest_sequence = OrderedDict()
+        self.duplicate_records = 0
+        self.missing_records = 0
+        self.sequence_resets = 0
+
+    def filter_new_records(self, device_id, alert_records, detect_counter_resets=False):
+        """
+        Returns the records not seen before for this device and updates its highest sequence. Without
+        detect_counter_resets, every record at or below the highest sequence is a duplicate.
+        """
+        batch_size = len(alert_records)
+        record_sequences = alert_records['sequence'].astype(np.int64)
+        unique_sequences, first_positions = np.unique(record_sequences, return_index=True)
+        if len(unique_sequences) < batch_size: # Repeated sequence numbers within the batch: keep the first record
+            alert_records = alert_records[np.sort(first_positions)]
+            record_sequences = alert_records['sequence'].astype(np.int64)
+
+        previous_highest = self.highest_sequence.get(device_id)
+        if detect_counter_resets and previous_highest is not None and len(unique_sequences) and unique_sequences[-1] < previous_highest and (
+                unique_sequences[0] == 0 or unique_sequences[-1] < previous_highest - AlertBatchProtocol.SEQUENCE_RESET_GAP):
+            self.sequence_resets += 1
+            previous_highest = None
+        if previous_highest is None:
+            new_records = alert_records
+        else:
+            new_records = alert_records[record_sequences > previous_highest]
+        self.duplicate_records += batch_size - len(new_records)
+        if len(new_records) == 0:
+            return new_records
+
+        new_sequences = np.sort(new_records['sequence'].astype(np.int64))
+        expected_next = new_sequences[0] if previous_highest is None else previous_highest + 1
+        self.missing_records += int(new_sequences[-1] - expected_next + 1 - len(new_sequences))
+        self.highest_sequence[device_id] = int(new_sequences[-1])
+        self.highest_sequence.move_to_end(device_id)
+        while len(self.highest_sequence) > self.max_devices:
+            self.highest_sequence.popitem(last=False)
+        return new_records
@@ -0,0 +1,110 @@
+from collections import OrderedDict, deque, namedtuple
+import time
+
+# --- Configuration for Fleet-Wide Alert Correlation ---
+class AlertCorrelationConfig:
+    # Repeated alerts of one device within this window are collapsed into the first one
+    DUPLICATE_WINDOW_MS = 3000
+    # A device sending more than RATE_LIMIT_MAX_ALERTS alerts within RATE_LIMIT_WINDOW_MS is flapping and rate limited
+    RATE_LIMIT_WINDOW_MS = 60000
+    RATE_LIMIT_MAX_ALERTS = 20
+    # A fleet event is raised when FLEET_EVENT_MIN_DEVICES distinct devices alert within FLEET_EVENT_WINDOW_MS
+    FLEET_EVENT_MIN_DEVICES = 5
+    FLEET_EVENT_WINDOW_MS = 2000
+    FLEET_EVENT_COOLDOWN_MS = 10000 # No second fleet event is raised for the same quake within this period
+    # Memory bounds: devices idle for DEVICE_IDLE_EVICTION_MS (or beyond MAX_TRACKED_DEVICES) are forgotten
+    DEVICE_IDLE_EVICTION_MS = 10 * 60 * 1000
+    MAX_TRACKED_DEVICES = 100000
+
+CorrelationDecision = namedtuple('CorrelationDecision', ['action', 'fleet_event'])
+FleetEvent = namedtuple('FleetEvent', ['detected_at_ms', 'device_count', 'window_ms', 'device_ips'])
+
+ACTION_FORWARD = 'forward'           # First alert of a burst: log/notify it
+ACTION_DUPLICATE = 'duplicate'       # Collapsed into a recent alert of the same device
+ACTION_RATE_LIMITED = 'rate_limited' # Device is flapping: suppressed
+
+class _DeviceAlertState:
+    __slots__ = ('recent_alert_ms', 'last_forwarded_ms', 'collapsed_alerts', 'limited_alerts')
+
+    def __init__(self, ring_size):
+        self.recent_alert_ms = deque(maxlen=ring_size) # Ring buffer of the device's latest alert times
+        self.last_forwarded_ms = None
+        self.collapsed_alerts = 0
+        self.limited_alerts = 0
+
+class AlertCorrelationEngine:
+    """
+    In-memory correlation of alerts across the fleet. process_alert() costs amortized O(1):
+    per-device ring buffers answer the duplicate and rate-limit checks, and an insertion-ordered map of the
+    devices seen within FLEET_EVENT_WINDOW_MS gives the distinct-device count of the sliding window.
+    Memory is bounded by MAX_TRACKED_DEVICES (least recently active devices are evicted first).
+    """
+    def __init__(self, config_obj=AlertCorrelationConfig, clock_ms=None):
+        self.config = config_obj
+        self.clock_ms = clock_ms or (lambda: time.monotonic() * 1000.0)
+        self.device_states = OrderedDict()   # device -> _DeviceAlertState, least recently active first
+        self.fleet_window = OrderedDict()    # device -> last alert time within the fleet window, oldest first
+        self.fleet_cooldown_until_ms = float('-inf')
+        self.fleet_events_raised = 0
+        self.evicted_devices = 0
+
+    def _get_device_state(self, device_id):
+        device_state = self.device_states.get(device_id)
+        if device_state is None:
+            device_state = _DeviceAlertState(self.config.RATE_LIMIT_MAX_ALERTS + 1)
+            self.device_states[device_id] = device_state
+        else:
+            self.device_states.move_to_end(device_id)
+        return device_state
+
+    def _evict_idle_devices(self, now_ms):
+        idle_limit_ms = now_ms - self.config.DEVICE_IDLE_EVICTION_MS
+        while self.device_states:
+            oldest_device_id, oldest_state = next(iter(self.device_states.items()))
+            too_many = len(self.device_states) > self.config.MAX_TRACKED_DEVICES
+            if not too_many and oldest_state.recent_alert_ms[-1] >= idle_limit_ms:
+                break
+            del self.device_states[oldest_device_id]
+            self.evicted_devices += 1
+
+    def _update_fleet_window(self, device_id, now_ms):
+        """Slides the fleet window and returns a FleetEvent when enough distinct devices are alerting."""
+        self.fleet_window[device_id] = now_ms
+        self.fleet_window.move_to_end(device_id)
+        window_start_ms = now_ms - self.config.FLEET_EVENT_WINDOW_MS
+        while next(iter(self.fleet_window.values())) < window_start_ms or len(self.fleet_window) > self.config.MAX_TRACKED_DEVICES:
+            self.fleet_window.popitem(last=False)
+
+        if len(self.fleet_window) < self.config.FLEET_EVENT_MIN_DEVICES or now_ms < self.fleet_cooldown_until_ms:
+            return None
+        self.fleet_cooldown_until_ms = now_ms + self.config.FLEET_EVENT_COOLDOWN_MS
+        self.fleet_events_raised += 1
+        return FleetEvent(now_ms, len(self.fleet_window), self.config.FLEET_EVENT_WINDOW_MS, list(self.fleet_window))
+
+    def process_alert(self, device_id, now_ms=None):
+        """Classifies one alert (forward, duplicate or rate_limited) and reports a fleet event when one starts."""
+        now_ms = self.clock_ms() if now_ms is None else now_ms
+        device_state = self._get_device_state(device_id)
+        device_state.recent_alert_ms.append(now_ms)
+        self._evict_idle_devices(now_ms)
+
+        ring = device_state.recent_alert_ms
+        if len(ring) == ring.maxlen and now_ms - ring[0] <= self.config.RATE_LIMIT_WINDOW_MS:
+            # More than RATE_LIMIT_MAX_ALERTS alerts inside the window: flapping sensor, kept out of fleet detection
+            device_state.limited_alerts += 1
+            return CorrelationDecision(ACTION_RATE_LIMITED, None)
+
+        fleet_event = self._update_fleet_window(device_id, now_ms)
+        if device_state.last_forwarded_ms is not None and now_ms - device_state.last_forwarded_ms < self.config.DUPLICATE_WINDOW_MS:
+            device_state.collapsed_alerts += 1
+            return CorrelationDecision(ACTION_DUPLICATE, fleet_event)
+        device_state.last_forwarded_ms = now_ms
+        return CorrelationDecision(ACTION_FORWARD, fleet_event)
+
+    @property
+    def tracked_devices(self):
+        return len(self.device_states)
+
+    @property
+    def devices_in_fleet_window(self):
+        return len(self.fleet_window)
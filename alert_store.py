@@ -0,0 +1,198 @@
+import argparse
+import datetime
+import queue
+import sqlite3
+import threading
+import time
+
+# --- Configuration for the Persistent Alert Store ---
+class AlertStoreConfig:
+    DATABASE_PATH = "alert_history.db"
+    FLUSH_INTERVAL_S = 0.05      # Longest time an alert waits in memory before its batch is committed
+    FLUSH_BATCH_SIZE = 1000      # Alerts committed together in one transaction (group commit)
+    MAX_PENDING_ALERTS = 100000  # Alerts queued for the writer; beyond this new alerts are counted as dropped
+    WRITE_RETRY_DELAY_S = 0.5    # Pause before the single retry of a batch whose commit failed (e.g. database locked)
+
+ALERT_TABLE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS alerts (
+    alert_id INTEGER PRIMARY KEY,
+    received_at_us INTEGER NOT NULL,
+    device_ip TEXT NOT NULL,
+    event_type TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_alerts_time ON alerts (received_at_us);
+CREATE INDEX IF NOT EXISTS idx_alerts_device_time ON alerts (device_ip, received_at_us);
+CREATE INDEX IF NOT EXISTS idx_alerts_event_time ON alerts (event_type, received_at_us);
+"""
+
+def current_epoch_us():
+    return time.time_ns() // 1000
+
+def format_epoch_us(epoch_us):
+    return datetime.datetime.fromtimestamp(epoch_us / 1e6).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+
+def _open_connection(database_path):
+    connection = sqlite3.connect(database_path, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")   # Readers never block the writer thread
+    connection.execute("PRAGMA synchronous=NORMAL") # Durable at each checkpoint, one fsync per batch at most
+    return connection
+
+class AlertStore:
+    """
+    Durable alert history in SQLite. record_alert() only enqueues, so request handlers never wait on disk;
+    a background writer commits alerts in batches (one transaction per FLUSH_BATCH_SIZE alerts or per
+    FLUSH_INTERVAL_S). Queries use indexes on time, device IP and event type.
+    """
+    def __init__(self, config_obj=AlertStoreConfig):
+        self.config = config_obj
+        self.pending_alerts = queue.Queue(maxsize=config_obj.MAX_PENDING_ALERTS)
+        self.dropped_alerts = 0
+        self.committed_alerts = 0
+        self.committed_batches = 0
+        self.failed_alerts = 0
+        self._flush_requests = []
+        self._flush_lock = threading.Lock()
+        self._stop_requested = threading.Event()
+
+        writer_connection = _open_connection(config_obj.DATABASE_PATH)
+        writer_connection.executescript(ALERT_TABLE_SCHEMA)
+        writer_connection.commit()
+        self._reader_connection = _open_connection(config_obj.DATABASE_PATH)
+        self._reader_lock = threading.Lock()
+        self._writer_thread = threading.Thread(target=self._run_writer, args=(writer_connection,), name="alert-store-writer", daemon=True)
+        self._writer_thread.start()
+
+    def record_alert(self, device_ip, event_type, received_at_us=None):
+        """Queues an alert for the writer. Returns False (and counts a drop) when the queue is full."""
+        try:
+            self.pending_alerts.put_nowait((received_at_us or current_epoch_us(), device_ip, event_type))
+            return True
+        except queue.Full:
+            self.dropped_alerts += 1
+            return False
+
+    @property
+    def queue_depth(self):
+        return self.pending_alerts.qsize()
+
+    def _collect_batch(self):
+        """Blocks for the first alert, then gathers more until the batch is full or the flush interval ends."""
+        try:
+            batch = [self.pending_alerts.get(timeout=self.config.FLUSH_INTERVAL_S)]
+        except queue.Empty:
+            return []
+        batch_deadline = time.monotonic() + self.config.FLUSH_INTERVAL_S
+        while len(batch) < self.config.FLUSH_BATCH_SIZE:
+            remaining_seconds = batch_deadline - time.monotonic()
+            try:
+                if remaining_seconds <= 0:
+                    batch.append(self.pending_alerts.get_nowait())
+                else:
+                    batch.append(self.pending_alerts.get(timeout=remaining_seconds))
+            except queue.Empty:
+                break
+        return batch
+
+    def _insert_batch(self, writer_connection, batch):
+        with writer_connection: # One transaction per batch = group commit
+            writer_connection.executemany(
+                "INSERT INTO alerts (received_at_us, device_ip, event_type) VALUES (?, ?, ?)", batch
+            )
+
+    def _commit_batch(self, writer_connection, batch):
+        """Commits one batch, retrying it once. A batch that still fails is counted as failed, never fatal."""
+        try:
+            self._insert_batch(writer_connection, batch)
+        except sqlite3.Error as first_error:
+            print(f"Warning: Alert store could not commit {len(batch)} alerts ({first_error}). Retrying once.")
+            time.sleep(self.config.WRITE_RETRY_DELAY_S)
+            try:
+                self._insert_batch(writer_connection, batch)
+            except sqlite3.Error as retry_error:
+                self.failed_alerts += len(batch)
+                print(f"ERROR: Alert store lost {len(batch)} alerts ({retry_error}). {self.failed_alerts} lost so far.")
+                return
+        self.committed_alerts += len(batch)
+        self.committed_batches += 1
+
+    def _run_writer(self, writer_connection):
+        try:
+            while True:
+                with self._flush_lock:
+                    waiting_flushes, self._flush_requests = self._flush_requests, []
+                batch = self._collect_batch()
+                if batch:
+                    self._commit_batch(writer_connection, batch)
+                if self.pending_alerts.empty():
+                    for flush_done in waiting_flushes:
+                        flush_done.set()
+                elif waiting_flushes:
+                    with self._flush_lock:
+                        self._flush_requests.extend(waiting_flushes) # Still draining: answer on a later pass
+                if self._stop_requested.is_set() and self.pending_alerts.empty():
+                    break
+        finally:
+            writer_connection.close()
+
+    def flush(self, timeout=10.0):
+        """Waits until every alert queued before this call has been committed."""
+        flush_done = threading.Event()
+        with self._flush_lock:
+            self._flush_requests.append(flush_done)
+        return flush_done.wait(timeout)
+
+    def close(self):
+        self._stop_requested.set()
+        self._writer_thread.join(timeout=30)
+        with self._reader_lock:
+            self._reader_connection.close()
+
+    def _query(self, sql, parameters):
+        with self._reader_lock:
+            return self._reader_connection.execute(sql, parameters).fetchall()
+
+    def alerts_since(self, seconds_back, now_us=None, event_type=None, limit=10000):
+        """Fleet-wide alerts of the last seconds_back seconds, newest first (index range scan on time)."""
+        since_us = (now_us or current_epoch_us()) - int(seconds_back * 1e6)
+        if event_type is None:
+            return self._query(
+                "SELECT received_at_us, device_ip, event_type FROM alerts WHERE received_at_us >= ? "
+                "ORDER BY received_at_us DESC LIMIT ?", (since_us, limit))
+        return self._query(
+            "SELECT received_at_us, device_ip, event_type FROM alerts WHERE event_type = ? AND received_at_us >= ? "
+            "ORDER BY received_at_us DESC LIMIT ?", (event_type, since_us, limit))
+
+    def device_history(self, device_ip, limit=100):
+        """Most recent alerts of one device, newest first (index scan on device IP + time)."""
+        return self._query(
+            "SELECT received_at_us, device_ip, event_type FROM alerts WHERE device_ip = ? "
+            "ORDER BY received_at_us DESC LIMIT ?", (device_ip, limit))
+
+def execute_alert_history_query():
+    parser = argparse.ArgumentParser(description="Query the persistent alert history.")
+    parser.add_argument('--db', default=AlertStoreConfig.DATABASE_PATH)
+    subcommands = parser.add_subparsers(dest='command', required=True)
+    recent_parser = subcommands.add_parser('recent', help="fleet-wide alerts of the last N seconds")
+    recent_parser.add_argument('seconds', type=float)
+    recent_parser.add_argument('--event-type')
+    device_parser = subcommands.add_parser('device', help="alert history of one device")
+    device_parser.add_argument('device_ip')
+    device_parser.add_argument('--limit', type=int, default=100)
+    arguments = parser.parse_args()
+
+    class QueryConfig(AlertStoreConfig):
+        DATABASE_PATH = arguments.db
+    alert_store = AlertStore(QueryConfig)
+    try:
+        if arguments.command == 'recent':
+            alert_rows = alert_store.alerts_since(arguments.seconds, event_type=arguments.event_type)
+        else:
+            alert_rows = alert_store.device_history(arguments.device_ip, arguments.limit)
+        for received_at_us, device_ip, event_type in alert_rows:
+            print(f"[{format_epoch_us(received_at_us)}] {device_ip}  {event_type}")
+        print(f"{len(alert_rows)} alerts.")
+    finally:
+        alert_store.close()
+
+if __name__ == '__main__':
+    execute_alert_history_query()
@@ -0,0 +1,44 @@
+// --- Generated by scripts/tree_export.py: do not edit by hand, re-run the export after retraining ---
+// Model version: c84ef752 (CRC-32 of the model blob served by the alert server)
+#pragma once
+#include <stdint.h>
+#include <math.h>
+
+const uint32_t DETECTOR_MODEL_VERSION = 0xc84ef752u;
+const int DETECTOR_MODEL_FEATURE_COUNT = 32;
+// Feature order: 0:mean_accel_x, 1:std_accel_x, 2:var_accel_x, 3:min_accel_x, 4:max_accel_x, 5:ptp_accel_x, 6:energy_accel_x, 7:mav_accel_x, 8:mean_accel_y, 9:std_accel_y, 10:var_accel_y, 11:min_accel_y, 12:max_accel_y, 13:ptp_accel_y, 14:energy_accel_y, 15:mav_accel_y, 16:mean_accel_z, 17:std_accel_z, 18:var_accel_z, 19:min_accel_z, 20:max_accel_z, 21:ptp_accel_z, 22:energy_accel_z, 23:mav_accel_z, 24:mean_svm, 25:std_svm, 26:var_svm, 27:min_svm, 28:max_svm, 29:ptp_svm, 30:energy_svm, 31:mav_svm
+const float detector_scaler_means[32] = {10.2188654f, 2.28296651f, 10.2002389f, 5.22562478f, 18.9872882f, 13.7616634f, 5740.88573f, 10.2326841f, 0.294102176f, 0.931166737f, 1.66920908f, -1.65741119f, 3.62482139f, 5.28223258f, 89.9179683f, 0.718459371f, -2.2534099f, 1.24075164f, 2.92679911f, -6.87506484f, 0.911825237f, 7.78689007f, 404.036775f, 2.41622221f, 10.642563f, 2.36730343f, 11.2005034f, 6.55009465f, 20.4363556f, 13.886261f, 6234.84047f, 10.642563f};
+const float detector_scaler_scales[32] = {0.438480895f, 2.23345087f, 13.3798154f, 4.70485023f, 9.60728868f, 13.5294253f, 904.700635f, 0.435118665f, 0.206528936f, 0.895621339f, 2.23530918f, 1.66032869f, 3.86593248f, 5.19538032f, 119.171246f, 0.497462706f, 0.275826422f, 1.17785164f, 3.80559178f, 5.26900775f, 3.13734484f, 7.75847094f, 212.970046f, 0.272811785f, 0.481829072f, 2.36566647f, 15.4506686f, 3.43805079f, 11.0820431f, 13.913231f, 1188.02728f, 0.481829072f};
+
+// Decision tree: 5 nodes, depth 2. Leaves have feature -1.
+// Thresholds are rounded down to float so that `feature <= threshold` decides exactly like the trained model.
+const int DETECTOR_TREE_NODE_COUNT = 5;
+const int16_t detector_tree_features[5] = {15, 8, -1, -1, -1};
+const float detector_tree_thresholds[5] = {-0.707403898f, -0.0476378091f, 0.0f, 0.0f, 0.0f};
+const int16_t detector_tree_left[5] = {1, 2, 2, 3, 4};
+const int16_t detector_tree_right[5] = {4, 3, 2, 3, 4};
+const int16_t detector_tree_classes[5] = {0, 0, 0, 1, 1};
+
+// Expects standardized features (see detector_scaler_means/detector_scaler_scales).
+inline int detector_tree_predict(const float* scaled_features) {
+    int node = 0;
+    while (detector_tree_features[node] >= 0) {
+        node = (scaled_features[detector_tree_features[node]] <= detector_tree_thresholds[node]) ? detector_tree_left[node] : detector_tree_right[node];
+    }
+    return detector_tree_classes[node];
+}
+
+// Computes and standardizes only the features the tree reads (8:mean_accel_y, 15:mav_accel_y);
+// the other entries of scaled_features are not written. Replaces computing all features + standardizing them.
+inline void detector_compute_scaled_features(const float* ax, const float* ay, const float* az, int count, float* scaled_features) {
+    float sum_ay = 0.0f;
+    float absolute_sum_ay = 0.0f;
+    for (int i = 0; i < count; i++) {
+        const float value_ay = ay[i];
+        sum_ay += value_ay;
+        absolute_sum_ay += fabsf(value_ay);
+    }
+    const float mean_ay = sum_ay / count;
+    scaled_features[8] = ((mean_ay) - detector_scaler_means[8]) / detector_scaler_scales[8];
+    scaled_features[15] = ((absolute_sum_ay / count) - detector_scaler_means[15]) / detector_scaler_scales[15];
+}
@@ -4,12 +4,50 @@
 
 Adafruit_MPU6050 mpu;
 
+// Modo de saída: 0 = linhas ASCII "Ax,Ay,Az,EventMarker" a 50 Hz (padrão);
+// 1 = frames binários (scripts/sensor_frame_protocol.py) a BINARY_SAMPLE_RATE_HZ, para coletas de 500 Hz - 1 kHz.
+// No modo binário use DataCollectorConfig.SERIAL_FRAME_FORMAT = 'binary' e SERIAL_BAUD_RATE = 921600.
+#define BINARY_FRAME_MODE 0
+#define BINARY_SERIAL_BAUD_RATE 921600
+#define BINARY_SAMPLE_RATE_HZ 1000
+
+#if BINARY_FRAME_MODE
+// Frame de 24 bytes, little-endian; o CRC-16/CCITT-FALSE cobre os bytes de seq até reserved
+struct __attribute__((packed)) SampleFrame {
+  uint8_t sync[2];   // 0xAA 0x55
+  uint16_t seq;      // Contador de frames (o coletor detecta lacunas por ele)
+  uint32_t t_us;     // micros() da leitura
+  float accel[3];    // m/s^2
+  uint8_t marker;    // 0 = normal, 1 = início, 2 = fim
+  uint8_t reserved;
+  uint16_t crc;
+};
+
+SampleFrame frame = {{0xAA, 0x55}, 0, 0, {0.0f, 0.0f, 0.0f}, 0, 0, 0};
+uint32_t nextSampleMicros = 0;
+
+uint16_t crc16_ccitt(const uint8_t* data, size_t length) {
+  uint16_t crc = 0xFFFF;
+  for (size_t i = 0; i < length; i++) {
+    crc ^= (uint16_t)data[i] << 8;
+    for (int bit = 0; bit < 8; bit++) {
+      crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : (crc << 1);
+    }
+  }
+  return crc;
+}
+#endif
+
 // Marcadores de Evento. Estes serão enviados UMA VEZ quando o comando correspondente for recebido.
 volatile int eventMarker = 0; // 0 = Nenhum, 1 = Início de Evento, 2 = Fim de Evento
 volatile bool sendMarkerFlag = false;
 
 void setup(void) {
+#if BINARY_FRAME_MODE
+  Serial.begin(BINARY_SERIAL_BAUD_RATE);
+#else
   Serial.begin(115200);
+#endif
   while (!Serial) {
     delay(10);
   }
@@ -23,12 +61,22 @@ void setup(void) {
   Serial.println("MPU6050 Encontrado!");
 
   mpu.setAccelerometerRange(MPU6050_RANGE_8_G);
+#if BINARY_FRAME_MODE
+  Wire.setClock(400000); // I2C rápido: a leitura do MPU6050 cabe em 1 ms
+  mpu.setFilterBandwidth(MPU6050_BAND_260_HZ); // Filtro de 21 Hz anularia a taxa maior (o modelo atual foi treinado a 50 Hz / 21 Hz)
+#else
   mpu.setFilterBandwidth(MPU6050_BAND_21_HZ);
+#endif
 
   Serial.println("\nESP32 Pronto para Coleta de Dados com Marcadores.");
   Serial.println("Aguardando comandos ('b'=begin event, 'e'=end event) via Serial...");
   Serial.println("Formato da saída de dados: Ax,Ay,Az,EventMarker (0=normal, 1=inicio, 2=fim)");
   Serial.println("----------------------------------------------------");
+#if BINARY_FRAME_MODE
+  // Texto até aqui é ignorado pelo coletor (não forma frames válidos)
+  Serial.flush();
+  nextSampleMicros = micros();
+#endif
 }
 
 void loop() {
@@ -38,18 +86,42 @@ void loop() {
       case 'b': // Comando para INÍCIO de evento
         eventMarker = 1;
         sendMarkerFlag = true;
+#if !BINARY_FRAME_MODE
         Serial.println("INFO: Marcador INÍCIO de evento recebido.");
+#endif
         break;
       case 'e': // Comando para FIM de evento
         eventMarker = 2;
         sendMarkerFlag = true;
+#if !BINARY_FRAME_MODE
         Serial.println("INFO: Marcador FIM de evento recebido.");
+#endif
         break;
       // O comando 's' (stop) será gerenciado pelo script Python, 
       // que simplesmente parará de ler da serial ou fechará a porta.
     }
   }
 
+#if BINARY_FRAME_MODE
+  // Amostragem por micros() (delay() em ms não permite 1 kHz estável); o marcador vai no próprio frame
+  while ((int32_t)(micros() - nextSampleMicros) < 0) {
+  }
+  nextSampleMicros += 1000000UL / BINARY_SAMPLE_RATE_HZ;
+
+  sensors_event_t a, g, temp;
+  mpu.getEvent(&a, &g, &temp);
+
+  frame.t_us = micros();
+  frame.accel[0] = a.acceleration.x;
+  frame.accel[1] = a.acceleration.y;
+  frame.accel[2] = a.acceleration.z;
+  frame.marker = sendMarkerFlag ? eventMarker : 0;
+  sendMarkerFlag = false;
+  eventMarker = 0;
+  frame.crc = crc16_ccitt((const uint8_t*)&frame.seq, 20);
+  Serial.write((const uint8_t*)&frame, sizeof(frame));
+  frame.seq++;
+#else
   sensors_event_t a, g, temp;
   mpu.getEvent(&a, &g, &temp);
 
@@ -69,4 +141,5 @@ void loop() {
   }
   
   delay(20); // Taxa de amostragem de 50Hz
+#endif
 } 
\ No newline at end of file
@@ -0,0 +1,108 @@
+from collections import namedtuple
+import os
+import pickle
+import sys
+import threading
+import zipfile
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts")) # Model code shared with the training scripts
+from flat_tree import FlatDecisionTree
+from model_blob import ModelBlobFormat, encode_model_blob, read_model_blob_version
+from window_inference import WindowClassifier
+
+# --- Configuration of the served model (hot reload and OTA distribution) ---
+class ModelRegistryConfig:
+    MODEL_PATH = "decision_tree_parametros/decision_tree_flat.npz" # .npz written by tree_export.py, or a .pkl tree (+ SCALER_PATH)
+    SCALER_PATH = "decision_tree_parametros/feature_scaler.pkl"
+    RELOAD_CHECK_INTERVAL_S = 2.0 # The model files are polled for changes this often (0 disables hot reload)
+
+# Everything a request needs about the served model, built once per load
+ServedModel = namedtuple('ServedModel', ['window_classifier', 'blob_bytes', 'model_version', 'etag', 'blob_headers', 'file_signature'])
+
+def _file_signature(file_paths):
+    file_stats = [os.stat(file_path) for file_path in file_paths]
+    return tuple((file_stat.st_mtime_ns, file_stat.st_size) for file_stat in file_stats)
+
+def load_served_model(model_path, scaler_path, file_signature=None):
+    """Loads the classifier and precomputes the OTA blob of the same model with its ETag and response headers."""
+    if model_path.endswith(".npz"):
+        window_classifier = WindowClassifier.from_flat_model_file(model_path)
+    else:
+        window_classifier = WindowClassifier.from_pickle_files(model_path, scaler_path)
+    tree_model = window_classifier.tree_model
+    flat_tree = tree_model if isinstance(tree_model, FlatDecisionTree) else FlatDecisionTree.from_sklearn(tree_model)
+    blob_bytes = encode_model_blob(flat_tree, window_classifier.scaler_means, window_classifier.scaler_scales)
+    model_version = read_model_blob_version(blob_bytes)
+    etag = f'"{ModelBlobFormat.VERSION}-{model_version:08x}"' # Same model, same tag: re-exports do not make devices download again
+    blob_headers = (("ETag", etag), ("Cache-Control", "no-cache"), ("X-Model-Version", f"{model_version:08x}"))
+    return ServedModel(window_classifier, blob_bytes, model_version, etag, blob_headers, file_signature)
+
+class ModelRegistry:
+    """
+    The model the server classifies with and distributes to devices. Each load publishes one immutable ServedModel
+    (classifier, blob, ETag), so a request that reads `current` once sees a consistent model and serving the blob
+    costs no work. A background thread polls the model files and reloads them when they change; if the new files
+    cannot be loaded, the failure is logged once and the previous model keeps being served. Reloads never touch
+    connections or queued requests.
+    """
+    def __init__(self, config_obj=ModelRegistryConfig, log_line=print):
+        self.config = config_obj
+        self.log_line = log_line
+        self.current = None
+        self.reload_count = 0
+        self.reload_listeners = [] # Called with each newly loaded ServedModel, before it is published
+        self._failed_signature = None
+        self._stop_requested = threading.Event()
+        self._watcher_thread = None
+
+    @property
+    def model_paths(self):
+        if self.config.MODEL_PATH.endswith(".npz"):
+            return [self.config.MODEL_PATH]
+        return [self.config.MODEL_PATH, self.config.SCALER_PATH]
+
+    def add_reload_listener(self, reload_listener):
+        self.reload_listeners.append(reload_listener)
+
+    def load(self):
+        """Loads the model files if they changed since the served model was loaded. Returns True when a new model is served."""
+        try:
+            file_signature = _file_signature(self.model_paths)
+        except OSError as e:
+            file_signature = ("missing", str(e))
+            if file_signature != self._failed_signature:
+                self.log_line(f"Warning: Model file not available ({e}).")
+                self._failed_signature = file_signature
+            return False
+        if (self.current is not None and file_signature == self.current.file_signature) or file_signature == self._failed_signature:
+            return False
+        try:
+            served_model = load_served_model(self.config.MODEL_PATH, self.config.SCALER_PATH, file_signature)
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile, pickle.UnpicklingError, ImportError) as e:
+            kept_model = f"still serving version {self.current.model_version:08x}" if self.current is not None else "no model served"
+            self.log_line(f"Warning: Model '{self.config.MODEL_PATH}' could not be loaded ({e}); {kept_model}.")
+            self._failed_signature = file_signature
+            return False
+
+        previous_model = self.current
+        for reload_listener in self.reload_listeners: # Listeners first: a request that sees the new model finds them updated
+            reload_listener(served_model)
+        self.current = served_model
+        self._failed_signature = None
+        if previous_model is not None:
+            self.reload_count += 1
+            self.log_line(f"Model reloaded from '{self.config.MODEL_PATH}': version {previous_model.model_version:08x} -> {served_model.model_version:08x}")
+        return True
+
+    def _watch_model_files(self):
+        while not self._stop_requested.wait(self.config.RELOAD_CHECK_INTERVAL_S):
+            self.load()
+
+    def start_watching(self):
+        if self.config.RELOAD_CHECK_INTERVAL_S > 0 and self._watcher_thread is None:
+            self._watcher_thread = threading.Thread(target=self._watch_model_files, name="model-reload-watcher", daemon=True)
+            self._watcher_thread.start()
+
+    def stop_watching(self):
+        self._stop_requested.set()
+        if self._watcher_thread is not None:
+            self._watcher_thread.join(timeout=5)
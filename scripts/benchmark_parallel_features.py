@@ -0,0 +1,79 @@
+import argparse
+import io
+import contextlib
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from feature_extractor import FeatureExtractorConfig, FeatureEngineeringPipeline
+
+# --- Scaling benchmark for the process-pool segment corpus mode ---
+class ParallelBenchmarkConfig:
+    NUM_SEGMENTS = 2000
+    SEGMENT_ROWS_RANGE = (150, 600) # Rows per synthetic segment (50 Hz -> 3 to 12 s events)
+    RANDOM_SEED = 42
+
+def write_synthetic_segment_corpus(corpus_dir, num_segments, rows_range, random_seed):
+    """Writes per-segment CSVs shaped like dataset_segments/ (no_tremor/ and tremor/ subdirectories, same columns)."""
+    rng = np.random.default_rng(random_seed)
+    for label_dir_name in ('no_tremor', 'tremor'):
+        os.makedirs(os.path.join(corpus_dir, label_dir_name), exist_ok=True)
+    for segment_number in range(num_segments):
+        label_value = segment_number % 2
+        num_rows = int(rng.integers(*rows_range))
+        shake_amplitude = 2.5 if label_value else 0.05
+        segment_df = pd.DataFrame({
+            'timestamp_pc': pd.Timestamp('2025-06-04T19:22:05') + pd.to_timedelta(np.arange(num_rows) * 20, unit='ms'),
+            'accel_x': 10.2 + rng.normal(0, shake_amplitude, num_rows),
+            'accel_y': 0.25 + rng.normal(0, shake_amplitude, num_rows),
+            'accel_z': -2.2 + rng.normal(0, shake_amplitude, num_rows),
+        })
+        label_dir_name = 'tremor' if label_value else 'no_tremor'
+        segment_df.to_csv(os.path.join(corpus_dir, label_dir_name, f"segment_label_{label_value}_{segment_number:06d}.csv"), index=False)
+
+def time_segment_corpus_run(corpus_dir, output_csv, num_workers, cache_dir=None):
+    """Times one corpus run. With cache_dir (an empty directory) the default cold-cache path is measured: reading and hashing happen in the workers."""
+    fe_config = FeatureExtractorConfig()
+    fe_config.USE_SEGMENT_CORPUS = True
+    fe_config.USE_FEATURE_CACHE = cache_dir is not None
+    fe_config.FEATURE_CACHE_DIR = cache_dir
+    fe_config.SEGMENTS_ROOT_DIR = corpus_dir
+    fe_config.FINAL_FEATURES_CSV = output_csv
+    fe_config.NUM_WORKERS = num_workers
+    start_time = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        FeatureEngineeringPipeline(fe_config).run_feature_generation()
+    return time.perf_counter() - start_time
+
+def execute_parallel_scaling_benchmark():
+    parser = argparse.ArgumentParser(description="Measure how the segment corpus feature extraction scales with worker processes.")
+    parser.add_argument('--segments', type=int, default=ParallelBenchmarkConfig.NUM_SEGMENTS)
+    parser.add_argument('--workers', type=int, nargs='*', help="worker counts to time (default: 1, 2, 4, ... up to the CPU count)")
+    parser.add_argument('--no-cache', action='store_true', help="run without the feature cache (default: a cold cache per run)")
+    arguments = parser.parse_args()
+
+    cpu_count = os.cpu_count() or 1
+    worker_counts = arguments.workers or sorted({1, cpu_count} | {2**power for power in range(1, 7) if 2**power <= cpu_count})
+    with tempfile.TemporaryDirectory() as work_dir:
+        corpus_dir = os.path.join(work_dir, 'segments')
+        write_synthetic_segment_corpus(corpus_dir, arguments.segments, ParallelBenchmarkConfig.SEGMENT_ROWS_RANGE, ParallelBenchmarkConfig.RANDOM_SEED)
+        print(f"Synthetic corpus: {arguments.segments} segments, {cpu_count} CPU cores available")
+        print(f"{'workers':>8} {'seconds':>9} {'segments/s':>11} {'speedup':>8} {'efficiency':>10} {'identical':>9}")
+
+        reference_output = None
+        serial_seconds = None
+        for num_workers in worker_counts:
+            output_csv = os.path.join(work_dir, f"features_{num_workers}.csv")
+            cache_dir = None if arguments.no_cache else os.path.join(work_dir, f"cache_{num_workers}")
+            elapsed_seconds = time_segment_corpus_run(corpus_dir, output_csv, num_workers, cache_dir)
+            with open(output_csv, 'rb') as output_file:
+                output_bytes = output_file.read()
+            reference_output = reference_output or output_bytes
+            serial_seconds = serial_seconds or elapsed_seconds
+            speedup = serial_seconds / elapsed_seconds
+            print(f"{num_workers:>8} {elapsed_seconds:>9.3f} {arguments.segments / elapsed_seconds:>11.0f} "
+                  f"{speedup:>7.2f}x {speedup / num_workers:>9.0%} {str(output_bytes == reference_output):>9}")
+
+if __name__ == '__main__':
+    execute_parallel_scaling_benchmark()
@@ -0,0 +1,475 @@
+import argparse
+import asyncio
+import contextlib
+import datetime
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import socket
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+# --- End-to-end pipeline benchmark (synthetic collector logs -> segments -> features -> prediction -> server) ---
+class PipelineBenchmarkConfig:
+    SAMPLE_COUNTS = [100000]             # Samples per run (split between the no-tremor and the tremor log)
+    WORK_DIR = '../benchmarks/work'      # Generated logs are kept here and reused by later runs with the same size and seed
+    RESULTS_PATH = '../benchmarks/latest_results.json'
+    BASELINE_PATH = '../benchmarks/pipeline_baseline.json'
+    REGRESSION_TOLERANCE = 0.20          # rows/s below (1 - tolerance) x baseline, or peak RSS above (1 + tolerance) x baseline, is flagged
+    STAGE_REPEATS = 3                    # Each stage is run this many times; the fastest run is reported (less sensitive to noise)
+    RANDOM_SEED = 7
+    GENERATOR_CHUNK_SAMPLES = 1000000    # Logs are generated and written in chunks of this many samples (bounded memory)
+
+    # Synthetic log shape, from the recorded dataset_segments (50 Hz, 110-280 sample events)
+    SAMPLE_RATE_HZ = 50
+    EVENT_SAMPLES_RANGE = (110, 280)
+    IDLE_SAMPLES_RANGE = (50, 400)       # Unmarked samples between events
+    GRAVITY_OFFSET = (10.22, 0.25, -2.25) # Mean reading of the resting board (m/s^2)
+    TREMOR_AXIS_STD = (4.0, 1.6, 2.2)    # Per-axis standard deviation inside tremor events
+    NO_TREMOR_AXIS_STD = (0.2, 0.09, 0.13)
+    IDLE_NOISE_STD = 0.03
+
+    # Stages working sample by sample are timed on a prefix of the log (the rate does not depend on the log size)
+    LINE_STAGE_MAX_SAMPLES = 2000000
+    MIN_TIMED_SECONDS = 1.0              # In-memory stages repeat their timed pass until this much time has elapsed (fastest pass kept)
+    IN_MEMORY_MAX_SAMPLES = 5000000      # Larger runs use the streaming (chunked) modes of the extraction and feature scripts
+    PREDICTION_BATCH_WINDOWS = 8192
+
+    SERVER_PORT = 18081
+    SERVER_DURATION_S = 5.0
+    SERVER_ALERT_CLIENTS = 64            # Concurrent clients, each opening a new connection per alert like the ESP32 firmware
+    SERVER_WINDOW_CLIENTS = 16           # Keep-alive clients posting sample windows
+    SERVER_WINDOWS_PER_REQUEST = 16
+
+BENCHMARK_STAGE_NAMES = [
+    'parse_sensor_data_line', 'capture_ascii_decoder', 'capture_binary_decoder', 'segment_extraction',
+    'feature_windowing', 'model_prediction', 'server_alert_requests', 'server_window_requests',
+]
+
+def _peak_rss_mb(process_id='self'):
+    """
+    Peak resident memory of a process. VmHWM belongs to the address space, so a spawned stage does not report the
+    peak of the process that started it (ru_maxrss survives fork + exec); ru_maxrss is the fallback without /proc.
+    """
+    try:
+        with open(f"/proc/{process_id}/status") as status_file:
+            for status_line in status_file:
+                if status_line.startswith('VmHWM:'):
+                    return int(status_line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF if process_id == 'self' else resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+
+def _synthetic_log_paths(work_dir, num_samples, random_seed):
+    run_dir = os.path.join(work_dir, f"samples_{num_samples}_seed_{random_seed}")
+    return run_dir, os.path.join(run_dir, 'raw_log_no_tremor.csv'), os.path.join(run_dir, 'raw_log_tremor.csv')
+
+def _generate_log_chunk(rng, num_samples, is_tremor_log, config):
+    """Idle stretches and marked events (START marker on the first event row, END on the last) filling about num_samples rows."""
+    axis_std = np.array(config.TREMOR_AXIS_STD if is_tremor_log else config.NO_TREMOR_AXIS_STD)
+    accel_blocks, marker_blocks = [], []
+    generated_samples = 0
+    while generated_samples < num_samples:
+        idle_samples = int(rng.integers(*config.IDLE_SAMPLES_RANGE))
+        event_samples = int(rng.integers(*config.EVENT_SAMPLES_RANGE))
+        accel_blocks.append(rng.normal(0.0, config.IDLE_NOISE_STD, (idle_samples, 3)))
+        marker_blocks.append(np.zeros(idle_samples, dtype=np.int8))
+
+        # Events: a few random sinusoids per axis (tremor 3-15 Hz, other movements 0.5-3 Hz) plus broadband noise
+        event_time = np.arange(event_samples) / config.SAMPLE_RATE_HZ
+        frequency_range = (3.0, 15.0) if is_tremor_log else (0.5, 3.0)
+        frequencies = rng.uniform(*frequency_range, (3, 3))
+        phases = rng.uniform(0.0, 2.0 * np.pi, (3, 3))
+        oscillation = np.sin(2.0 * np.pi * frequencies[np.newaxis] * event_time[:, np.newaxis, np.newaxis] + phases[np.newaxis]).sum(axis=2)
+        oscillation *= axis_std * np.sqrt(2.0 / 3.0) * 0.8 # Three unit sinusoids have a variance of 3/2; 80% of the variance is oscillation
+        event_accel = oscillation + rng.normal(0.0, 0.45 * axis_std, (event_samples, 3))
+        event_markers = np.zeros(event_samples, dtype=np.int8)
+        event_markers[0], event_markers[-1] = 1, 2
+        accel_blocks.append(event_accel)
+        marker_blocks.append(event_markers)
+        generated_samples += idle_samples + event_samples
+    return np.concatenate(accel_blocks) + np.array(config.GRAVITY_OFFSET), np.concatenate(marker_blocks)
+
+def generate_synthetic_marker_logs(num_samples, config=PipelineBenchmarkConfig):
+    """
+    Writes a no-tremor and a tremor log shaped like marker_data_collector.py output (num_samples rows in total),
+    unless they already exist for this size and seed. Returns (no_tremor_log_path, tremor_log_path).
+    """
+    run_dir, no_tremor_log_path, tremor_log_path = _synthetic_log_paths(config.WORK_DIR, num_samples, config.RANDOM_SEED)
+    if os.path.exists(no_tremor_log_path) and os.path.exists(tremor_log_path):
+        return no_tremor_log_path, tremor_log_path
+    os.makedirs(run_dir, exist_ok=True)
+    rng = np.random.default_rng(config.RANDOM_SEED)
+    start_time = pd.Timestamp('2025-06-04T19:22:05')
+    for log_path, is_tremor_log, log_samples in ((no_tremor_log_path, False, num_samples // 2), (tremor_log_path, True, num_samples - num_samples // 2)):
+        temporary_path = log_path + '.partial'
+        with open(temporary_path, 'w', newline='') as log_file:
+            written_samples = 0
+            carried_accel, carried_markers = np.empty((0, 3)), np.empty(0, dtype=np.int8)
+            while written_samples < log_samples:
+                chunk_samples = min(config.GENERATOR_CHUNK_SAMPLES, log_samples - written_samples)
+                chunk_accel, chunk_markers = _generate_log_chunk(rng, chunk_samples - len(carried_markers), is_tremor_log, config)
+                chunk_accel = np.concatenate((carried_accel, chunk_accel))
+                chunk_markers = np.concatenate((carried_markers, chunk_markers))
+                # The last event may overrun the chunk: its rows are written with the next chunk (cut at the end of the log)
+                carried_accel, carried_markers = chunk_accel[chunk_samples:], chunk_markers[chunk_samples:]
+                chunk_accel, chunk_markers = chunk_accel[:chunk_samples], chunk_markers[:chunk_samples]
+                chunk_df = pd.DataFrame({
+                    'timestamp_pc': (start_time + pd.to_timedelta(np.arange(written_samples, written_samples + chunk_samples) * (1000 // config.SAMPLE_RATE_HZ), unit='ms')).strftime('%Y-%m-%dT%H:%M:%S.%f'),
+                    'accel_x_val': chunk_accel[:, 0],
+                    'accel_y_val': chunk_accel[:, 1],
+                    'accel_z_val': chunk_accel[:, 2],
+                    'esp_event_code': chunk_markers,
+                })
+                chunk_df.to_csv(log_file, header=(written_samples == 0), index=False, float_format='%.6f')
+                written_samples += chunk_samples
+        os.replace(temporary_path, log_path)
+    return no_tremor_log_path, tremor_log_path
+
+def _build_serial_stream_samples(run_paths, num_samples, config):
+    log_df = pd.read_csv(run_paths['tremor_log'], nrows=min(num_samples // 2, config.LINE_STAGE_MAX_SAMPLES))
+    return log_df[['accel_x_val', 'accel_y_val', 'accel_z_val']].to_numpy(), log_df['esp_event_code'].to_numpy()
+
+def _format_serial_lines(accel_values, markers):
+    """Sample lines as esp32_mpu6050_data_collection.ino prints them ('ax,ay,az,marker', 6 decimals)."""
+    return [f"{ax:.6f},{ay:.6f},{az:.6f},{marker}" for (ax, ay, az), marker in zip(accel_values.tolist(), markers.tolist())]
+
+def _fastest_pass(run_once, min_seconds):
+    """Calls run_once() until min_seconds have elapsed (at least once). Returns (fastest pass seconds, its result)."""
+    best_seconds, pass_result = None, None
+    started = time.perf_counter()
+    while best_seconds is None or time.perf_counter() - started < min_seconds:
+        pass_started = time.perf_counter()
+        pass_result = run_once()
+        pass_seconds = time.perf_counter() - pass_started
+        best_seconds = pass_seconds if best_seconds is None else min(best_seconds, pass_seconds)
+    return best_seconds, pass_result
+
+# --- Stages: each one runs in a fresh process and returns {'seconds', 'rows', ...} ---
+def benchmark_parse_sensor_data_line(run_paths, num_samples, config):
+    from marker_data_collector import parse_sensor_data_line
+    serial_lines = _format_serial_lines(*_build_serial_stream_samples(run_paths, num_samples, config))
+    elapsed_seconds, parsed_rows = _fastest_pass(lambda: sum(1 for data_line_str in serial_lines if parse_sensor_data_line(data_line_str) is not None), config.MIN_TIMED_SECONDS)
+    return {'seconds': elapsed_seconds, 'rows': parsed_rows}
+
+def _decode_in_reads(stream_decoder, stream_bytes, read_size=4096):
+    """Feeds the stream in reads of read_size bytes, like the capture reader thread. Returns the number of rows."""
+    decoded_rows = 0
+    for read_offset in range(0, len(stream_bytes), read_size):
+        decoded_rows += len(stream_decoder.decode(stream_bytes[read_offset:read_offset + read_size], time.monotonic()))
+    return decoded_rows
+
+def benchmark_capture_ascii_decoder(run_paths, num_samples, config):
+    from serial_capture import AsciiLineDecoder, CaptureCounters
+    accel_values, markers = _build_serial_stream_samples(run_paths, num_samples, config)
+    stream_bytes = "".join(serial_line + "\r\n" for serial_line in _format_serial_lines(accel_values, markers)).encode()
+    elapsed_seconds, decoded_rows = _fastest_pass(lambda: _decode_in_reads(AsciiLineDecoder(CaptureCounters()), stream_bytes), config.MIN_TIMED_SECONDS)
+    return {'seconds': elapsed_seconds, 'rows': decoded_rows, 'stream_bytes': len(stream_bytes)}
+
+def benchmark_capture_binary_decoder(run_paths, num_samples, config):
+    from sensor_frame_protocol import encode_sensor_frames
+    from serial_capture import BinaryFrameDecoder, CaptureCounters
+    accel_values, markers = _build_serial_stream_samples(run_paths, num_samples, config)
+    sample_numbers = np.arange(len(markers))
+    stream_bytes = encode_sensor_frames(sample_numbers, sample_numbers * (1000000 // config.SAMPLE_RATE_HZ), accel_values, markers)
+    elapsed_seconds, decoded_rows = _fastest_pass(lambda: _decode_in_reads(BinaryFrameDecoder(CaptureCounters()), stream_bytes), config.MIN_TIMED_SECONDS)
+    return {'seconds': elapsed_seconds, 'rows': decoded_rows, 'stream_bytes': len(stream_bytes)}
+
+def benchmark_segment_extraction(run_paths, num_samples, config):
+    from extract_labeled_segments import ExtractionConfig, SegmentProcessor
+    extraction_config = ExtractionConfig()
+    extraction_config.NO_TREMOR_SOURCE_FILE = run_paths['no_tremor_log']
+    extraction_config.TREMOR_SOURCE_FILE = run_paths['tremor_log']
+    extraction_config.BASE_SEGMENT_OUTPUT_DIR = os.path.join(run_paths['run_dir'], 'segments')
+    extraction_config.FINAL_LABELED_DATASET_FILENAME = run_paths['master_dataset']
+    extraction_config.USE_STREAMING_MODE = num_samples > config.IN_MEMORY_MAX_SAMPLES
+    start_time = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        SegmentProcessor(extraction_config).run_extraction_pipeline()
+    return {'seconds': time.perf_counter() - start_time, 'rows': num_samples, 'streaming_mode': extraction_config.USE_STREAMING_MODE}
+
+def benchmark_feature_windowing(run_paths, num_samples, config):
+    from feature_extractor import FeatureExtractorConfig, FeatureEngineeringPipeline
+    fe_config = FeatureExtractorConfig()
+    fe_config.SOURCE_LABELED_DATA_CSV = run_paths['master_dataset']
+    fe_config.FINAL_FEATURES_CSV = run_paths['features']
+    fe_config.USE_STREAMING_MODE = num_samples > config.IN_MEMORY_MAX_SAMPLES
+    with open(run_paths['master_dataset'], 'rb') as master_file:
+        master_rows = sum(1 for _ in master_file) - 1 # Counted before timing
+    start_time = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        FeatureEngineeringPipeline(fe_config).run_feature_generation()
+    elapsed_seconds = time.perf_counter() - start_time
+    with open(run_paths['features'], 'rb') as features_file:
+        num_windows = sum(1 for _ in features_file) - 1
+    return {'seconds': elapsed_seconds, 'rows': master_rows, 'windows': num_windows, 'streaming_mode': fe_config.USE_STREAMING_MODE}
+
+def benchmark_model_prediction(run_paths, num_samples, config):
+    """Raw sample windows (50 samples, step 25) of the labeled dataset -> model features -> tree, as the server does."""
+    from numpy.lib.stride_tricks import sliding_window_view
+    from window_inference import WindowClassifier, WindowInferenceConfig
+    window_classifier = WindowClassifier.from_flat_model_file(os.path.join(os.path.dirname(os.path.abspath(__file__)), WindowInferenceConfig.FLAT_MODEL_PATH))
+    window_samples = WindowInferenceConfig.WINDOW_SAMPLES
+    elapsed_seconds = 0.0
+    rows_read = 0
+    num_windows = 0
+    for chunk_df in pd.read_csv(run_paths['master_dataset'], usecols=['accel_x_val', 'accel_y_val', 'accel_z_val'], chunksize=config.IN_MEMORY_MAX_SAMPLES):
+        rows_read += len(chunk_df)
+        if len(chunk_df) < window_samples:
+            continue
+        sample_windows = sliding_window_view(chunk_df.to_numpy(dtype=np.float32), window_samples, axis=0)[::window_samples // 2].transpose(0, 2, 1)
+        def predict_chunk():
+            for batch_start in range(0, len(sample_windows), config.PREDICTION_BATCH_WINDOWS):
+                window_classifier.predict_windows(sample_windows[batch_start:batch_start + config.PREDICTION_BATCH_WINDOWS])
+        elapsed_seconds += _fastest_pass(predict_chunk, config.MIN_TIMED_SECONDS)[0]
+        num_windows += len(sample_windows)
+    return {'seconds': elapsed_seconds, 'rows': rows_read, 'windows': num_windows}
+
+def _run_benchmark_server(work_dir, listen_port):
+    """Server process of the request stages: the asyncio alert server with logging to /dev/null and a scratch history database."""
+    repository_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, repository_dir)
+    import servidor_alertas_esp_v2 as alert_server
+    sys.stdout = open(os.devnull, 'w')
+    class BenchmarkServerConfig(alert_server.ServerConfig):
+        LISTEN_ADDRESS = "127.0.0.1"
+        LISTEN_PORT = listen_port
+        STATS_REPORT_INTERVAL_S = 0
+        ALERT_HISTORY_DB_PATH = os.path.join(work_dir, 'benchmark_alert_history.db')
+        INFERENCE_MODEL_PATH = os.path.join(repository_dir, alert_server.ServerConfig.INFERENCE_MODEL_PATH)
+    alert_server.CustomAlertHTTPServer(BenchmarkServerConfig).start_service()
+
+async def _send_requests_until(deadline, listen_port, request_bytes, keep_alive, counters):
+    """One client: sends request_bytes until the deadline, reconnecting per request unless keep_alive. Records latencies."""
+    connection = None
+    while time.perf_counter() < deadline:
+        request_started = time.perf_counter()
+        try:
+            if connection is None:
+                connection = await asyncio.open_connection("127.0.0.1", listen_port)
+            reader, writer = connection
+            writer.write(request_bytes)
+            header_block = await reader.readuntil(b"\r\n\r\n")
+            content_length = int(header_block.split(b"Content-Length: ", 1)[1].split(b"\r\n", 1)[0])
+            await reader.readexactly(content_length)
+            if not header_block.startswith(b"HTTP/1.1 200"):
+                counters['errors'] += 1
+            else:
+                counters['latencies'].append(time.perf_counter() - request_started)
+            if not keep_alive:
+                writer.close()
+                connection = None
+        except (OSError, asyncio.IncompleteReadError, IndexError, ValueError):
+            counters['errors'] += 1
+            connection = None
+    if connection is not None:
+        connection[1].close()
+
+async def _drive_server_clients(listen_port, request_bytes, keep_alive, num_clients, duration_s):
+    counters = {'errors': 0, 'latencies': []}
+    deadline = time.perf_counter() + duration_s
+    await asyncio.gather(*[_send_requests_until(deadline, listen_port, request_bytes, keep_alive, counters) for _ in range(num_clients)])
+    return counters
+
+def _benchmark_server_requests(run_paths, config, request_bytes, keep_alive, num_clients):
+    server_process = multiprocessing.get_context('spawn').Process(target=_run_benchmark_server, args=(run_paths['run_dir'], config.SERVER_PORT), daemon=True)
+    server_process.start()
+    try:
+        for _ in range(200): # Wait for the listening socket (model loading and imports take a moment)
+            try:
+                socket.create_connection(("127.0.0.1", config.SERVER_PORT), timeout=1.0).close()
+                break
+            except OSError:
+                time.sleep(0.05)
+        counters = asyncio.run(_drive_server_clients(config.SERVER_PORT, request_bytes, keep_alive, num_clients, config.SERVER_DURATION_S))
+        server_peak_rss_mb = _peak_rss_mb(server_process.pid)
+    finally:
+        server_process.terminate()
+        server_process.join()
+    latencies_ms = np.array(counters['latencies']) * 1000.0
+    return {
+        'seconds': config.SERVER_DURATION_S,
+        'rows': len(latencies_ms),
+        'errors': counters['errors'],
+        'latency_p50_ms': float(np.percentile(latencies_ms, 50)) if len(latencies_ms) else None,
+        'latency_p99_ms': float(np.percentile(latencies_ms, 99)) if len(latencies_ms) else None,
+        'server_peak_rss_mb': server_peak_rss_mb,
+        'clients': num_clients,
+    }
+
+def benchmark_server_alert_requests(run_paths, num_samples, config):
+    request_bytes = b"GET /incoming_alert?event_type=tremor HTTP/1.1\r\nHost: benchmark\r\nConnection: close\r\n\r\n"
+    return _benchmark_server_requests(run_paths, config, request_bytes, False, config.SERVER_ALERT_CLIENTS)
+
+def benchmark_server_window_requests(run_paths, num_samples, config):
+    from window_inference import WindowInferenceConfig, encode_window_payload
+    sample_windows = np.random.default_rng(config.RANDOM_SEED).normal(0.0, 2.0, (config.SERVER_WINDOWS_PER_REQUEST, WindowInferenceConfig.WINDOW_SAMPLES, 3)) + np.array(config.GRAVITY_OFFSET)
+    request_body = encode_window_payload(sample_windows)
+    request_bytes = (f"POST /classify_window HTTP/1.1\r\nHost: benchmark\r\nContent-Type: application/octet-stream\r\n"
+                     f"Content-Length: {len(request_body)}\r\n\r\n").encode() + request_body
+    stage_result = _benchmark_server_requests(run_paths, config, request_bytes, True, config.SERVER_WINDOW_CLIENTS)
+    stage_result['windows'] = stage_result['rows'] * config.SERVER_WINDOWS_PER_REQUEST
+    return stage_result
+
+STAGE_FUNCTIONS = {
+    'parse_sensor_data_line': benchmark_parse_sensor_data_line,
+    'capture_ascii_decoder': benchmark_capture_ascii_decoder,
+    'capture_binary_decoder': benchmark_capture_binary_decoder,
+    'segment_extraction': benchmark_segment_extraction,
+    'feature_windowing': benchmark_feature_windowing,
+    'model_prediction': benchmark_model_prediction,
+    'server_alert_requests': benchmark_server_alert_requests,
+    'server_window_requests': benchmark_server_window_requests,
+}
+
+def _run_stage_in_child(stage_name, run_paths, num_samples, config, result_queue):
+    rss_before_mb = _peak_rss_mb()
+    try:
+        stage_result = STAGE_FUNCTIONS[stage_name](run_paths, num_samples, config)
+    except Exception as e:
+        result_queue.put({'error': f"{type(e).__name__}: {e}"})
+        return
+    stage_result['peak_rss_mb'] = _peak_rss_mb()
+    stage_result['rss_before_stage_mb'] = rss_before_mb
+    result_queue.put(stage_result)
+
+def run_stage_isolated(stage_name, run_paths, num_samples, config=PipelineBenchmarkConfig):
+    """Runs one stage in a fresh interpreter, so its peak RSS is not inflated by the stages before it."""
+    spawn_context = multiprocessing.get_context('spawn')
+    result_queue = spawn_context.Queue()
+    stage_process = spawn_context.Process(target=_run_stage_in_child, args=(stage_name, run_paths, num_samples, config, result_queue))
+    stage_process.start()
+    stage_result = result_queue.get()
+    stage_process.join()
+    if 'error' not in stage_result:
+        stage_result['rows_per_s'] = stage_result['rows'] / stage_result['seconds'] if stage_result['seconds'] > 0 else None
+    return stage_result
+
+def run_stage_best_of(stage_name, run_paths, num_samples, num_repeats, config=PipelineBenchmarkConfig):
+    """Fastest of num_repeats isolated runs (with the highest peak RSS seen, so memory is not under-reported)."""
+    stage_runs = [run_stage_isolated(stage_name, run_paths, num_samples, config) for _ in range(num_repeats)]
+    failed_runs = [stage_run for stage_run in stage_runs if 'error' in stage_run]
+    if failed_runs:
+        return failed_runs[0]
+    best_run = max(stage_runs, key=lambda stage_run: stage_run['rows_per_s'] or 0.0)
+    best_run['peak_rss_mb'] = max(stage_run['peak_rss_mb'] for stage_run in stage_runs)
+    best_run['repeats'] = num_repeats
+    return best_run
+
+def run_pipeline_benchmark(num_samples, stage_names, num_repeats=PipelineBenchmarkConfig.STAGE_REPEATS, config=PipelineBenchmarkConfig):
+    generation_started = time.perf_counter()
+    no_tremor_log_path, tremor_log_path = generate_synthetic_marker_logs(num_samples, config)
+    run_dir = os.path.dirname(no_tremor_log_path)
+    print(f"\n{num_samples:,} samples: synthetic logs ready in {time.perf_counter() - generation_started:.1f} s ({run_dir})")
+    run_paths = {
+        'run_dir': run_dir,
+        'no_tremor_log': no_tremor_log_path,
+        'tremor_log': tremor_log_path,
+        'master_dataset': os.path.join(run_dir, 'master_feature_ready_dataset.csv'),
+        'features': os.path.join(run_dir, 'final_ml_training_features.csv'),
+    }
+    stage_results = {}
+    for stage_name in stage_names:
+        if stage_name in ('feature_windowing', 'model_prediction') and not os.path.exists(run_paths['master_dataset']):
+            stage_results['segment_extraction'] = run_stage_isolated('segment_extraction', run_paths, num_samples, config) # Produces their input
+        stage_results[stage_name] = run_stage_best_of(stage_name, run_paths, num_samples, num_repeats, config)
+        _print_stage_result(stage_name, stage_results[stage_name])
+    return {'num_samples': num_samples, 'stages': stage_results}
+
+def _print_stage_result(stage_name, stage_result):
+    if 'error' in stage_result:
+        print(f"  {stage_name:<24} ERROR: {stage_result['error']}")
+        return
+    extra_fields = ", ".join(f"{key} {value:.2f}" if isinstance(value, float) else f"{key} {value}" for key, value in stage_result.items()
+                             if key not in ('seconds', 'rows', 'rows_per_s', 'peak_rss_mb', 'rss_before_stage_mb', 'repeats'))
+    print(f"  {stage_name:<24} {stage_result['rows']:>12,} rows {stage_result['seconds']:>8.3f} s {stage_result['rows_per_s']:>14,.0f} rows/s "
+          f"{stage_result['peak_rss_mb']:>8.1f} MB peak RSS" + (f"  ({extra_fields})" if extra_fields else ""))
+
+def describe_environment():
+    return {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+def compare_with_baseline(benchmark_results, baseline_results, tolerance):
+    """Adds a 'baseline' entry to every stage that has one at the same sample count. Returns the list of regressions."""
+    baseline_runs = {run['num_samples']: run['stages'] for run in baseline_results.get('runs', [])}
+    regressions = []
+    for run in benchmark_results['runs']:
+        for stage_name, stage_result in run['stages'].items():
+            baseline_stage = baseline_runs.get(run['num_samples'], {}).get(stage_name)
+            if 'error' in stage_result or not baseline_stage or 'error' in baseline_stage:
+                continue
+            throughput_ratio = stage_result['rows_per_s'] / baseline_stage['rows_per_s']
+            memory_ratio = stage_result['peak_rss_mb'] / baseline_stage['peak_rss_mb']
+            status = 'ok'
+            if throughput_ratio < 1.0 - tolerance:
+                status = 'slower'
+            elif memory_ratio > 1.0 + tolerance:
+                status = 'more memory'
+            elif throughput_ratio > 1.0 + tolerance:
+                status = 'faster'
+            stage_result['baseline'] = {'rows_per_s': baseline_stage['rows_per_s'], 'peak_rss_mb': baseline_stage['peak_rss_mb'],
+                                        'throughput_ratio': throughput_ratio, 'memory_ratio': memory_ratio, 'status': status}
+            if status in ('slower', 'more memory'):
+                regressions.append((run['num_samples'], stage_name, status))
+    return regressions
+
+def print_baseline_comparison(benchmark_results):
+    print(f"\n{'samples':>12} {'stage':<24} {'rows/s':>14} {'baseline':>14} {'ratio':>7} {'RSS ratio':>9}  status")
+    for run in benchmark_results['runs']:
+        for stage_name, stage_result in run['stages'].items():
+            baseline_entry = stage_result.get('baseline')
+            if baseline_entry:
+                print(f"{run['num_samples']:>12,} {stage_name:<24} {stage_result['rows_per_s']:>14,.0f} {baseline_entry['rows_per_s']:>14,.0f} "
+                      f"{baseline_entry['throughput_ratio']:>6.2f}x {baseline_entry['memory_ratio']:>8.2f}x  {baseline_entry['status']}")
+
+def write_json(path, data):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as json_file:
+        json.dump(data, json_file, indent=2)
+        json_file.write('\n')
+
+def execute_pipeline_benchmark():
+    parser = argparse.ArgumentParser(description="Time every pipeline stage on synthetic collector logs and compare with a stored baseline.")
+    parser.add_argument('--samples', type=int, nargs='*', default=PipelineBenchmarkConfig.SAMPLE_COUNTS, help="total samples per run (1e5 to 1e8)")
+    parser.add_argument('--stages', nargs='*', choices=BENCHMARK_STAGE_NAMES, default=BENCHMARK_STAGE_NAMES)
+    parser.add_argument('--repeats', type=int, default=PipelineBenchmarkConfig.STAGE_REPEATS, help="runs per stage (the fastest is kept)")
+    parser.add_argument('--output', default=PipelineBenchmarkConfig.RESULTS_PATH, help="machine-readable results (JSON)")
+    parser.add_argument('--baseline', default=PipelineBenchmarkConfig.BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the new baseline")
+    parser.add_argument('--fail-on-regression', action='store_true', help="exit with status 1 when a stage regressed")
+    arguments = parser.parse_args()
+
+    print(f"Pipeline benchmark: {', '.join(f'{num_samples:,}' for num_samples in arguments.samples)} samples, "
+          f"best of {arguments.repeats} runs per stage, {os.cpu_count()} CPU cores")
+    benchmark_results = {'environment': describe_environment(), 'runs': [run_pipeline_benchmark(num_samples, arguments.stages, arguments.repeats) for num_samples in arguments.samples]}
+
+    regressions = []
+    if os.path.exists(arguments.baseline) and not arguments.save_baseline:
+        with open(arguments.baseline) as baseline_file:
+            baseline_results = json.load(baseline_file)
+        regressions = compare_with_baseline(benchmark_results, baseline_results, PipelineBenchmarkConfig.REGRESSION_TOLERANCE)
+        print(f"\nBaseline: {arguments.baseline} (recorded {baseline_results['environment']['timestamp']} on {baseline_results['environment']['platform']})")
+        print_baseline_comparison(benchmark_results)
+        for num_samples, stage_name, status in regressions:
+            print(f"Warning: Regression in {stage_name} at {num_samples:,} samples ({status} than baseline)")
+    write_json(arguments.output, benchmark_results)
+    print(f"\nResults written to: {arguments.output}")
+    if arguments.save_baseline:
+        write_json(arguments.baseline, benchmark_results)
+        print(f"Baseline saved to: {arguments.baseline}")
+    if regressions and arguments.fail_on_regression:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    execute_pipeline_benchmark()
@@ -0,0 +1,109 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+
+from segment_catalog import SegmentCatalog
+
+# --- Configuration for the Segment Catalog Benchmark ---
+class CatalogBenchmarkConfig:
+    NUM_SEGMENTS = 100000
+    NUM_TEMPLATES = 500          # Distinct segment contents, written round-robin (keeps corpus generation fast)
+    ROWS_RANGE = (60, 400)       # Rows per synthetic segment, like dataset_segments/
+    MODIFIED_SEGMENTS = 200      # Segments rewritten / added / deleted before the incremental refresh
+    QUERY_REPEATS = 20
+    RANDOM_SEED = 7
+
+def _segment_csv_text(rng, num_rows, label_value, start_second):
+    shake_amplitude = 2.5 if label_value else 0.05
+    timestamps = np.datetime64('2025-06-04T19:22:05', 'us') + np.timedelta64(start_second, 's') + np.arange(num_rows) * np.timedelta64(20, 'ms')
+    accel_values = np.array([10.2, 0.25, -2.2]) + rng.normal(0, shake_amplitude, (num_rows, 3))
+    data_lines = [f"{timestamp},{x:.6f},{y:.6f},{z:.6f}" for timestamp, (x, y, z) in zip(timestamps.astype(str), accel_values)]
+    return "timestamp_pc,accel_x,accel_y,accel_z\n" + "\n".join(data_lines) + "\n"
+
+def write_catalog_benchmark_corpus(corpus_dir, num_segments, num_templates, rows_range, random_seed):
+    """Writes num_segments CSVs under no_tremor/ and tremor/, reusing num_templates distinct contents."""
+    rng = np.random.default_rng(random_seed)
+    for label_dir_name in ('no_tremor', 'tremor'):
+        os.makedirs(os.path.join(corpus_dir, label_dir_name), exist_ok=True)
+    templates = [
+        _segment_csv_text(rng, int(rng.integers(*rows_range)), template_number % 2, template_number * 10)
+        for template_number in range(num_templates)
+    ]
+    for segment_number in range(num_segments):
+        label_value = segment_number % 2
+        template_number = (segment_number // 2 * 2 + label_value) % num_templates
+        label_dir_name = 'tremor' if label_value else 'no_tremor'
+        with open(os.path.join(corpus_dir, label_dir_name, f"segment_label_{label_value}_{segment_number:06d}.csv"), 'w') as segment_file:
+            segment_file.write(templates[template_number])
+
+def _median_query_ms(query_function, repeats):
+    query_times = []
+    for _ in range(repeats):
+        query_start = time.perf_counter()
+        query_function()
+        query_times.append((time.perf_counter() - query_start) * 1000)
+    return float(np.median(query_times))
+
+def execute_segment_catalog_benchmark():
+    parser = argparse.ArgumentParser(description="Time full and incremental catalog builds and catalog queries on a synthetic segment corpus.")
+    parser.add_argument('--segments', type=int, default=CatalogBenchmarkConfig.NUM_SEGMENTS)
+    parser.add_argument('--work-dir', help="keep the generated corpus here (default: a temporary directory)")
+    arguments = parser.parse_args()
+
+    work_dir = arguments.work_dir or tempfile.mkdtemp(prefix='segment_catalog_bench_')
+    corpus_dir = os.path.join(work_dir, 'segments')
+    catalog_path = os.path.join(work_dir, 'segment_catalog.db')
+    try:
+        if not os.path.isdir(corpus_dir):
+            generate_start = time.perf_counter()
+            write_catalog_benchmark_corpus(corpus_dir, arguments.segments, CatalogBenchmarkConfig.NUM_TEMPLATES,
+                                           CatalogBenchmarkConfig.ROWS_RANGE, CatalogBenchmarkConfig.RANDOM_SEED)
+            print(f"Generated {arguments.segments} segments in {time.perf_counter() - generate_start:.1f} s")
+        if os.path.exists(catalog_path):
+            os.remove(catalog_path)
+
+        with SegmentCatalog(catalog_path, corpus_dir) as segment_catalog:
+            refresh_start = time.perf_counter()
+            refresh_counts = segment_catalog.refresh()
+            print(f"Full build:        {time.perf_counter() - refresh_start:7.2f} s  {refresh_counts}")
+
+            refresh_start = time.perf_counter()
+            refresh_counts = segment_catalog.refresh()
+            print(f"No-change refresh: {time.perf_counter() - refresh_start:7.2f} s  {refresh_counts}")
+
+            rng = np.random.default_rng(CatalogBenchmarkConfig.RANDOM_SEED)
+            cataloged_paths = [entry.relative_path for entry in segment_catalog.query()]
+            changed_paths = rng.choice(cataloged_paths, size=2 * CatalogBenchmarkConfig.MODIFIED_SEGMENTS, replace=False)
+            for relative_path in changed_paths[:CatalogBenchmarkConfig.MODIFIED_SEGMENTS]:
+                with open(os.path.join(corpus_dir, relative_path), 'a') as segment_file:
+                    segment_file.write("2025-06-04T23:59:59.000000,10.2,0.25,-2.2\n")
+            for relative_path in changed_paths[CatalogBenchmarkConfig.MODIFIED_SEGMENTS:]:
+                os.remove(os.path.join(corpus_dir, relative_path))
+            new_segment_text = _segment_csv_text(rng, CatalogBenchmarkConfig.ROWS_RANGE[1], 1, 0)
+            for segment_number in range(CatalogBenchmarkConfig.MODIFIED_SEGMENTS):
+                with open(os.path.join(corpus_dir, 'tremor', f"segment_label_1_new_{segment_number:04d}.csv"), 'w') as segment_file:
+                    segment_file.write(new_segment_text)
+            refresh_start = time.perf_counter()
+            refresh_counts = segment_catalog.refresh()
+            print(f"Incremental:       {time.perf_counter() - refresh_start:7.2f} s  {refresh_counts}")
+
+            repeats = CatalogBenchmarkConfig.QUERY_REPEATS
+            sample_entry = segment_catalog.query(limit=1)[0]
+            query_timings = {
+                'summary by label': lambda: segment_catalog.summary(),
+                'filter label=1, 300+ rows, limit 100': lambda: segment_catalog.query(label=1, min_rows=300, limit=100),
+                'balanced subset, 1000 per label': lambda: segment_catalog.balanced_subset(1000, min_rows=50),
+                'balanced windows, 10000 per label': lambda: segment_catalog.balanced_windows(10000),
+                'read one 50-row window': lambda: segment_catalog.read_rows(sample_entry.segment_id, 100, 50),
+            }
+            for query_name, query_function in query_timings.items():
+                print(f"  {query_name:<38} {_median_query_ms(query_function, repeats):8.2f} ms (median of {repeats})")
+    finally:
+        if not arguments.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    execute_segment_catalog_benchmark()
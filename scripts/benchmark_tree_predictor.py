@@ -0,0 +1,72 @@
+import argparse
+import pickle
+import subprocess
+import sys
+import time
+import numpy as np
+from flat_tree import load_flat_model
+from tree_export import TreeExportConfig
+
+# --- Cold start and batch throughput: FlatDecisionTree (NumPy) vs the pickled DecisionTreeClassifier ---
+class TreePredictorBenchmarkConfig:
+    BATCH_SIZES = [1, 100, 10000, 1000000]
+    COLD_START_RUNS = 5
+    RANDOM_SEED = 42
+
+# Each snippet runs in a fresh interpreter: import, load the model and classify one row
+SKLEARN_COLD_START_SNIPPET = """
+import pickle, warnings, numpy as np
+warnings.simplefilter('ignore')
+model = pickle.load(open({model_path!r}, 'rb'))
+model.predict(np.zeros((1, model.n_features_in_)))
+"""
+FLAT_COLD_START_SNIPPET = """
+import numpy as np
+from flat_tree import load_flat_model
+flat_tree = load_flat_model({flat_model_path!r})[0]
+flat_tree.predict(np.zeros((1, 32)))
+"""
+
+def time_cold_start(snippet, num_runs):
+    """Median wall time of a fresh interpreter running the snippet."""
+    run_seconds = []
+    for _ in range(num_runs):
+        start_time = time.perf_counter()
+        subprocess.run([sys.executable, '-c', snippet], check=True)
+        run_seconds.append(time.perf_counter() - start_time)
+    return float(np.median(run_seconds))
+
+def time_predict(predict_function, feature_matrix):
+    repetitions = max(1, 100000 // len(feature_matrix))
+    start_time = time.perf_counter()
+    for _ in range(repetitions):
+        predictions = predict_function(feature_matrix)
+    return (time.perf_counter() - start_time) / repetitions, predictions
+
+def execute_tree_predictor_benchmark():
+    parser = argparse.ArgumentParser(description="Compare the flat NumPy tree predictor with scikit-learn.")
+    parser.add_argument('--model', default=TreeExportConfig.MODEL_PATH)
+    parser.add_argument('--flat-model', default=TreeExportConfig.FLAT_MODEL_OUTPUT)
+    arguments = parser.parse_args()
+
+    baseline_seconds = time_cold_start("pass", TreePredictorBenchmarkConfig.COLD_START_RUNS)
+    sklearn_seconds = time_cold_start(SKLEARN_COLD_START_SNIPPET.format(model_path=arguments.model), TreePredictorBenchmarkConfig.COLD_START_RUNS)
+    flat_seconds = time_cold_start(FLAT_COLD_START_SNIPPET.format(flat_model_path=arguments.flat_model), TreePredictorBenchmarkConfig.COLD_START_RUNS)
+    print(f"Cold start (import + load + first prediction, interpreter start {baseline_seconds * 1e3:.0f} ms subtracted):")
+    print(f"  sklearn pickle: {(sklearn_seconds - baseline_seconds) * 1e3:8.1f} ms")
+    print(f"  flat tree .npz: {(flat_seconds - baseline_seconds) * 1e3:8.1f} ms")
+
+    with open(arguments.model, 'rb') as model_file:
+        tree_model = pickle.load(model_file)
+    flat_tree = load_flat_model(arguments.flat_model)[0]
+    rng = np.random.default_rng(TreePredictorBenchmarkConfig.RANDOM_SEED)
+    print(f"\n{'rows':>8} {'sklearn rows/s':>15} {'flat rows/s':>13} {'speedup':>8} {'identical':>9}")
+    for batch_size in TreePredictorBenchmarkConfig.BATCH_SIZES:
+        feature_matrix = rng.normal(0, 1.5, (batch_size, tree_model.n_features_in_))
+        sklearn_seconds, sklearn_predictions = time_predict(tree_model.predict, feature_matrix)
+        flat_seconds, flat_predictions = time_predict(flat_tree.predict, feature_matrix)
+        print(f"{batch_size:>8} {batch_size / sklearn_seconds:>15,.0f} {batch_size / flat_seconds:>13,.0f} "
+              f"{sklearn_seconds / flat_seconds:>7.1f}x {str(np.array_equal(sklearn_predictions, flat_predictions)):>9}")
+
+if __name__ == '__main__':
+    execute_tree_predictor_benchmark()
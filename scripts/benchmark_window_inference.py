@@ -0,0 +1,106 @@
+import argparse
+import asyncio
+import pickle
+import time
+import numpy as np
+import pandas as pd
+from model_features import MODEL_FEATURE_NAMES, compute_model_features
+from window_inference import MicroBatchInferenceService, WindowClassifier, WindowInferenceConfig
+
+# --- Throughput/latency benchmark of the server-side window classification ---
+class InferenceBenchmarkConfig:
+    NUM_WINDOWS = 20000
+    DIRECT_BATCH_SIZES = [1, 8, 32, 128, 512, 2048]
+    SERVICE_MAX_BATCH_SIZES = [1, 16, 64, 256]
+    CONCURRENT_CLIENTS = 256 # Simulated devices, each with one request (one window) in flight at a time
+    RANDOM_SEED = 42
+
+def generate_sample_windows(num_windows, window_samples, random_seed):
+    """Resting (gravity on X) and shaking windows, half each."""
+    rng = np.random.default_rng(random_seed)
+    shake_amplitudes = np.where(np.arange(num_windows) % 2, 2.5, 0.05)[:, np.newaxis, np.newaxis]
+    gravity_offset = np.array([10.2, 0.25, -2.2])
+    return (gravity_offset + rng.normal(0, 1, (num_windows, window_samples, 3)) * shake_amplitudes).astype(np.float32)
+
+def predict_one_window_at_a_time(tree_model, feature_scaler, sample_windows):
+    """Reference path: one features/scaler/predict call per window, as a per-request server would do it."""
+    window_predictions = []
+    for sample_window in sample_windows:
+        feature_row = pd.DataFrame(compute_model_features(sample_window[np.newaxis]), columns=MODEL_FEATURE_NAMES)
+        window_predictions.append(tree_model.predict(feature_scaler.transform(feature_row))[0])
+    return np.array(window_predictions)
+
+def time_direct_batches(window_classifier, sample_windows, batch_size):
+    start_time = time.perf_counter()
+    batch_predictions = [window_classifier.predict_windows(sample_windows[i:i + batch_size]) for i in range(0, len(sample_windows), batch_size)]
+    elapsed_seconds = time.perf_counter() - start_time
+    return elapsed_seconds, np.concatenate(batch_predictions)
+
+async def time_micro_batched_service(window_classifier, sample_windows, max_batch_windows, concurrent_clients):
+    class BenchmarkInferenceConfig(WindowInferenceConfig):
+        MAX_BATCH_WINDOWS = max_batch_windows
+    inference_service = MicroBatchInferenceService(window_classifier, BenchmarkInferenceConfig)
+    inference_service.start()
+    window_predictions = np.zeros(len(sample_windows), dtype=np.int64)
+
+    async def run_client(client_number):
+        for window_index in range(client_number, len(sample_windows), concurrent_clients):
+            window_predictions[window_index] = (await inference_service.classify_windows(sample_windows[window_index:window_index + 1]))[0]
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(run_client(client_number) for client_number in range(concurrent_clients)))
+    elapsed_seconds = time.perf_counter() - start_time
+    batches_run = inference_service.batches_run
+    sorted_latencies = np.sort(np.array(inference_service.window_latencies_ms))
+    await inference_service.stop()
+    return elapsed_seconds, batches_run, sorted_latencies, window_predictions
+
+def execute_inference_benchmark():
+    parser = argparse.ArgumentParser(description="Measure windows/s and per-window latency of the batched window classifier.")
+    parser.add_argument('--windows', type=int, default=InferenceBenchmarkConfig.NUM_WINDOWS)
+    parser.add_argument('--clients', type=int, default=InferenceBenchmarkConfig.CONCURRENT_CLIENTS)
+    parser.add_argument('--model', default=WindowInferenceConfig.MODEL_PATH)
+    parser.add_argument('--scaler', default=WindowInferenceConfig.SCALER_PATH)
+    arguments = parser.parse_args()
+
+    window_classifier = WindowClassifier.from_pickle_files(arguments.model, arguments.scaler)
+    sample_windows = generate_sample_windows(arguments.windows, WindowInferenceConfig.WINDOW_SAMPLES, InferenceBenchmarkConfig.RANDOM_SEED)
+
+    with open(arguments.scaler, 'rb') as scaler_file:
+        feature_scaler = pickle.load(scaler_file)
+    reference_count = min(len(sample_windows), 2000)
+    start_time = time.perf_counter()
+    reference_predictions = predict_one_window_at_a_time(window_classifier.tree_model, feature_scaler, sample_windows[:reference_count])
+    reference_seconds = time.perf_counter() - start_time
+    print(f"Per-window reference path: {reference_count / reference_seconds:,.0f} windows/s "
+          f"({reference_seconds / reference_count * 1e3:.3f} ms per window)")
+
+    unpruned_classifier = WindowClassifier.from_pickle_files(arguments.model, arguments.scaler, prune_features=False)
+    unpruned_seconds, unpruned_predictions = time_direct_batches(unpruned_classifier, sample_windows, len(sample_windows))
+    pruned_seconds, pruned_predictions = time_direct_batches(window_classifier, sample_windows, len(sample_windows))
+    print(f"Feature computation: all {len(MODEL_FEATURE_NAMES)} features {unpruned_seconds / len(sample_windows) * 1e6:.2f} us/window, "
+          f"only the {len(window_classifier.required_features)} the tree reads {pruned_seconds / len(sample_windows) * 1e6:.2f} us/window "
+          f"({unpruned_seconds / pruned_seconds:.1f}x), identical predictions: {np.array_equal(unpruned_predictions, pruned_predictions)}")
+
+    print(f"\nDirect batched calls ({arguments.windows} windows)")
+    print(f"{'batch':>6} {'windows/s':>12} {'batch ms':>9} {'us/window':>10} {'speedup':>8} {'identical':>9}")
+    for batch_size in InferenceBenchmarkConfig.DIRECT_BATCH_SIZES:
+        elapsed_seconds, batch_predictions = time_direct_batches(window_classifier, sample_windows, batch_size)
+        windows_per_second = len(sample_windows) / elapsed_seconds
+        print(f"{batch_size:>6} {windows_per_second:>12,.0f} {elapsed_seconds / -(-len(sample_windows) // batch_size) * 1e3:>9.3f} "
+              f"{1e6 / windows_per_second:>10.2f} {windows_per_second * reference_seconds / reference_count:>7.1f}x "
+              f"{str(np.array_equal(batch_predictions[:reference_count], reference_predictions)):>9}")
+
+    print(f"\nMicro-batched service ({arguments.clients} concurrent clients, one window per request, "
+          f"max delay {WindowInferenceConfig.MAX_BATCH_DELAY_MS} ms)")
+    print(f"{'max batch':>9} {'windows/s':>12} {'mean batch':>10} {'p50 ms':>8} {'p99 ms':>8} {'identical':>9}")
+    for max_batch_windows in InferenceBenchmarkConfig.SERVICE_MAX_BATCH_SIZES:
+        elapsed_seconds, batches_run, sorted_latencies, window_predictions = asyncio.run(
+            time_micro_batched_service(window_classifier, sample_windows, max_batch_windows, arguments.clients)
+        )
+        print(f"{max_batch_windows:>9} {len(sample_windows) / elapsed_seconds:>12,.0f} {len(sample_windows) / batches_run:>10.1f} "
+              f"{sorted_latencies[len(sorted_latencies) // 2]:>8.2f} {sorted_latencies[int(0.99 * (len(sorted_latencies) - 1))]:>8.2f} "
+              f"{str(np.array_equal(window_predictions[:reference_count], reference_predictions)):>9}")
+
+if __name__ == '__main__':
+    execute_inference_benchmark()
@@ -0,0 +1,344 @@
+import argparse
+import json
+import os
+import re
+import numpy as np
+import pandas as pd
+
+# --- Configuration for the Columnar Binary Format ---
+class ColumnarStoreConfig:
+    # A store is a directory with this suffix holding one raw little-endian file per column plus a manifest
+    STORE_SUFFIX = '.cols'
+    MANIFEST_FILENAME = 'manifest.json'
+    FORMAT_NAME = 'gs-iot-columnar'
+    FORMAT_VERSION = 1
+
+    # Storage types chosen when a column has no explicit override
+    DEFAULT_FLOAT_KIND = 'float64'
+    # float32 halves the size of the bulky sensor and feature columns; their values (6 decimals from the firmware,
+    # statistics of those) survive it. Any other float column (epoch times, counters, ...) keeps DEFAULT_FLOAT_KIND.
+    COMPACT_FLOAT_KIND = 'float32'
+    COMPACT_FLOAT_COLUMN_PATTERNS = [
+        r'accel_[xyz](_val)?',                                                                          # Sensor axes
+        r'(x|y|z|svm)_(mean|std_dev|variance|min_val|max_val|range_val|energy_sum|mean_abs_dev)',       # Window features
+    ]
+    DEFAULT_INT_KIND = 'int64'
+    TIMESTAMP_KIND = 'timestamp_us' # int64 microseconds since the Unix epoch
+    INTEGER_KINDS = ('int8', 'int32', 'int64')
+
+    # Column used to label segments when converting a directory of segment CSVs
+    LABEL_COLUMN = 'label'
+    # Label inferred from segment file/dir names (e.g. 'segment_label_1_026.csv', 'no_tremor/')
+    SEGMENT_LABEL_PATTERN = r'label_(\d+)_'
+    SEGMENT_DIR_LABELS = {'no_tremor': 0, 'tremor': 1}
+
+KIND_DTYPES = {
+    'float32': np.dtype('<f4'),
+    'float64': np.dtype('<f8'),
+    'int8': np.dtype('<i1'),
+    'int32': np.dtype('<i4'),
+    'int64': np.dtype('<i8'),
+    ColumnarStoreConfig.TIMESTAMP_KIND: np.dtype('<i8'),
+}
+
+def is_columnar_store_path(path):
+    return str(path).rstrip('/\\').endswith(ColumnarStoreConfig.STORE_SUFFIX)
+
+def _infer_column_kind(values):
+    """Storage kind of a column (a Series). Raises ValueError for text columns that are not ISO timestamps."""
+    if pd.api.types.is_float_dtype(values):
+        if any(re.fullmatch(column_pattern, str(values.name)) for column_pattern in ColumnarStoreConfig.COMPACT_FLOAT_COLUMN_PATTERNS):
+            return ColumnarStoreConfig.COMPACT_FLOAT_KIND
+        return ColumnarStoreConfig.DEFAULT_FLOAT_KIND
+    if pd.api.types.is_integer_dtype(values) or pd.api.types.is_bool_dtype(values):
+        return ColumnarStoreConfig.DEFAULT_INT_KIND
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return ColumnarStoreConfig.TIMESTAMP_KIND
+    # Text columns are only supported when they hold ISO timestamps (e.g. 'timestamp_pc')
+    try:
+        pd.to_datetime(values.dropna(), format='ISO8601')
+    except (ValueError, TypeError):
+        sample_value = values.dropna().iloc[0] if values.notna().any() else None
+        raise ValueError(f"Column '{values.name}' holds text (e.g. {sample_value!r}); the columnar format stores only "
+                         "numeric and ISO timestamp columns (drop the column or convert it first)") from None
+    return ColumnarStoreConfig.TIMESTAMP_KIND
+
+def _encode_column(values, kind):
+    """Converts a column to the raw array stored on disk for the given kind."""
+    if kind == ColumnarStoreConfig.TIMESTAMP_KIND:
+        if not pd.api.types.is_datetime64_any_dtype(values):
+            values = pd.to_datetime(pd.Series(values), format='ISO8601')
+        return (pd.Series(values).to_numpy(dtype='datetime64[us]').astype(np.int64)).astype(KIND_DTYPES[kind])
+    return np.asarray(values).astype(KIND_DTYPES[kind], copy=False)
+
+def _decode_timestamps(epoch_us_values):
+    """ISO strings (microsecond precision) for timestamp columns, as written by the data collector."""
+    return pd.Series(pd.to_datetime(np.asarray(epoch_us_values), unit='us')).dt.strftime('%Y-%m-%dT%H:%M:%S.%f')
+
+class ColumnarTable:
+    """
+    Read-only set of equally long named columns (usually memory-mapped from a store).
+    Supports the subset of the DataFrame interface used by the pipeline: len(), .columns and table[name].
+    Columns are returned as NumPy arrays/views, never copied.
+    """
+    def __init__(self, column_arrays, column_kinds, segment_offsets=None, segment_labels=None):
+        self._column_arrays = column_arrays
+        self.column_kinds = column_kinds
+        self.columns = list(column_arrays.keys())
+        # segment i spans rows segment_offsets[i] : segment_offsets[i + 1]
+        self.segment_offsets = segment_offsets
+        self.segment_labels = segment_labels
+
+    def __len__(self):
+        if not self._column_arrays:
+            return 0
+        return len(next(iter(self._column_arrays.values())))
+
+    def __getitem__(self, column_name):
+        return self._column_arrays[column_name]
+
+    def __contains__(self, column_name):
+        return column_name in self._column_arrays
+
+    @property
+    def num_segments(self):
+        return 0 if self.segment_offsets is None else len(self.segment_offsets) - 1
+
+    def slice_rows(self, start, stop):
+        """Row range view of every column (segment index is not carried over)."""
+        return ColumnarTable({name: values[start:stop] for name, values in self._column_arrays.items()}, self.column_kinds)
+
+    def iter_row_chunks(self, chunk_rows):
+        for chunk_start in range(0, len(self), chunk_rows):
+            yield self.slice_rows(chunk_start, chunk_start + chunk_rows)
+
+    def get_segment(self, segment_number):
+        """Row view of one segment of the index."""
+        return self.slice_rows(self.segment_offsets[segment_number], self.segment_offsets[segment_number + 1])
+
+    def as_matrix(self, column_names, dtype=None):
+        """Stacks the given columns into a (n_rows, n_columns) array (this one is a copy)."""
+        return np.column_stack([np.asarray(self[name], dtype=dtype) for name in column_names])
+
+    def to_dataframe(self):
+        """Materializes the table as a DataFrame (timestamps are decoded back to ISO strings)."""
+        dataframe_columns = {}
+        for name in self.columns:
+            if self.column_kinds[name] == ColumnarStoreConfig.TIMESTAMP_KIND:
+                dataframe_columns[name] = _decode_timestamps(self[name]).to_numpy()
+            else:
+                dataframe_columns[name] = np.asarray(self[name])
+        return pd.DataFrame(dataframe_columns)
+
+class ColumnarStoreWriter:
+    """
+    Appends row batches to a columnar store directory. Column files are plain appends, so the writer can be fed
+    chunk by chunk (e.g. by the streaming pipeline modes); the manifest is written on close().
+    Column kinds are inferred from the first batch. An inferred integer column that later receives fractional or
+    missing values is widened to float64 (rows already written are rewritten); any other batch that does
+    not fit its column's kind raises ValueError instead of being silently cast.
+    """
+    def __init__(self, store_path, column_kind_overrides=None):
+        self.store_path = store_path
+        self.column_kind_overrides = column_kind_overrides or {}
+        self.column_kinds = None
+        self.column_files = {}
+        self.column_handles = {}
+        self.num_rows = 0
+        self.segment_offsets = [0]
+        self.segment_labels = []
+
+    def _open_columns(self, rows_df):
+        column_kinds = {
+            column_name: self.column_kind_overrides.get(column_name) or _infer_column_kind(rows_df[column_name])
+            for column_name in rows_df.columns
+        } # Inferred before anything is created, so an unsupported column leaves no partial store behind
+        os.makedirs(self.store_path, exist_ok=True)
+        self.column_kinds = column_kinds
+        for column_index, column_name in enumerate(rows_df.columns):
+            self.column_files[column_name] = os.path.join(self.store_path, f'col_{column_index:03d}.bin')
+            self.column_handles[column_name] = open(self.column_files[column_name], 'wb')
+
+    def _widen_column(self, column_name, new_kind):
+        """Rewrites the rows already written for a column with a wider kind and keeps appending in that kind."""
+        self.column_handles[column_name].close()
+        written_values = np.fromfile(self.column_files[column_name], dtype=KIND_DTYPES[self.column_kinds[column_name]])
+        written_values.astype(KIND_DTYPES[new_kind]).tofile(self.column_files[column_name])
+        self.column_handles[column_name] = open(self.column_files[column_name], 'ab')
+        self.column_kinds[column_name] = new_kind
+
+    def _fit_column_kind(self, column_name, values):
+        """Checks a batch against the column's kind, widening inferred integer columns when needed."""
+        column_kind = self.column_kinds[column_name]
+        is_numeric = pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values)
+        if column_kind == ColumnarStoreConfig.TIMESTAMP_KIND:
+            if is_numeric:
+                raise ValueError(f"Column '{column_name}' ({column_kind}) received numeric values")
+            return
+        if not is_numeric:
+            raise ValueError(f"Column '{column_name}' ({column_kind}) received non-numeric values")
+        if column_kind not in ColumnarStoreConfig.INTEGER_KINDS or not pd.api.types.is_float_dtype(values):
+            return
+        float_values = np.asarray(values, dtype=np.float64)
+        if np.all(np.isfinite(float_values)) and np.all(float_values == np.round(float_values)):
+            return # e.g. 3.0: stored exactly as an integer
+        if column_name in self.column_kind_overrides:
+            raise ValueError(f"Column '{column_name}' is stored as {column_kind} but a batch holds fractional or missing values")
+        self._widen_column(column_name, 'float64') # Exact for integers up to 2**53, unlike float32
+
+    def write(self, rows_df, segment_lengths=None):
+        """
+        Appends the rows of a DataFrame (same columns on every call). segment_lengths optionally splits the
+        batch into consecutive segments for the segment/label index (labels are taken from LABEL_COLUMN).
+        """
+        if self.column_kinds is None:
+            self._open_columns(rows_df)
+        for column_name in self.column_handles:
+            self._fit_column_kind(column_name, rows_df[column_name])
+        for column_name, file_handle in self.column_handles.items():
+            _encode_column(rows_df[column_name], self.column_kinds[column_name]).tofile(file_handle)
+
+        if segment_lengths is not None:
+            label_values = rows_df[ColumnarStoreConfig.LABEL_COLUMN].to_numpy() if ColumnarStoreConfig.LABEL_COLUMN in rows_df.columns else None
+            segment_start = 0
+            for segment_length in segment_lengths:
+                self.segment_offsets.append(self.num_rows + segment_start + segment_length)
+                self.segment_labels.append(int(label_values[segment_start]) if label_values is not None else -1)
+                segment_start += segment_length
+        self.num_rows += len(rows_df)
+
+    def close(self):
+        if self.column_kinds is None:
+            return # Nothing was written: no store is created
+        for file_handle in self.column_handles.values():
+            file_handle.close()
+        self.column_handles = {}
+
+        has_segment_index = len(self.segment_labels) > 0
+        if has_segment_index:
+            np.asarray(self.segment_offsets, dtype='<i8').tofile(os.path.join(self.store_path, 'segment_offsets.bin'))
+            np.asarray(self.segment_labels, dtype='<i8').tofile(os.path.join(self.store_path, 'segment_labels.bin'))
+
+        manifest = {
+            'format': ColumnarStoreConfig.FORMAT_NAME,
+            'version': ColumnarStoreConfig.FORMAT_VERSION,
+            'num_rows': self.num_rows,
+            'columns': [
+                {'name': column_name, 'kind': kind, 'file': f'col_{column_index:03d}.bin'}
+                for column_index, (column_name, kind) in enumerate(self.column_kinds.items())
+            ],
+            'num_segments': len(self.segment_labels) if has_segment_index else None,
+        }
+        with open(os.path.join(self.store_path, ColumnarStoreConfig.MANIFEST_FILENAME), 'w') as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+        self.column_kinds = None
+
+def write_columnar_store(store_path, dataframe, segment_lengths=None, column_kind_overrides=None):
+    """Writes a whole DataFrame as a columnar store."""
+    store_writer = ColumnarStoreWriter(store_path, column_kind_overrides)
+    try:
+        store_writer.write(dataframe, segment_lengths)
+    finally:
+        store_writer.close()
+
+def open_columnar_store(store_path):
+    """Opens a store with every column memory-mapped read-only. Raises FileNotFoundError/ValueError on bad stores."""
+    with open(os.path.join(store_path, ColumnarStoreConfig.MANIFEST_FILENAME)) as manifest_file:
+        manifest = json.load(manifest_file)
+    if manifest.get('format') != ColumnarStoreConfig.FORMAT_NAME or manifest.get('version') != ColumnarStoreConfig.FORMAT_VERSION:
+        raise ValueError(f"Unsupported columnar store format in '{store_path}': {manifest.get('format')} v{manifest.get('version')}")
+
+    def map_file(filename, dtype, length):
+        if length == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(os.path.join(store_path, filename), dtype=dtype, mode='r', shape=(length,))
+
+    num_rows = manifest['num_rows']
+    column_arrays = {}
+    column_kinds = {}
+    for column_spec in manifest['columns']:
+        column_arrays[column_spec['name']] = map_file(column_spec['file'], KIND_DTYPES[column_spec['kind']], num_rows)
+        column_kinds[column_spec['name']] = column_spec['kind']
+
+    segment_offsets = segment_labels = None
+    if manifest.get('num_segments'):
+        segment_offsets = map_file('segment_offsets.bin', '<i8', manifest['num_segments'] + 1)
+        segment_labels = map_file('segment_labels.bin', '<i8', manifest['num_segments'])
+    return ColumnarTable(column_arrays, column_kinds, segment_offsets, segment_labels)
+
+def load_table(path):
+    """Loads a pipeline artifact from either a CSV file or a columnar store, based on its path."""
+    if is_columnar_store_path(path):
+        return open_columnar_store(path)
+    return pd.read_csv(path)
+
+# --- CSV Conversion ---
+def label_from_segment_path(segment_path):
+    label_match = re.search(ColumnarStoreConfig.SEGMENT_LABEL_PATTERN, os.path.basename(segment_path))
+    if label_match:
+        return int(label_match.group(1))
+    return ColumnarStoreConfig.SEGMENT_DIR_LABELS.get(os.path.basename(os.path.dirname(segment_path)), -1)
+
+def convert_segments_directory(segments_root_dir, store_path):
+    """Packs every segment CSV under a directory (e.g. dataset_segments/) into one store with a segment index."""
+    segment_paths = sorted(
+        os.path.join(dir_path, filename)
+        for dir_path, _, filenames in os.walk(segments_root_dir)
+        for filename in filenames if filename.endswith('.csv')
+    )
+    store_writer = ColumnarStoreWriter(store_path)
+    try:
+        for segment_path in segment_paths:
+            segment_df = pd.read_csv(segment_path)
+            if ColumnarStoreConfig.LABEL_COLUMN not in segment_df.columns:
+                segment_df[ColumnarStoreConfig.LABEL_COLUMN] = label_from_segment_path(segment_path)
+            store_writer.write(segment_df, segment_lengths=[len(segment_df)])
+    finally:
+        store_writer.close()
+    print(f"Converted {len(segment_paths)} segment files from '{segments_root_dir}' into '{store_path}' ({store_writer.num_rows} rows)")
+
+def convert_csv_file(csv_path, store_path, chunk_rows=100000):
+    """Converts one CSV artifact (raw log, master dataset or feature dataset) chunk by chunk."""
+    store_writer = ColumnarStoreWriter(store_path)
+    try:
+        for chunk_df in pd.read_csv(csv_path, chunksize=chunk_rows):
+            store_writer.write(chunk_df)
+    finally:
+        store_writer.close()
+    print(f"Converted '{csv_path}' into '{store_path}' ({store_writer.num_rows} rows)")
+
+def export_store_to_csv(store_path, csv_path):
+    open_columnar_store(store_path).to_dataframe().to_csv(csv_path, index=False)
+    print(f"Exported '{store_path}' to '{csv_path}'")
+
+def describe_store(store_path):
+    store_table = open_columnar_store(store_path)
+    print(f"Store: {store_path} ({len(store_table)} rows, {store_table.num_segments} indexed segments)")
+    for column_name in store_table.columns:
+        print(f"  {column_name}: {store_table.column_kinds[column_name]}")
+
+def execute_columnar_conversion_tool():
+    parser = argparse.ArgumentParser(description="Convert pipeline CSV datasets to/from the columnar binary format.")
+    subcommands = parser.add_subparsers(dest='command', required=True)
+    convert_parser = subcommands.add_parser('convert', help="CSV file or directory of segment CSVs -> columnar store")
+    convert_parser.add_argument('source')
+    convert_parser.add_argument('store')
+    export_parser = subcommands.add_parser('export', help="columnar store -> CSV file")
+    export_parser.add_argument('store')
+    export_parser.add_argument('csv')
+    info_parser = subcommands.add_parser('info', help="print the schema of a columnar store")
+    info_parser.add_argument('store')
+    arguments = parser.parse_args()
+
+    if arguments.command == 'convert':
+        if os.path.isdir(arguments.source):
+            convert_segments_directory(arguments.source, arguments.store)
+        else:
+            convert_csv_file(arguments.source, arguments.store)
+    elif arguments.command == 'export':
+        export_store_to_csv(arguments.store, arguments.csv)
+    else:
+        describe_store(arguments.store)
+
+if __name__ == '__main__':
+    execute_columnar_conversion_tool()
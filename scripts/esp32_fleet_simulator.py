@@ -0,0 +1,350 @@
+import argparse
+import asyncio
+import json
+import os
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from segment_catalog import SegmentCatalog
+from window_inference import WindowClassifier
+
+# --- Configuration of the ESP32 fleet simulator (load generator for servidor_alertas_esp_v2.py) ---
+class FleetSimulatorConfig:
+    SERVER_HOST = "127.0.0.1"
+    SERVER_PORT = 8081                    # ServerConfig.LISTEN_PORT
+    ALERT_ENDPOINT_PATH = "/incoming_alert"
+    EVENT_TYPE = "TremorDetected_DT_V3"   # As sent by firmware_v2/detector_serial_v2
+
+    # Firmware behavior: 50-sample windows at 50 Hz (one classification per second), a new connection per alert,
+    # sampling paused while the request is in flight, HTTPClient's default 5 s connect and read timeouts
+    WINDOW_SAMPLES = 50
+    SAMPLE_RATE_HZ = 50
+    REQUEST_TIMEOUT_S = 5.0
+
+    NUM_DEVICES = 1000
+    STAGE_DURATION_S = 30.0
+    NUM_PROCESSES = 1                     # Worker processes sharing the devices (one event loop each)
+    USE_SOURCE_IPS = True                 # Device i connects from its own 127.1.x.y address (Linux routes all of 127/8 to loopback)
+
+    # Replayed windows: drawn from dataset_segments through the segment catalog, classified once by the deployed model
+    SEGMENTS_ROOT_DIR = '../dataset_segments'
+    CATALOG_PATH = '../dataset_segments/segment_catalog.db'
+    MODEL_PATH = '../decision_tree_parametros/decision_tree_flat.npz'
+    SAMPLE_COLUMNS = ['accel_x', 'accel_y', 'accel_z']
+    MAX_REPLAY_WINDOWS_PER_LABEL = 2000
+
+    # Simulated quakes: most of the fleet replays tremor windows at once, producing correlated alert bursts
+    QUAKE_MEAN_INTERVAL_S = 20.0
+    QUAKE_DURATION_RANGE_S = (4.0, 12.0)
+    QUAKE_AFFECTED_FRACTION = 0.8
+    QUAKE_ARRIVAL_SPREAD_S = 3.0          # Devices farther from the epicenter start shaking up to this much later
+
+    # Breaking point of a ramp: the first stage exceeding either limit
+    MAX_ERROR_RATE = 0.01
+    MAX_P99_LATENCY_MS = 1000.0           # Beyond one window period devices fall behind real time
+    MAX_LOOP_LAG_MS = 50.0                # Above this the generator itself is saturated (add --processes)
+    LAG_PROBE_INTERVAL_S = 0.01
+    RANDOM_SEED = 7
+
+def config_with_overrides(config_overrides=None):
+    """FleetSimulatorConfig with command line values applied (a plain dict, so it can be sent to worker processes)."""
+    return type('FleetRunConfig', (FleetSimulatorConfig,), dict(config_overrides or {}))
+
+def device_source_ip(device_number):
+    return f"127.1.{device_number // 250}.{device_number % 250 + 1}"
+
+def build_firmware_request(config=FleetSimulatorConfig):
+    """Request bytes as written by the ESP32 HTTPClient for dispatchTremorNotificationHTTP()."""
+    return (f"GET {config.ALERT_ENDPOINT_PATH}?event_type={config.EVENT_TYPE} HTTP/1.1\r\n"
+            f"Host: {config.SERVER_HOST}:{config.SERVER_PORT}\r\n"
+            "User-Agent: ESP32HTTPClient\r\n"
+            "Connection: keep-alive\r\n"
+            "Accept-Encoding: identity;q=1,chunked;q=0.1,*;q=0\r\n\r\n").encode("latin-1")
+
+def load_replay_predictions(config=FleetSimulatorConfig, random_seed=FleetSimulatorConfig.RANDOM_SEED):
+    """
+    Model predictions of non-overlapping windows (the firmware's windowing) of the no-tremor and tremor segments.
+    A simulated device replays these: it alerts whenever the window it is 'sampling' was classified as tremor.
+    Returns (quiet_predictions, quake_predictions), or None when the segments cannot be read or a class has no windows.
+    """
+    try:
+        with SegmentCatalog(config.CATALOG_PATH, config.SEGMENTS_ROOT_DIR) as segment_catalog:
+            segment_catalog.refresh()
+            segment_ids, labels, first_rows = segment_catalog.balanced_windows(
+                config.MAX_REPLAY_WINDOWS_PER_LABEL, config.WINDOW_SAMPLES, config.WINDOW_SAMPLES, random_seed)
+            sample_windows = np.stack([
+                segment_catalog.read_rows(segment_id, first_row, config.WINDOW_SAMPLES)[config.SAMPLE_COLUMNS].to_numpy(dtype=np.float64)
+                for segment_id, first_row in zip(segment_ids, first_rows)
+            ]) if len(segment_ids) else np.zeros((0, config.WINDOW_SAMPLES, len(config.SAMPLE_COLUMNS)))
+    except (OSError, KeyError) as e:
+        print(f"ERROR: Could not read replay windows from '{config.SEGMENTS_ROOT_DIR}': {e}")
+        return None
+    if not len(sample_windows):
+        print(f"ERROR: No windows of {config.WINDOW_SAMPLES} samples found under '{config.SEGMENTS_ROOT_DIR}'.")
+        return None
+
+    try:
+        window_predictions = WindowClassifier.from_flat_model_file(config.MODEL_PATH).predict_windows(sample_windows).astype(np.int64)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Warning: Model '{config.MODEL_PATH}' not loaded ({e}); devices alert on the segment labels instead.")
+        window_predictions = labels
+    quiet_predictions, quake_predictions = window_predictions[labels == 0], window_predictions[labels == 1]
+    if not len(quiet_predictions) or not len(quake_predictions):
+        # Devices draw from both pools (quiet outside quakes, tremor during them); an empty one cannot be replayed
+        print(f"ERROR: Replay needs windows of both classes under '{config.SEGMENTS_ROOT_DIR}' "
+              f"(found {len(quiet_predictions)} no-tremor, {len(quake_predictions)} tremor).")
+        return None
+    print(f"Replay windows: {len(quiet_predictions)} no-tremor (model alerts on {quiet_predictions.mean():.1%}), "
+          f"{len(quake_predictions)} tremor (model alerts on {quake_predictions.mean():.1%})")
+    return quiet_predictions, quake_predictions
+
+def build_quake_schedule(num_devices, duration_s, rng, config=FleetSimulatorConfig):
+    """
+    Quakes of a stage: (quake_starts, quake_ends) in seconds from the stage start, and each device's arrival delay
+    per quake (num_quakes x num_devices, NaN for devices the quake does not reach).
+    """
+    quake_starts = []
+    next_start = rng.exponential(config.QUAKE_MEAN_INTERVAL_S)
+    while next_start < duration_s:
+        quake_starts.append(next_start)
+        next_start += rng.exponential(config.QUAKE_MEAN_INTERVAL_S)
+    quake_starts = np.array(quake_starts)
+    quake_ends = quake_starts + rng.uniform(*config.QUAKE_DURATION_RANGE_S, size=len(quake_starts))
+    arrival_delays = rng.uniform(0.0, config.QUAKE_ARRIVAL_SPREAD_S, size=(len(quake_starts), num_devices))
+    arrival_delays[rng.random((len(quake_starts), num_devices)) >= config.QUAKE_AFFECTED_FRACTION] = np.nan
+    return quake_starts, quake_ends, arrival_delays
+
+class _WorkerResults:
+    def __init__(self):
+        self.windows = 0
+        self.latencies_s = []
+        self.during_quake = []
+        self.errors = {}
+        self.loop_lags_s = []
+
+    def count_error(self, error_kind):
+        self.errors[error_kind] = self.errors.get(error_kind, 0) + 1
+
+async def _send_alert(config, source_ip, request_bytes):
+    """One alert the way the firmware sends it: connect, GET, read the response, close. Returns the HTTP status."""
+    async with asyncio.timeout(config.REQUEST_TIMEOUT_S):
+        reader, writer = await asyncio.open_connection(
+            config.SERVER_HOST, config.SERVER_PORT, local_addr=(source_ip, 0) if source_ip else None)
+    try:
+        writer.write(request_bytes)
+        async with asyncio.timeout(config.REQUEST_TIMEOUT_S):
+            header_block = await reader.readuntil(b"\r\n\r\n")
+            header_lines = header_block.decode("latin-1").split("\r\n")
+            content_length = next((int(line.split(":", 1)[1]) for line in header_lines if line.lower().startswith("content-length:")), 0)
+            await reader.readexactly(content_length)
+        return int(header_lines[0].split()[1])
+    finally:
+        writer.close()
+
+async def _simulate_device(device_number, config, replay_predictions, quake_windows, stage_start, stage_end, request_bytes, rng, worker_results):
+    """Windows end every 1/SAMPLE_RATE_HZ * WINDOW_SAMPLES seconds; an alert request delays the next window like the blocking firmware loop."""
+    loop = asyncio.get_running_loop()
+    quiet_predictions, quake_predictions = replay_predictions
+    window_period_s = config.WINDOW_SAMPLES / config.SAMPLE_RATE_HZ
+    source_ip = device_source_ip(device_number) if config.USE_SOURCE_IPS else None
+    window_end = stage_start + rng.uniform(0.0, window_period_s) # Devices are not synchronized
+    while True:
+        window_end += window_period_s
+        if window_end >= stage_end:
+            break
+        await asyncio.sleep(window_end - loop.time())
+        window_middle = window_end - window_period_s / 2
+        in_quake = any(quake_start <= window_middle < quake_end for quake_start, quake_end in quake_windows)
+        prediction_pool = quake_predictions if in_quake else quiet_predictions
+        worker_results.windows += 1
+        if prediction_pool[rng.integers(len(prediction_pool))] != 1:
+            continue
+
+        request_started = loop.time()
+        try:
+            status_code = await _send_alert(config, source_ip, request_bytes)
+            if status_code == 200:
+                worker_results.latencies_s.append(loop.time() - request_started)
+                worker_results.during_quake.append(in_quake)
+            else:
+                worker_results.count_error(f"http_{status_code}")
+        except TimeoutError:
+            worker_results.count_error("timeout")
+        except ConnectionRefusedError:
+            worker_results.count_error("refused")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            worker_results.count_error("reset")
+        except (OSError, ValueError, IndexError, asyncio.LimitOverrunError):
+            worker_results.count_error("other")
+        window_end = loop.time() # Sampling resumes only once the request has returned
+
+async def _probe_loop_lag(stage_end, probe_interval_s, worker_results):
+    loop = asyncio.get_running_loop()
+    while loop.time() < stage_end:
+        probe_due = loop.time() + probe_interval_s
+        await asyncio.sleep(probe_interval_s)
+        worker_results.loop_lags_s.append(loop.time() - probe_due)
+
+async def _run_devices(device_numbers, config, replay_predictions, quake_schedule, stage_start_wall, duration_s, random_seed):
+    loop = asyncio.get_running_loop()
+    stage_start = loop.time() + (stage_start_wall - time.time())
+    stage_end = stage_start + duration_s
+    quake_starts, quake_ends, arrival_delays = quake_schedule
+    request_bytes = build_firmware_request(config)
+    worker_results = _WorkerResults()
+    device_tasks = []
+    for device_position, device_number in enumerate(device_numbers):
+        quake_windows = [
+            (stage_start + quake_start + arrival_delay, stage_start + quake_end + arrival_delay)
+            for quake_start, quake_end, arrival_delay in zip(quake_starts, quake_ends, arrival_delays[:, device_position])
+            if not np.isnan(arrival_delay)
+        ]
+        device_rng = np.random.default_rng((random_seed, device_number))
+        device_tasks.append(_simulate_device(device_number, config, replay_predictions, quake_windows, stage_start, stage_end,
+                                             request_bytes, device_rng, worker_results))
+    await asyncio.gather(_probe_loop_lag(stage_end, config.LAG_PROBE_INTERVAL_S, worker_results), *device_tasks)
+    return worker_results
+
+def run_fleet_worker(device_numbers, config_overrides, replay_predictions, quake_schedule, stage_start_wall, duration_s, random_seed):
+    """Runs a share of the fleet in this process. Returns the raw counters and samples for merging."""
+    config = config_with_overrides(config_overrides)
+    worker_results = asyncio.run(_run_devices(device_numbers, config, replay_predictions, quake_schedule, stage_start_wall, duration_s, random_seed))
+    return {
+        'windows': worker_results.windows,
+        'latencies_s': np.array(worker_results.latencies_s),
+        'during_quake': np.array(worker_results.during_quake, dtype=bool),
+        'errors': worker_results.errors,
+        'loop_lags_s': np.array(worker_results.loop_lags_s),
+    }
+
+def _raise_open_file_limit(num_devices):
+    soft_limit, hard_limit = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted_limit = hard_limit if hard_limit == resource.RLIM_INFINITY else min(hard_limit, max(soft_limit, num_devices + 1024))
+    if wanted_limit > soft_limit:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (wanted_limit, hard_limit))
+    if num_devices + 256 > wanted_limit:
+        print(f"Warning: open file limit {wanted_limit} is close to the number of devices ({num_devices}); connections may fail locally.")
+
+def _percentile_ms(latencies_s, fraction):
+    return float(np.percentile(latencies_s, fraction * 100) * 1000.0) if len(latencies_s) else None
+
+def run_fleet_stage(num_devices, duration_s, num_processes, replay_predictions, config_overrides=None, random_seed=FleetSimulatorConfig.RANDOM_SEED):
+    """Simulates num_devices devices for duration_s seconds and returns the stage summary."""
+    config = config_with_overrides(config_overrides)
+    rng = np.random.default_rng((random_seed, num_devices))
+    quake_schedule = build_quake_schedule(num_devices, duration_s, rng, config)
+    device_numbers = np.arange(num_devices)
+    stage_start_wall = time.time() + 0.5 + 0.5 * num_processes # Every worker has created its devices by then
+    if num_processes <= 1:
+        worker_outputs = [run_fleet_worker(device_numbers, config_overrides, replay_predictions, quake_schedule, stage_start_wall, duration_s, random_seed)]
+    else:
+        with ProcessPoolExecutor(max_workers=num_processes) as executor:
+            worker_futures = [
+                executor.submit(run_fleet_worker, device_numbers[worker_devices], config_overrides, replay_predictions,
+                                (quake_schedule[0], quake_schedule[1], quake_schedule[2][:, worker_devices]),
+                                stage_start_wall, duration_s, random_seed)
+                for worker_devices in np.array_split(np.arange(num_devices), num_processes)
+            ]
+            worker_outputs = [worker_future.result() for worker_future in worker_futures]
+
+    latencies_s = np.concatenate([worker_output['latencies_s'] for worker_output in worker_outputs])
+    during_quake = np.concatenate([worker_output['during_quake'] for worker_output in worker_outputs])
+    loop_lags_s = np.concatenate([worker_output['loop_lags_s'] for worker_output in worker_outputs])
+    error_counts = {}
+    for worker_output in worker_outputs:
+        for error_kind, error_count in worker_output['errors'].items():
+            error_counts[error_kind] = error_counts.get(error_kind, 0) + error_count
+    failed_alerts = sum(error_counts.values())
+    attempted_alerts = len(latencies_s) + failed_alerts
+    return {
+        'devices': num_devices,
+        'processes': num_processes,
+        'seconds': duration_s,
+        'quakes': len(quake_schedule[0]),
+        'windows': sum(worker_output['windows'] for worker_output in worker_outputs),
+        'alerts_attempted': attempted_alerts,
+        'alerts_ok': len(latencies_s),
+        'alerts_per_s': len(latencies_s) / duration_s,
+        'error_rate': failed_alerts / attempted_alerts if attempted_alerts else 0.0,
+        'errors': error_counts,
+        'latency_p50_ms': _percentile_ms(latencies_s, 0.50),
+        'latency_p90_ms': _percentile_ms(latencies_s, 0.90),
+        'latency_p99_ms': _percentile_ms(latencies_s, 0.99),
+        'latency_max_ms': float(latencies_s.max() * 1000.0) if len(latencies_s) else None,
+        'quake_latency_p99_ms': _percentile_ms(latencies_s[during_quake], 0.99),
+        'client_loop_lag_p99_ms': _percentile_ms(loop_lags_s, 0.99),
+    }
+
+def _format_ms(value_ms):
+    return "-" if value_ms is None else f"{value_ms:.1f}"
+
+def print_stage_result(stage_result):
+    error_details = ", ".join(f"{error_kind} {error_count}" for error_kind, error_count in sorted(stage_result['errors'].items())) or "none"
+    print(f"{stage_result['devices']:>6} devices: {stage_result['alerts_attempted']} alerts from {stage_result['windows']} windows "
+          f"({stage_result['quakes']} quakes), {stage_result['alerts_per_s']:.0f} ok/s, error rate {stage_result['error_rate']:.2%} ({error_details})")
+    print(f"        latency ms p50 {_format_ms(stage_result['latency_p50_ms'])}, p90 {_format_ms(stage_result['latency_p90_ms'])}, "
+          f"p99 {_format_ms(stage_result['latency_p99_ms'])}, max {_format_ms(stage_result['latency_max_ms'])}, "
+          f"p99 during quakes {_format_ms(stage_result['quake_latency_p99_ms'])}; client loop lag p99 {_format_ms(stage_result['client_loop_lag_p99_ms'])}")
+
+def stage_exceeds_limits(stage_result, config=FleetSimulatorConfig):
+    return (stage_result['error_rate'] > config.MAX_ERROR_RATE
+            or (stage_result['latency_p99_ms'] or 0.0) > config.MAX_P99_LATENCY_MS)
+
+def execute_fleet_simulation():
+    parser = argparse.ArgumentParser(description="Simulate a fleet of ESP32 detectors sending alerts to the alert server and report its throughput and latency.")
+    parser.add_argument('--host', default=FleetSimulatorConfig.SERVER_HOST)
+    parser.add_argument('--port', type=int, default=FleetSimulatorConfig.SERVER_PORT)
+    parser.add_argument('--devices', type=int, nargs='+', default=[FleetSimulatorConfig.NUM_DEVICES],
+                        help="fleet size; several values run a ramp that stops at the first stage over the error-rate or p99 limit")
+    parser.add_argument('--duration', type=float, default=FleetSimulatorConfig.STAGE_DURATION_S, help="seconds per stage")
+    parser.add_argument('--processes', type=int, default=FleetSimulatorConfig.NUM_PROCESSES)
+    parser.add_argument('--quake-interval', type=float, default=FleetSimulatorConfig.QUAKE_MEAN_INTERVAL_S, help="mean seconds between simulated quakes")
+    parser.add_argument('--single-source-ip', action='store_true', help="connect every device from the default address (non-Linux hosts)")
+    parser.add_argument('--seed', type=int, default=FleetSimulatorConfig.RANDOM_SEED)
+    parser.add_argument('--output', help="write the stage results to this JSON file")
+    arguments = parser.parse_args()
+
+    config_overrides = {
+        'SERVER_HOST': arguments.host,
+        'SERVER_PORT': arguments.port,
+        'QUAKE_MEAN_INTERVAL_S': arguments.quake_interval,
+        'USE_SOURCE_IPS': not arguments.single_source_ip,
+    }
+    RunConfig = config_with_overrides(config_overrides)
+
+    replay_predictions = load_replay_predictions(RunConfig, arguments.seed)
+    if replay_predictions is None:
+        return
+    _raise_open_file_limit(max(arguments.devices) // max(arguments.processes, 1))
+
+    stage_results = []
+    breaking_stage = None
+    for num_devices in arguments.devices:
+        stage_result = run_fleet_stage(num_devices, arguments.duration, arguments.processes, replay_predictions, config_overrides, arguments.seed)
+        stage_results.append(stage_result)
+        print_stage_result(stage_result)
+        if (stage_result['client_loop_lag_p99_ms'] or 0.0) > RunConfig.MAX_LOOP_LAG_MS:
+            print(f"Warning: client event loop lag p99 above {RunConfig.MAX_LOOP_LAG_MS:.0f} ms, the simulator is the bottleneck "
+                  f"of this stage; run it with more --processes.")
+        if stage_exceeds_limits(stage_result, RunConfig):
+            breaking_stage = stage_result
+            break
+
+    if len(arguments.devices) > 1:
+        if breaking_stage is None:
+            print(f"No breaking point up to {arguments.devices[-1]} devices (error rate <= {RunConfig.MAX_ERROR_RATE:.0%}, p99 <= {RunConfig.MAX_P99_LATENCY_MS:.0f} ms).")
+        else:
+            last_good = stage_results[-2]['devices'] if len(stage_results) > 1 else 0
+            print(f"Breaking point: between {last_good} and {breaking_stage['devices']} devices.")
+    if arguments.output:
+        output_dir = os.path.dirname(arguments.output)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        with open(arguments.output, 'w') as output_file:
+            json.dump({'stages': stage_results}, output_file, indent=2)
+        print(f"Stage results written to '{arguments.output}'")
+
+if __name__ == '__main__':
+    execute_fleet_simulation()
@@ -1,5 +1,8 @@
 import os
+import numpy as np
 import pandas as pd
+from columnar_store import ColumnarStoreWriter, is_columnar_store_path, write_columnar_store
+from stage_profiler import StageProfiler
 
 # --- Configuration for Segment Extraction ---
 class ExtractionConfig:
@@ -10,7 +13,7 @@ class ExtractionConfig:
     # Output directories and final file
     BASE_SEGMENT_OUTPUT_DIR = 'extracted_data_segments' # Renamed
     # Subdirectory names will be generated (e.g., 'no_tremor_segments', 'tremor_segments')
-    FINAL_LABELED_DATASET_FILENAME = 'master_feature_ready_dataset.csv' # Renamed
+    FINAL_LABELED_DATASET_FILENAME = 'master_feature_ready_dataset.csv' # Renamed (use a '.cols' name for the columnar binary format)
 
     # Column names (must match CSV from refactored marker_data_collector.py)
     TIMESTAMP_COLUMN = 'timestamp_pc'
@@ -29,11 +32,75 @@ class ExtractionConfig:
     LABEL_FOR_NO_TREMOR = 0
     LABEL_FOR_TREMOR = 1
 
+    # Out-of-core mode: read the raw logs in bounded chunks instead of loading them whole
+    USE_STREAMING_MODE = False
+    STREAMING_CHUNK_ROWS = 100000
+
+    # Stage instrumentation (see stage_profiler.py): wall/CPU time, rows, rows/s and peak RSS of every stage
+    ENABLE_STAGE_PROFILING = False
+    PROFILER_MODE = None       # Whole-run code profile: None, 'cprofile' or 'sampling' (needs ENABLE_STAGE_PROFILING)
+    PROFILE_OUTPUT_PATH = None # e.g. 'extraction.prof' (cProfile) or 'extraction.folded' (sampling, collapsed stacks)
+    STAGE_REPORT_PATH = None   # JSON file with the stage records
+
+class EventMarkerPairer:
+    """Pairs START/END event markers, keeping an open event across successive blocks of rows."""
+    def __init__(self, config_obj, source_name):
+        self.config = config_obj
+        self.source_name = source_name
+        self.currently_in_event = False
+        self.segment_start_index_val = -1
+
+    def feed(self, marker_values, row_offset=0):
+        """
+        Locates START/END markers in one pass and pairs them, visiting only the marker rows.
+        Yields (start_row, end_row) absolute positions, both inclusive, as soon as each pair is closed.
+        """
+        marker_positions = np.flatnonzero(
+            (marker_values == self.config.MARKER_FOR_EVENT_START) | (marker_values == self.config.MARKER_FOR_EVENT_END)
+        )
+        for local_idx in marker_positions:
+            idx = row_offset + local_idx
+            if marker_values[local_idx] == self.config.MARKER_FOR_EVENT_START:
+                if self.currently_in_event:
+                    print(f"Warning in {self.source_name} [row {idx+2}]: New START marker found within an active event. Previous start is overridden.")
+                self.segment_start_index_val = idx
+                self.currently_in_event = True
+            elif self.currently_in_event:
+                # Segment includes the end marker row
+                yield self.segment_start_index_val, idx
+                self.currently_in_event = False
+                self.segment_start_index_val = -1
+            else:
+                print(f"Warning in {self.source_name} [row {idx+2}]: END marker found without a preceding START marker. Ignoring.")
+
+    def finish(self):
+        if self.currently_in_event:
+            print(f"Warning for {self.source_name}: File ended while an event was still active (START marker without corresponding END). This final partial segment was not saved.")
+
+class IncrementalCsvWriter:
+    """Appends DataFrames to one CSV file, opening it (and writing the header) only when the first rows arrive."""
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.file_handle = None
+
+    def write(self, rows_df, segment_lengths=None):
+        """Appends rows; segment_lengths is accepted for interface parity with ColumnarStoreWriter (CSV has no segment index)."""
+        write_header = self.file_handle is None
+        if write_header:
+            self.file_handle = open(self.output_path, 'w', newline='')
+        rows_df.to_csv(self.file_handle, header=write_header, index=False)
+
+    def close(self):
+        if self.file_handle:
+            self.file_handle.close()
+            self.file_handle = None
+
 class SegmentProcessor:
     def __init__(self, config_obj):
         self.config = config_obj
         self.output_dir_no_tremor = os.path.join(self.config.BASE_SEGMENT_OUTPUT_DIR, 'no_tremor_events')
         self.output_dir_tremor = os.path.join(self.config.BASE_SEGMENT_OUTPUT_DIR, 'tremor_events')
+        self.profiler = StageProfiler.from_config(config_obj)
         self._create_output_directories()
 
     def _ensure_dir_exists(self, dir_path):
@@ -51,101 +118,196 @@ class SegmentProcessor:
         filename = f"event_class_{event_label}_segment_{segment_num:04d}.csv"
         full_path = os.path.join(output_path, filename)
         
-        # Select only the desired columns for individual segment files
-        data_to_save = segment_dataframe[self.config.COLUMNS_FOR_INDIVIDUAL_SEGMENTS].copy()
-        
-        data_to_save.to_csv(full_path, index=False)
-        print(f"  Segment {segment_num} (label {event_label}) saved: {full_path} ({len(data_to_save)} rows)")
+        # The segment already holds only the columns for individual segment files (no extra copy needed)
+        segment_dataframe.to_csv(full_path, index=False)
+        print(f"  Segment {segment_num} (label {event_label}) saved: {full_path} ({len(segment_dataframe)} rows)")
+
+    def _gather_labeled_rows(self, segment_source_df, segment_bounds, assigned_label):
+        """Builds the master dataset rows of all segments with a single gather per column."""
+        row_positions = np.concatenate([np.arange(start, end + 1) for start, end in segment_bounds])
+        labeled_rows = {
+            column: segment_source_df[column].to_numpy()[row_positions]
+            for column in self.config.COLUMNS_FOR_INDIVIDUAL_SEGMENTS
+        }
+        labeled_rows['label'] = np.full(len(row_positions), assigned_label)
+        return pd.DataFrame(labeled_rows)
 
     def _extract_segments_from_single_file(self, input_csv_filepath, assigned_label, segments_output_dir):
+        """
+        Saves every START/END segment of the file and returns (labeled_rows_df, segment_lengths),
+        where labeled_rows_df holds their rows with a 'label' column (None if there are none).
+        """
         print(f"\nProcessing source file: {input_csv_filepath} with assigned label: {assigned_label}")
-        collected_segments_dfs = []
-        segment_serial_number = 0
 
         try:
-            source_df = pd.read_csv(input_csv_filepath)
+            with self.profiler.stage(f"read_source (label {assigned_label})") as stage:
+                source_df = pd.read_csv(input_csv_filepath)
+                stage.rows = len(source_df)
         except FileNotFoundError:
             print(f"ERROR: Input CSV file not found: {input_csv_filepath}")
-            return collected_segments_dfs
+            return None, []
         except pd.errors.EmptyDataError:
             print(f"WARNING: Input CSV file is empty: {input_csv_filepath}")
-            return collected_segments_dfs
+            return None, []
         except Exception as e:
             print(f"ERROR reading {input_csv_filepath}: {e}")
-            return collected_segments_dfs
+            return None, []
 
         if self.config.EVENT_MARKER_COLUMN not in source_df.columns:
             print(f"ERROR: Event marker column '{self.config.EVENT_MARKER_COLUMN}' not found in {input_csv_filepath}.")
-            return collected_segments_dfs
-
-        currently_in_event = False
-        segment_start_index_val = -1
-
-        for idx, table_row in source_df.iterrows():
-            marker_value = table_row[self.config.EVENT_MARKER_COLUMN]
-
-            if marker_value == self.config.MARKER_FOR_EVENT_START:
-                if currently_in_event:
-                    print(f"Warning in {input_csv_filepath} [row {idx+2}]: New START marker found within an active event. Previous start is overridden.")
-                segment_start_index_val = idx
-                currently_in_event = True
-            
-            elif marker_value == self.config.MARKER_FOR_EVENT_END:
-                if currently_in_event:
-                    # Extract segment including the end marker row
-                    current_segment_df = source_df.iloc[segment_start_index_val : idx + 1].copy()
-                    
-                    if not current_segment_df.empty:
-                        segment_serial_number += 1
-                        self._save_segment_to_file(current_segment_df, segments_output_dir, assigned_label, segment_serial_number)
-                        
-                        # Add label column for the final aggregated dataset
-                        current_segment_df['label'] = assigned_label
-                        # Select columns for the final dataset (data + label)
-                        cols_for_master_dataset = self.config.COLUMNS_FOR_INDIVIDUAL_SEGMENTS + ['label']
-                        collected_segments_dfs.append(current_segment_df[cols_for_master_dataset])
+            return None, []
+
+        segment_source_df = source_df[self.config.COLUMNS_FOR_INDIVIDUAL_SEGMENTS]
+        marker_pairer = EventMarkerPairer(self.config, input_csv_filepath)
+        segment_bounds = []
+        with self.profiler.stage(f"save_segments (label {assigned_label})") as stage:
+            for start_row, end_row in marker_pairer.feed(source_df[self.config.EVENT_MARKER_COLUMN].to_numpy()):
+                segment_bounds.append((start_row, end_row))
+                segment_serial_number = len(segment_bounds)
+                self._save_segment_to_file(segment_source_df.iloc[start_row : end_row + 1], segments_output_dir, assigned_label, segment_serial_number)
+            marker_pairer.finish()
+            segment_lengths = [end_row - start_row + 1 for start_row, end_row in segment_bounds]
+            stage.rows = sum(segment_lengths)
+
+        print(f"Completed processing for {input_csv_filepath}. Total segments extracted: {len(segment_bounds)}.")
+        if not segment_bounds:
+            return None, []
+        with self.profiler.stage(f"gather_labeled_rows (label {assigned_label})") as stage:
+            labeled_rows_df = self._gather_labeled_rows(segment_source_df, segment_bounds, assigned_label)
+            stage.rows = len(labeled_rows_df)
+        return labeled_rows_df, segment_lengths
+
+    def _stream_segments_from_single_file(self, input_csv_filepath, assigned_label, segments_output_dir, master_output, stage_record):
+        """
+        Chunked variant of _extract_segments_from_single_file: saves segments and appends their labeled rows
+        to master_output as they close. Only the rows of a still-open event are carried between chunks.
+        Returns the number of master rows written (stage_record.rows counts the source rows read).
+        """
+        print(f"\nStreaming source file: {input_csv_filepath} with assigned label: {assigned_label} (chunks of {self.config.STREAMING_CHUNK_ROWS} rows)")
+        marker_pairer = EventMarkerPairer(self.config, input_csv_filepath)
+        open_event_pieces = [] # Rows of the open event that belong to previous chunks
+        segment_serial_number = 0
+        master_rows_written = 0
+        row_offset = 0
+
+        try:
+            chunk_reader = pd.read_csv(input_csv_filepath, chunksize=self.config.STREAMING_CHUNK_ROWS)
+            for chunk_df in chunk_reader:
+                if self.config.EVENT_MARKER_COLUMN not in chunk_df.columns:
+                    print(f"ERROR: Event marker column '{self.config.EVENT_MARKER_COLUMN}' not found in {input_csv_filepath}.")
+                    return master_rows_written
+
+                segment_source_df = chunk_df[self.config.COLUMNS_FOR_INDIVIDUAL_SEGMENTS]
+                for start_row, end_row in marker_pairer.feed(chunk_df[self.config.EVENT_MARKER_COLUMN].to_numpy(), row_offset):
+                    if start_row < row_offset:
+                        segment_df = pd.concat(open_event_pieces + [segment_source_df.iloc[: end_row - row_offset + 1]])
                     else:
-                        print(f"Warning in {input_csv_filepath} [row {idx+2}]: Empty segment detected and ignored.")
-                    
-                    currently_in_event = False
-                    segment_start_index_val = -1 
+                        segment_df = segment_source_df.iloc[start_row - row_offset : end_row - row_offset + 1]
+                    open_event_pieces = []
+                    segment_serial_number += 1
+                    self._save_segment_to_file(segment_df, segments_output_dir, assigned_label, segment_serial_number)
+                    master_output.write(segment_df.assign(label=assigned_label), segment_lengths=[len(segment_df)])
+                    master_rows_written += len(segment_df)
+
+                if not marker_pairer.currently_in_event:
+                    open_event_pieces = []
+                elif marker_pairer.segment_start_index_val >= row_offset:
+                    open_event_pieces = [segment_source_df.iloc[marker_pairer.segment_start_index_val - row_offset :]]
                 else:
-                    print(f"Warning in {input_csv_filepath} [row {idx+2}]: END marker found without a preceding START marker. Ignoring.")
-        
-        if currently_in_event:
-            print(f"Warning for {input_csv_filepath}: File ended while an event was still active (START marker without corresponding END). This final partial segment was not saved.")
+                    open_event_pieces.append(segment_source_df)
+                row_offset += len(chunk_df)
+                stage_record.rows = row_offset
+        except FileNotFoundError:
+            print(f"ERROR: Input CSV file not found: {input_csv_filepath}")
+            return master_rows_written
+        except pd.errors.EmptyDataError:
+            print(f"WARNING: Input CSV file is empty: {input_csv_filepath}")
+            return master_rows_written
+        except Exception as e:
+            print(f"ERROR reading {input_csv_filepath}: {e}")
+            return master_rows_written
 
+        marker_pairer.finish()
         print(f"Completed processing for {input_csv_filepath}. Total segments extracted: {segment_serial_number}.")
-        return collected_segments_dfs
+        return master_rows_written
+
+    def _run_streaming_extraction_pipeline(self):
+        if is_columnar_store_path(self.config.FINAL_LABELED_DATASET_FILENAME):
+            master_output = ColumnarStoreWriter(self.config.FINAL_LABELED_DATASET_FILENAME)
+        else:
+            master_output = IncrementalCsvWriter(self.config.FINAL_LABELED_DATASET_FILENAME)
+        total_rows = 0
+        try:
+            with self.profiler.stage(f"stream_segments (label {self.config.LABEL_FOR_NO_TREMOR})") as stage:
+                total_rows += self._stream_segments_from_single_file(
+                    self.config.NO_TREMOR_SOURCE_FILE,
+                    self.config.LABEL_FOR_NO_TREMOR,
+                    self.output_dir_no_tremor,
+                    master_output,
+                    stage
+                )
+            with self.profiler.stage(f"stream_segments (label {self.config.LABEL_FOR_TREMOR})") as stage:
+                total_rows += self._stream_segments_from_single_file(
+                    self.config.TREMOR_SOURCE_FILE,
+                    self.config.LABEL_FOR_TREMOR,
+                    self.output_dir_tremor,
+                    master_output,
+                    stage
+                )
+        finally:
+            master_output.close()
+
+        if total_rows == 0:
+            print("\nNo segments were extracted from any source files. The final combined dataset cannot be created.")
+            print("Please verify input files and marker consistency.")
+            return
+
+        print(f"\nFinal combined and labeled dataset saved as: {self.config.FINAL_LABELED_DATASET_FILENAME} ({total_rows} total rows)")
+        print(f"Columns in the final dataset: {self.config.COLUMNS_FOR_INDIVIDUAL_SEGMENTS + ['label']}")
+        print("--- Pipeline execution completed. ---")
 
     def run_extraction_pipeline(self):
+        self.profiler.profile_run(self._execute_extraction_pipeline)
+
+    def _execute_extraction_pipeline(self):
         print("--- Commencing Segment Extraction and Labeling Pipeline ---")
+        if self.config.USE_STREAMING_MODE:
+            self._run_streaming_extraction_pipeline()
+            return
 
-        segments_no_tremor_list = self._extract_segments_from_single_file(
+        segments_no_tremor_df, segment_lengths_no_tremor = self._extract_segments_from_single_file(
             self.config.NO_TREMOR_SOURCE_FILE, 
             self.config.LABEL_FOR_NO_TREMOR, 
             self.output_dir_no_tremor
         )
         
-        segments_tremor_list = self._extract_segments_from_single_file(
+        segments_tremor_df, segment_lengths_tremor = self._extract_segments_from_single_file(
             self.config.TREMOR_SOURCE_FILE, 
             self.config.LABEL_FOR_TREMOR, 
             self.output_dir_tremor
         )
 
-        all_extracted_data = segments_no_tremor_list + segments_tremor_list
+        all_extracted_data = [df for df in (segments_no_tremor_df, segments_tremor_df) if df is not None]
 
         if not all_extracted_data:
             print("\nNo segments were extracted from any source files. The final combined dataset cannot be created.")
             print("Please verify input files and marker consistency.")
             return
 
-        master_dataset_df = pd.concat(all_extracted_data, ignore_index=True)
+        with self.profiler.stage("concat_master_dataset") as stage:
+            master_dataset_df = pd.concat(all_extracted_data, ignore_index=True)
+            stage.rows = len(master_dataset_df)
         
         # Optional: Sort by timestamp if global chronological order is desired
         # master_dataset_df = master_dataset_df.sort_values(by=self.config.TIMESTAMP_COLUMN).reset_index(drop=True)
         
-        master_dataset_df.to_csv(self.config.FINAL_LABELED_DATASET_FILENAME, index=False)
+        with self.profiler.stage("write_master_dataset") as stage:
+            if is_columnar_store_path(self.config.FINAL_LABELED_DATASET_FILENAME):
+                # Typed binary columns plus a segment/label index (one entry per extracted segment)
+                write_columnar_store(self.config.FINAL_LABELED_DATASET_FILENAME, master_dataset_df, segment_lengths_no_tremor + segment_lengths_tremor)
+            else:
+                master_dataset_df.to_csv(self.config.FINAL_LABELED_DATASET_FILENAME, index=False)
+            stage.rows = len(master_dataset_df)
         print(f"\nFinal combined and labeled dataset saved as: {self.config.FINAL_LABELED_DATASET_FILENAME} ({len(master_dataset_df)} total rows)")
         print(f"Columns in the final dataset: {list(master_dataset_df.columns)}")
         print("--- Pipeline execution completed. ---")
@@ -0,0 +1,130 @@
+import argparse
+import math
+import os
+import select
+import threading
+import time
+import tty
+import numpy as np
+from sensor_frame_protocol import encode_sensor_frames
+
+# --- Emulated ESP32 data collection board on a pseudo-terminal (for testing the collector without hardware) ---
+class FakeDeviceConfig:
+    SAMPLE_RATE_HZ = 50
+    BANNER_LINES = ["MPU6050 Encontrado!", "", "ESP32 Pronto para Coleta de Dados com Marcadores."]
+
+class PtyFakeSensorDevice:
+    """
+    Speaks like esp32_mpu6050_data_collection.ino on a pty: banner lines, then 'ax,ay,az,marker' lines at
+    sample_rate_hz; 'b'/'e' written to the port are answered with an INFO line and marker 1/2 on the next sample.
+    With binary_frames the samples are sent as binary frames instead (BINARY_FRAME_MODE) and the INFO lines are
+    left out, like the firmware does. device_path is opened like a real port (serial.Serial(device_path, ...)).
+    With malformed_line_interval (ASCII only), a garbled line follows every malformed_line_interval-th sample.
+    """
+    def __init__(self, sample_rate_hz=FakeDeviceConfig.SAMPLE_RATE_HZ, max_samples=None, binary_frames=False, malformed_line_interval=None):
+        self.sample_rate_hz = sample_rate_hz
+        self.max_samples = max_samples
+        self.binary_frames = binary_frames
+        self.malformed_line_interval = malformed_line_interval
+        self.malformed_lines_sent = 0
+        self.master_fd, self.slave_fd = os.openpty()
+        tty.setraw(self.slave_fd) # No echo or newline translation, like a USB-serial port
+        self.device_path = os.ttyname(self.slave_fd)
+        self.samples_sent = 0
+        self.markers_sent = []   # (sample number, marker)
+        self.pending_marker = 0
+        self.stop_requested = threading.Event()
+        self.finished = threading.Event()
+        self.sender_thread = threading.Thread(target=self._run_sender, name="fake-device", daemon=True)
+
+    def start(self):
+        self.sender_thread.start()
+        return self
+
+    def _write(self, text):
+        encoded_text = text.encode() if isinstance(text, str) else text
+        while encoded_text:
+            written_count = os.write(self.master_fd, encoded_text)
+            encoded_text = encoded_text[written_count:]
+
+    def _handle_commands(self):
+        while select.select([self.master_fd], [], [], 0)[0]:
+            for command_byte in os.read(self.master_fd, 64):
+                if command_byte == ord('b'):
+                    self.pending_marker = 1
+                    if not self.binary_frames:
+                        self._write("INFO: Marcador INICIO de evento recebido.\r\n")
+                elif command_byte == ord('e'):
+                    self.pending_marker = 2
+                    if not self.binary_frames:
+                        self._write("INFO: Marcador FIM de evento recebido.\r\n")
+
+    def sample_values(self, sample_number):
+        """Deterministic sample values, so a capture can be checked against what was sent."""
+        phase = sample_number / self.sample_rate_hz
+        return (round(10.2 + 0.3 * math.sin(7.0 * phase), 6), round(0.25 + 0.1 * math.cos(5.0 * phase), 6), round(-2.2 + 0.05 * math.sin(3.0 * phase), 6))
+
+    def _run_sender(self):
+        try:
+            for banner_line in FakeDeviceConfig.BANNER_LINES:
+                self._write(banner_line + "\r\n")
+            start_time = time.monotonic()
+            while not self.stop_requested.is_set() and (self.max_samples is None or self.samples_sent < self.max_samples):
+                self._handle_commands()
+                due_samples = int((time.monotonic() - start_time) * self.sample_rate_hz) + 1
+                if self.max_samples is not None:
+                    due_samples = min(due_samples, self.max_samples)
+                first_sample = self.samples_sent
+                sample_lines, sample_markers = [], []
+                while self.samples_sent < due_samples:
+                    ax, ay, az = self.sample_values(self.samples_sent)
+                    sample_lines.append(f"{ax:.6f},{ay:.6f},{az:.6f},{self.pending_marker}\r\n")
+                    sample_markers.append(self.pending_marker)
+                    if self.pending_marker:
+                        self.markers_sent.append((self.samples_sent, self.pending_marker))
+                        self.pending_marker = 0
+                    self.samples_sent += 1
+                    if self.malformed_line_interval and not self.binary_frames and self.samples_sent % self.malformed_line_interval == 0:
+                        sample_lines.append(f"{ax:.6f},{ay:.3f}\r\n") # A sample line cut short, as after serial noise
+                        self.malformed_lines_sent += 1
+                if sample_lines and self.binary_frames:
+                    sample_numbers = np.arange(first_sample, self.samples_sent)
+                    device_times_us = (sample_numbers * 1e6 / self.sample_rate_hz).astype(np.int64)
+                    accel_values = [self.sample_values(sample_number) for sample_number in range(first_sample, self.samples_sent)]
+                    self._write(encode_sensor_frames(sample_numbers, device_times_us, accel_values, sample_markers))
+                elif sample_lines:
+                    self._write("".join(sample_lines))
+                time.sleep(min(0.01, 1.0 / self.sample_rate_hz))
+        except OSError:
+            pass # Reader side closed
+        finally:
+            self.finished.set()
+
+    def stop(self):
+        self.stop_requested.set()
+        self.sender_thread.join()
+        os.close(self.master_fd)
+        os.close(self.slave_fd)
+
+def execute_fake_device():
+    parser = argparse.ArgumentParser(description="Emulate the ESP32 collection firmware on a pseudo-terminal.")
+    parser.add_argument('--rate', type=float, default=FakeDeviceConfig.SAMPLE_RATE_HZ, help="samples per second")
+    parser.add_argument('--samples', type=int, help="stop after N samples")
+    parser.add_argument('--binary', action='store_true', help="send binary frames (DataCollectorConfig.SERIAL_FRAME_FORMAT = 'binary')")
+    parser.add_argument('--malformed-every', type=int, help="send a garbled line after every N samples (ASCII only)")
+    arguments = parser.parse_args()
+
+    fake_device = PtyFakeSensorDevice(arguments.rate, arguments.samples, arguments.binary, arguments.malformed_every).start()
+    print(f"Fake device streaming {'binary frames' if arguments.binary else 'ASCII lines'} at {arguments.rate:g} Hz on: {fake_device.device_path}")
+    print("Set DataCollectorConfig.SERIAL_DEVICE to this path. Ctrl+C to stop.")
+    try:
+        while not fake_device.finished.wait(1.0):
+            pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fake_device.stop()
+        print(f"Fake device stopped after {fake_device.samples_sent} samples.")
+
+if __name__ == '__main__':
+    execute_fake_device()
@@ -0,0 +1,124 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+import numpy as np
+
+# --- Configuration for the Per-Segment Feature Cache ---
+class FeatureCacheConfig:
+    CACHE_DIR = 'feature_cache'
+    INDEX_FILENAME = 'index.json'
+    MAX_CACHE_BYTES = 256 * 1024 * 1024 # Least recently used entries are evicted above this size
+
+def compute_segment_cache_key(segment_bytes, window_samples, slide_step_samples, feature_set_version):
+    """Content address of a segment's window features: segment content hash + window settings + feature-set version."""
+    content_digest = hashlib.sha256(segment_bytes).hexdigest()
+    settings_tag = f"w{window_samples}-s{slide_step_samples}-v{feature_set_version}"
+    return hashlib.sha256(f"{content_digest}:{settings_tag}".encode('ascii')).hexdigest()
+
+class SegmentFeatureCache:
+    """
+    Persistent on-disk cache of per-segment window feature matrices (one .npy file per key).
+    The index (entry sizes and last access times) is kept in memory and written back by save().
+    """
+    def __init__(self, cache_dir=FeatureCacheConfig.CACHE_DIR, max_cache_bytes=FeatureCacheConfig.MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_cache_bytes = max_cache_bytes
+        self.index_path = os.path.join(cache_dir, FeatureCacheConfig.INDEX_FILENAME)
+        self.entries = {} # key -> {'bytes': int, 'last_access': float}
+        self.total_bytes = 0 # Running sum of the entry sizes (kept in step with entries, so put() stays O(1))
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path) as index_file:
+                self.entries = json.load(index_file)
+        except FileNotFoundError:
+            self.entries = {}
+        except (ValueError, OSError) as e:
+            print(f"Warning: Feature cache index '{self.index_path}' is unreadable ({e}). Starting with an empty cache.")
+            self.entries = {}
+        self.total_bytes = sum(entry['bytes'] for entry in self.entries.values())
+
+    def _entry_path(self, cache_key):
+        return os.path.join(self.cache_dir, f"{cache_key}.npy")
+
+    def get(self, cache_key):
+        """Returns the cached feature matrix for the key, or None on a miss."""
+        if cache_key in self.entries:
+            try:
+                feature_matrix = np.load(self._entry_path(cache_key))
+                self.entries[cache_key]['last_access'] = time.time()
+                self.hits += 1
+                return feature_matrix
+            except (OSError, ValueError):
+                self._forget_entry(cache_key) # Entry file missing or corrupt: recompute it
+        self.misses += 1
+        return None
+
+    def put(self, cache_key, feature_matrix):
+        entry_path = self._entry_path(cache_key)
+        temporary_path = f"{entry_path}.tmp"
+        with open(temporary_path, 'wb') as entry_file:
+            np.save(entry_file, feature_matrix)
+        os.replace(temporary_path, entry_path) # Atomic, so an interrupted run never leaves half-written entries
+        self._forget_entry(cache_key)
+        self.entries[cache_key] = {'bytes': os.path.getsize(entry_path), 'last_access': time.time()}
+        self.total_bytes += self.entries[cache_key]['bytes']
+        self._evict_to_size_limit()
+
+    def _forget_entry(self, cache_key):
+        removed_entry = self.entries.pop(cache_key, None)
+        if removed_entry is not None:
+            self.total_bytes -= removed_entry['bytes']
+
+    def _remove_entry(self, cache_key):
+        self._forget_entry(cache_key)
+        try:
+            os.remove(self._entry_path(cache_key))
+        except FileNotFoundError:
+            pass
+
+    def _evict_to_size_limit(self):
+        if self.total_bytes <= self.max_cache_bytes:
+            return
+        for cache_key in sorted(self.entries, key=lambda key: self.entries[key]['last_access']):
+            if self.total_bytes <= self.max_cache_bytes:
+                break
+            self._remove_entry(cache_key)
+
+    def invalidate(self, cache_keys=None):
+        """Removes the given entries, or every entry when cache_keys is None. Returns the number removed."""
+        keys_to_remove = list(self.entries) if cache_keys is None else [key for key in cache_keys if key in self.entries]
+        for cache_key in keys_to_remove:
+            self._remove_entry(cache_key)
+        self.save()
+        return len(keys_to_remove)
+
+    def save(self):
+        temporary_path = f"{self.index_path}.tmp"
+        with open(temporary_path, 'w') as index_file:
+            json.dump(self.entries, index_file)
+        os.replace(temporary_path, self.index_path)
+
+def execute_feature_cache_tool():
+    parser = argparse.ArgumentParser(description="Inspect or invalidate the per-segment feature cache.")
+    parser.add_argument('command', choices=['stats', 'invalidate'])
+    parser.add_argument('--cache-dir', default=FeatureCacheConfig.CACHE_DIR)
+    parser.add_argument('keys', nargs='*', help="entries to invalidate (default: all)")
+    arguments = parser.parse_args()
+
+    feature_cache = SegmentFeatureCache(arguments.cache_dir)
+    if arguments.command == 'stats':
+        print(f"Feature cache '{arguments.cache_dir}': {len(feature_cache.entries)} entries, "
+              f"{feature_cache.total_bytes / 1024**2:.2f} MB (limit {feature_cache.max_cache_bytes / 1024**2:.0f} MB)")
+    else:
+        removed_count = feature_cache.invalidate(arguments.keys or None)
+        print(f"Invalidated {removed_count} feature cache entries in '{arguments.cache_dir}'.")
+
+if __name__ == '__main__':
+    execute_feature_cache_tool()
@@ -1,11 +1,18 @@
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from columnar_store import ColumnarStoreWriter, is_columnar_store_path, load_table, write_columnar_store
+from feature_cache import SegmentFeatureCache, compute_segment_cache_key
+from stage_profiler import StageProfiler
 
 # --- Configuration for Feature Extraction ---
 class FeatureExtractorConfig:
-    # Input CSV from the refactored segment extraction script
+    # Input CSV from the refactored segment extraction script (a '.cols' path reads the columnar binary format)
     SOURCE_LABELED_DATA_CSV = 'master_feature_ready_dataset.csv' 
-    # Output CSV for the training script
+    # Output CSV for the training script (a '.cols' path writes the columnar binary format)
     FINAL_FEATURES_CSV = 'final_ml_training_features.csv'
 
     # Windowing parameters for feature extraction
@@ -21,10 +28,44 @@ class FeatureExtractorConfig:
     # List of sensor axes columns for iteration
     SENSOR_AXES_COLS = [ACCEL_X_COL, ACCEL_Y_COL, ACCEL_Z_COL]
 
+    # Feature engine selection
+    USE_VECTORIZED_ENGINE = True   # False falls back to the original one-window-at-a-time loop
+    VECTORIZED_BATCH_WINDOWS = 4096 # Windows per batch (bounds the temporary arrays of the vectorized engine)
+
+    # Out-of-core mode: read the labeled dataset in bounded chunks and append feature rows as they are produced
+    USE_STREAMING_MODE = False
+    STREAMING_CHUNK_ROWS = 100000
+
+    # Segment corpus mode: window every per-segment CSV under SEGMENTS_ROOT_DIR on its own (label from its subdirectory)
+    USE_SEGMENT_CORPUS = False
+    SEGMENTS_ROOT_DIR = 'dataset_segments'
+    SEGMENT_LABEL_DIRS = {'no_tremor': 0, 'tremor': 1}
+    # Axis columns of the segment CSVs (dataset_segments/ is written with accel_x/y/z); segments that have
+    # SENSOR_AXES_COLS instead (extract_labeled_segments.py output) are read with those
+    SEGMENT_AXES_COLS = ['accel_x', 'accel_y', 'accel_z']
+    NUM_WORKERS = 1 # Worker processes for the segment corpus mode (0 = one per CPU core)
+    SEGMENTS_PER_TASK = 64 # Upper bound of segments sent to a worker in one task
+
+    # Persistent per-segment feature cache used by the segment corpus mode (see feature_cache.py)
+    USE_FEATURE_CACHE = True
+    FEATURE_CACHE_DIR = 'feature_cache'
+    FEATURE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+    FEATURE_SET_VERSION = 1 # Bump whenever the computed statistics change, so stale cache entries are never reused
+
+    # Stage instrumentation (see stage_profiler.py): wall/CPU time, rows, rows/s and peak RSS of every stage
+    ENABLE_STAGE_PROFILING = False
+    PROFILER_MODE = None       # Whole-run code profile: None, 'cprofile' or 'sampling' (needs ENABLE_STAGE_PROFILING)
+    PROFILE_OUTPUT_PATH = None # e.g. 'features.prof' (cProfile) or 'features.folded' (sampling, collapsed stacks)
+    STAGE_REPORT_PATH = None   # JSON file with the stage records
+
 class FeatureEngineeringPipeline:
+    # Order of the statistics computed for every data stream (must match _calculate_statistical_features)
+    STATISTIC_NAMES = ['mean', 'std_dev', 'variance', 'min_val', 'max_val', 'range_val', 'energy_sum', 'mean_abs_dev']
+
     def __init__(self, fe_config):
         self.config = fe_config
         self.generated_feature_names = [] # To store the order of feature columns
+        self.profiler = StageProfiler.from_config(fe_config)
 
     def _calculate_statistical_features(self, data_series, feature_prefix):
         """Helper to compute a standard set of statistical features for a data series."""
@@ -75,25 +116,160 @@ class FeatureEngineeringPipeline:
 
         return window_features_map
 
+    def _get_stream_prefixes(self):
+        """Short prefixes of the data streams ('x', 'y', 'z' from the axis columns, plus 'svm')."""
+        return [axis_column_name.split('_')[1] for axis_column_name in self.config.SENSOR_AXES_COLS] + ['svm']
+
+    def _build_feature_names(self):
+        """Feature column names in the same order produced by _compute_features_for_window."""
+        feature_names = [f'{prefix}_{statistic}' for prefix in self._get_stream_prefixes() for statistic in self.STATISTIC_NAMES]
+        return feature_names + [self.config.LABEL_COL]
+
+    def _calculate_statistical_features_batch(self, stream_windows):
+        """
+        Vectorized counterpart of _calculate_statistical_features.
+        stream_windows has shape (n_windows, n_streams, window_len) and is usually a strided view.
+        Returns an array of shape (n_windows, n_streams * len(STATISTIC_NAMES)).
+        """
+        # Reducing a contiguous batch keeps NumPy's summation order independent of the batch layout and size,
+        # so every engine (loop, vectorized, streaming) produces bit-identical values
+        stream_windows = np.ascontiguousarray(stream_windows)
+        window_means = stream_windows.mean(axis=-1)
+        deviations = stream_windows - window_means[..., np.newaxis]
+        window_variances = np.mean(np.abs(deviations)**2, axis=-1) # Same formula as np.var
+        window_mins = stream_windows.min(axis=-1)
+        window_maxs = stream_windows.max(axis=-1)
+        statistics = [
+            window_means,
+            np.sqrt(window_variances),
+            window_variances,
+            window_mins,
+            window_maxs,
+            window_maxs - window_mins,
+            np.sum(stream_windows**2, axis=-1),
+            np.mean(np.abs(deviations), axis=-1),
+        ]
+        # (n_windows, n_streams, n_statistics) -> one row of features per window, grouped by stream
+        return np.stack(statistics, axis=-1).reshape(len(stream_windows), -1)
+
+    def _build_stream_matrix(self, input_df, axis_columns=None):
+        """
+        Returns an (n_rows, 4) float array with the x/y/z axes and the Signal Vector Magnitude (input_df may be a ColumnarTable).
+        axis_columns defaults to SENSOR_AXES_COLS.
+        """
+        axes_values = np.column_stack([np.asarray(input_df[axis_column_name], dtype=np.float64) for axis_column_name in axis_columns or self.config.SENSOR_AXES_COLS])
+        svm_values = np.sqrt(axes_values[:, 0]**2 + axes_values[:, 1]**2 + axes_values[:, 2]**2)
+        return np.column_stack([axes_values, svm_values])
+
+    def _find_event_blocks(self, label_values):
+        """Returns (start, end) row positions of continuous runs of the same label."""
+        if len(label_values) == 0:
+            return []
+        label_changes = np.flatnonzero(label_values[1:] != label_values[:-1]) + 1
+        block_starts = np.concatenate(([0], label_changes))
+        block_ends = np.concatenate((label_changes, [len(label_values)]))
+        return list(zip(block_starts, block_ends))
+
+    def _compute_block_window_features(self, block_streams):
+        """Features of every full window of one event block (windows start at its first row, block must hold at least one window)."""
+        block_windows = sliding_window_view(block_streams, self.config.WINDOW_DURATION_SAMPLES, axis=0)[::self.config.SLIDE_STEP_SAMPLES]
+        feature_batches = []
+        for batch_start in range(0, len(block_windows), self.config.VECTORIZED_BATCH_WINDOWS):
+            window_batch = block_windows[batch_start : batch_start + self.config.VECTORIZED_BATCH_WINDOWS]
+            feature_batches.append(self._calculate_statistical_features_batch(window_batch))
+        return np.concatenate(feature_batches)
+
+    def _extract_window_features_vectorized(self, input_df):
+        """
+        Computes the features of every window at once: each event block is turned into a strided
+        (no copy) view of shape (n_windows, n_streams, window_len) and reduced in a few array operations.
+        Returns (feature_matrix, window_labels, num_event_blocks).
+        """
+        window_len = self.config.WINDOW_DURATION_SAMPLES
+        stream_matrix = self._build_stream_matrix(input_df)
+        label_values = np.asarray(input_df[self.config.LABEL_COL])
+        event_blocks = self._find_event_blocks(label_values)
+        print(f"Data contains {len(event_blocks)} distinct event blocks to process for windowing.")
+
+        feature_batches = []
+        label_batches = []
+        for block_start, block_end in event_blocks:
+            if block_end - block_start < window_len:
+                continue
+            block_features = self._compute_block_window_features(stream_matrix[block_start:block_end])
+            feature_batches.append(block_features)
+            label_batches.append(np.full(len(block_features), label_values[block_start]))
+
+        num_features = len(self._get_stream_prefixes()) * len(self.STATISTIC_NAMES)
+        if not feature_batches:
+            return np.empty((0, num_features)), label_values[:0], len(event_blocks)
+        return np.concatenate(feature_batches), np.concatenate(label_batches), len(event_blocks)
+
+    def _extract_window_features_loop(self, input_df):
+        """Original per-window engine (one DataFrame slice and one dict per window). Returns (features_list, num_event_blocks)."""
+        # Create a temporary 'event_block_id' to process windows only within continuous segments of the same label
+        input_df['event_block_id'] = (input_df[self.config.LABEL_COL] != input_df[self.config.LABEL_COL].shift()).cumsum()
+        
+        extracted_features_list = []
+        num_event_blocks = input_df['event_block_id'].nunique()
+        print(f"Data contains {num_event_blocks} distinct event blocks to process for windowing.")
+
+        for block_id, block_df in input_df.groupby('event_block_id'):
+            # print(f"Processing block ID: {block_id} ({len(block_df)} rows)") # For debugging
+            start_offset = 0
+            while start_offset + self.config.WINDOW_DURATION_SAMPLES <= len(block_df):
+                window_data = block_df.iloc[start_offset : start_offset + self.config.WINDOW_DURATION_SAMPLES]
+                
+                if len(window_data) == self.config.WINDOW_DURATION_SAMPLES: # Ensure full window
+                    features_for_current_window = self._compute_features_for_window(window_data)
+                    extracted_features_list.append(features_for_current_window)
+                
+                start_offset += self.config.SLIDE_STEP_SAMPLES
+        return extracted_features_list, num_event_blocks
+
+    def compute_feature_dataframe(self, input_df):
+        """Windows the labeled data and returns the feature DataFrame (label column last), or None if no window fits."""
+        if self.config.USE_VECTORIZED_ENGINE:
+            feature_matrix, window_labels, num_event_blocks = self._extract_window_features_vectorized(input_df)
+            self.generated_feature_names = self._build_feature_names()
+            if len(feature_matrix) == 0:
+                self._report_no_features(num_event_blocks)
+                return None
+            output_features_df = pd.DataFrame(feature_matrix, columns=self.generated_feature_names[:-1])
+            output_features_df[self.config.LABEL_COL] = window_labels
+            return output_features_df
+
+        if not isinstance(input_df, pd.DataFrame):
+            input_df = input_df.to_dataframe() # The per-window loop needs DataFrame slicing
+        extracted_features_list, num_event_blocks = self._extract_window_features_loop(input_df)
+        if not extracted_features_list:
+            self._report_no_features(num_event_blocks)
+            return None
+        # Create DataFrame using the stored order of feature names for consistency
+        return pd.DataFrame(extracted_features_list, columns=self.generated_feature_names)
+
+    def _report_no_features(self, num_event_blocks):
+        print("ALERT: No features were extracted from the data.")
+        print("Check window size, step size settings, and the length of continuous data segments.")
+        if num_event_blocks > 0:
+             print(f"Event blocks were identified, but might have been too short for window size: {self.config.WINDOW_DURATION_SAMPLES}.")
+
     def _load_input_dataset(self):
         """Loads the labeled dataset from the CSV file specified in config."""
         try:
-            dataset_df = pd.read_csv(self.config.SOURCE_LABELED_DATA_CSV)
+            dataset_df = load_table(self.config.SOURCE_LABELED_DATA_CSV) # DataFrame, or memory-mapped ColumnarTable
             print(f"Successfully loaded source data: '{self.config.SOURCE_LABELED_DATA_CSV}' (Rows: {len(dataset_df)})")
             
             # Validate required columns
-            required_cols = self.config.SENSOR_AXES_COLS + [self.config.LABEL_COL]
-            for col in required_cols:
-                if col not in dataset_df.columns:
-                    print(f"CRITICAL ERROR: Required column '{col}' is missing from the input CSV.")
-                    return None
+            if not self._has_required_columns(dataset_df):
+                return None
             return dataset_df
         except FileNotFoundError:
             print(f"CRITICAL ERROR: Input data file not found: '{self.config.SOURCE_LABELED_DATA_CSV}'")
             print("Ensure 'extract_labeled_segments.py' (refactored) was run successfully.")
             return None
         except Exception as e:
-            print(f"CRITICAL ERROR during CSV read ('{self.config.SOURCE_LABELED_DATA_CSV}'): {e}")
+            print(f"CRITICAL ERROR during dataset read ('{self.config.SOURCE_LABELED_DATA_CSV}'): {e}")
             return None
 
     def _save_feature_set_to_csv(self, final_features_df):
@@ -103,51 +279,290 @@ class FeatureEngineeringPipeline:
             label_data_column = final_features_df.pop(self.config.LABEL_COL)
             final_features_df[self.config.LABEL_COL] = label_data_column
         
-        final_features_df.to_csv(self.config.FINAL_FEATURES_CSV, index=False)
+        if is_columnar_store_path(self.config.FINAL_FEATURES_CSV):
+            write_columnar_store(self.config.FINAL_FEATURES_CSV, final_features_df)
+        else:
+            final_features_df.to_csv(self.config.FINAL_FEATURES_CSV, index=False)
         print(f"\nFeature dataset saved to: '{self.config.FINAL_FEATURES_CSV}' ({len(final_features_df)} windows generated)")
         print(f"Number of columns (features + label): {len(final_features_df.columns)}")
         # print(f"Feature column names: {list(final_features_df.columns)}")
 
+    def _has_required_columns(self, dataset_df):
+        for col in self.config.SENSOR_AXES_COLS + [self.config.LABEL_COL]:
+            if col not in dataset_df.columns:
+                print(f"CRITICAL ERROR: Required column '{col}' is missing from the input CSV.")
+                return False
+        return True
+
+    def _stream_feature_generation(self):
+        """
+        Chunked out-of-core variant of run_feature_generation. The rows of the last (possibly unfinished) event block
+        that have not been covered by a full window yet are carried into the next chunk, so the output matches the
+        in-memory path while memory stays bounded by STREAMING_CHUNK_ROWS. Returns the number of source rows read.
+        """
+        window_len = self.config.WINDOW_DURATION_SAMPLES
+        step = self.config.SLIDE_STEP_SAMPLES
+        self.generated_feature_names = self._build_feature_names()
+
+        carried_streams = np.empty((0, len(self._get_stream_prefixes())))
+        carried_label = None
+        rows_to_skip = 0 # Only non-zero when SLIDE_STEP_SAMPLES > WINDOW_DURATION_SAMPLES
+        num_event_blocks = 0
+        windows_written = 0
+        rows_read = 0
+        output_file = None
+        columnar_output = is_columnar_store_path(self.config.FINAL_FEATURES_CSV)
+
+        try:
+            if is_columnar_store_path(self.config.SOURCE_LABELED_DATA_CSV):
+                chunk_reader = load_table(self.config.SOURCE_LABELED_DATA_CSV).iter_row_chunks(self.config.STREAMING_CHUNK_ROWS)
+            else:
+                chunk_reader = pd.read_csv(self.config.SOURCE_LABELED_DATA_CSV, chunksize=self.config.STREAMING_CHUNK_ROWS)
+            for chunk_df in chunk_reader:
+                if rows_read == 0 and not self._has_required_columns(chunk_df):
+                    return rows_read
+                rows_read += len(chunk_df)
+                chunk_streams = self._build_stream_matrix(chunk_df)
+                chunk_labels = np.asarray(chunk_df[self.config.LABEL_COL])
+                event_blocks = self._find_event_blocks(chunk_labels)
+                continues_carried_block = carried_label is not None and chunk_labels[0] == carried_label
+                num_event_blocks += len(event_blocks) - (1 if continues_carried_block else 0)
+
+                feature_batches = []
+                label_batches = []
+                for block_index, (block_start, block_end) in enumerate(event_blocks):
+                    block_streams = chunk_streams[block_start:block_end]
+                    if block_index == 0 and continues_carried_block:
+                        skipped_rows = min(rows_to_skip, len(block_streams))
+                        rows_to_skip -= skipped_rows
+                        block_streams = np.concatenate((carried_streams, block_streams[skipped_rows:]))
+                    else:
+                        rows_to_skip = 0
+
+                    num_block_windows = 0
+                    if len(block_streams) >= window_len:
+                        block_features = self._compute_block_window_features(block_streams)
+                        num_block_windows = len(block_features)
+                        feature_batches.append(block_features)
+                        label_batches.append(np.full(num_block_windows, chunk_labels[block_start]))
+
+                    if block_index == len(event_blocks) - 1:
+                        # The last block may continue in the next chunk: keep the rows from the next window start on
+                        next_window_start = num_block_windows * step
+                        carried_streams = block_streams[next_window_start:].copy()
+                        rows_to_skip += max(0, next_window_start - len(block_streams))
+                        carried_label = chunk_labels[block_start]
+
+                if feature_batches:
+                    output_features_df = pd.DataFrame(np.concatenate(feature_batches), columns=self.generated_feature_names[:-1])
+                    output_features_df[self.config.LABEL_COL] = np.concatenate(label_batches)
+                    if output_file is None:
+                        output_file = ColumnarStoreWriter(self.config.FINAL_FEATURES_CSV) if columnar_output else open(self.config.FINAL_FEATURES_CSV, 'w', newline='')
+                    if columnar_output:
+                        output_file.write(output_features_df)
+                    else:
+                        output_features_df.to_csv(output_file, header=(windows_written == 0), index=False)
+                    windows_written += len(output_features_df)
+        except FileNotFoundError:
+            print(f"CRITICAL ERROR: Input data file not found: '{self.config.SOURCE_LABELED_DATA_CSV}'")
+            print("Ensure 'extract_labeled_segments.py' (refactored) was run successfully.")
+            return rows_read
+        except Exception as e:
+            print(f"CRITICAL ERROR during streamed CSV processing ('{self.config.SOURCE_LABELED_DATA_CSV}'): {e}")
+            return rows_read
+        finally:
+            if output_file:
+                output_file.close()
+
+        print(f"Streamed source data: '{self.config.SOURCE_LABELED_DATA_CSV}' (Rows: {rows_read}, chunks of {self.config.STREAMING_CHUNK_ROWS})")
+        print(f"Data contains {num_event_blocks} distinct event blocks to process for windowing.")
+        if windows_written == 0:
+            self._report_no_features(num_event_blocks)
+            return rows_read
+        print(f"\nFeature dataset saved to: '{self.config.FINAL_FEATURES_CSV}' ({windows_written} windows generated)")
+        print(f"Number of columns (features + label): {len(self.generated_feature_names)}")
+        print("--- Feature Engineering Pipeline Successfully Completed ---")
+        return rows_read
+
+    def _list_segment_files(self):
+        """Returns [(segment_csv_path, label)] for every segment file, in label-directory then filename order."""
+        segment_files = []
+        for label_dir_name, label_value in self.config.SEGMENT_LABEL_DIRS.items():
+            label_dir_path = os.path.join(self.config.SEGMENTS_ROOT_DIR, label_dir_name)
+            if not os.path.isdir(label_dir_path):
+                print(f"Warning: Segment directory not found: '{label_dir_path}'")
+                continue
+            for filename in sorted(os.listdir(label_dir_path)):
+                if filename.endswith('.csv'):
+                    segment_files.append((os.path.join(label_dir_path, filename), label_value))
+        return segment_files
+
+    def _compute_segment_features(self, segment_bytes):
+        """Window features of a single segment CSV (given as raw bytes). Returns an (n_windows, n_features) array."""
+        segment_df = pd.read_csv(io.BytesIO(segment_bytes))
+        axis_columns = next((columns for columns in (self.config.SEGMENT_AXES_COLS, self.config.SENSOR_AXES_COLS)
+                             if all(column in segment_df.columns for column in columns)), None)
+        if axis_columns is None:
+            raise ValueError(f"Segment columns {list(segment_df.columns)} contain neither {self.config.SEGMENT_AXES_COLS} "
+                             f"nor {self.config.SENSOR_AXES_COLS} (see SEGMENT_AXES_COLS)")
+        num_features = len(self._get_stream_prefixes()) * len(self.STATISTIC_NAMES)
+        if len(segment_df) < self.config.WINDOW_DURATION_SAMPLES:
+            return np.empty((0, num_features))
+        return self._compute_block_window_features(self._build_stream_matrix(segment_df, axis_columns))
+
+    def _get_worker_count(self):
+        return self.config.NUM_WORKERS if self.config.NUM_WORKERS > 0 else (os.cpu_count() or 1)
+
+    def _compute_pending_segments(self, segment_paths, cached_keys=None):
+        """
+        Reads, hashes (when cached_keys is given) and computes the features of the given segment files, in order.
+        With NUM_WORKERS != 1 the segments are split into tasks for a process pool, so the file reads and content
+        hashes run in the workers too; workers send back plain NumPy arrays, which pickle as compact binary buffers.
+        Segments whose cache key is in cached_keys are not computed. Returns [(cache_key, feature_matrix or None, error_message)].
+        """
+        worker_count = min(self._get_worker_count(), len(segment_paths))
+        if worker_count <= 1:
+            _init_segment_worker(cached_keys)
+            return _compute_segment_features_task(self.config, segment_paths)
+
+        segments_per_task = max(1, min(self.config.SEGMENTS_PER_TASK, -(-len(segment_paths) // (worker_count * 4))))
+        segment_tasks = [segment_paths[start : start + segments_per_task] for start in range(0, len(segment_paths), segments_per_task)]
+        print(f"Computing {len(segment_paths)} segments with {worker_count} worker processes ({len(segment_tasks)} tasks).")
+        # The cached keys are sent once per worker process rather than with every task
+        with ProcessPoolExecutor(max_workers=worker_count, initializer=_init_segment_worker, initargs=(cached_keys,)) as worker_pool:
+            # map() yields task results in submission order, which keeps the output row order deterministic
+            task_results = worker_pool.map(_compute_segment_features_task, [self.config] * len(segment_tasks), segment_tasks)
+            return [segment_result for task_result in task_results for segment_result in task_result]
+
+    def _run_segment_corpus_feature_generation(self):
+        """
+        Computes window features per segment file. With USE_FEATURE_CACHE only new or changed segments are computed;
+        the rest is merged from the on-disk cache (keyed by content hash + window settings + feature-set version).
+        """
+        segment_files = self._list_segment_files()
+        print(f"Segment corpus '{self.config.SEGMENTS_ROOT_DIR}' contains {len(segment_files)} segment files.")
+        feature_cache = None
+        if self.config.USE_FEATURE_CACHE:
+            feature_cache = SegmentFeatureCache(self.config.FEATURE_CACHE_DIR, self.config.FEATURE_CACHE_MAX_BYTES)
+
+        self.generated_feature_names = self._build_feature_names()
+        segment_results = [None] * len(segment_files)
+        try:
+            cached_keys = frozenset(feature_cache.entries) if feature_cache is not None else None
+            computed_results = self._compute_pending_segments([segment_path for segment_path, _ in segment_files], cached_keys)
+            failed_segments = 0
+            for segment_position, (cache_key, segment_features, error_message) in enumerate(computed_results):
+                if segment_features is None and error_message is None:
+                    segment_features = feature_cache.get(cache_key)
+                    if segment_features is None: # Cache entry unreadable: compute the segment here after all
+                        _init_segment_worker(None)
+                        _, segment_features, error_message = _compute_segment_features_task(self.config, [segment_files[segment_position][0]])[0]
+                elif feature_cache is not None:
+                    feature_cache.misses += 1
+                if segment_features is None:
+                    print(f"Warning: Skipping unreadable segment '{segment_files[segment_position][0]}': {error_message}")
+                    failed_segments += 1
+                    continue
+                segment_results[segment_position] = segment_features
+                if feature_cache is not None and cache_key not in feature_cache.entries:
+                    feature_cache.put(cache_key, segment_features)
+        finally:
+            if feature_cache is not None:
+                feature_cache.save()
+                print(f"Feature cache: {feature_cache.hits} segments reused, {feature_cache.misses} computed "
+                      f"({len(feature_cache.entries)} entries, {feature_cache.total_bytes / 1024**2:.2f} MB on disk).")
+
+        if segment_files and failed_segments == len(segment_files):
+            print(f"CRITICAL ERROR: None of the {len(segment_files)} segment files could be read (see the warnings above); "
+                  "check SEGMENT_AXES_COLS against the segment CSV header.")
+            return None
+
+        # Results are assembled in segment file order, whatever the order in which workers finished
+        feature_batches = []
+        label_batches = []
+        for (_, segment_label), segment_features in zip(segment_files, segment_results):
+            if segment_features is not None:
+                feature_batches.append(segment_features)
+                label_batches.append(np.full(len(segment_features), segment_label))
+
+        if not feature_batches or sum(len(batch) for batch in feature_batches) == 0:
+            self._report_no_features(len(segment_files))
+            return None
+        output_features_df = pd.DataFrame(np.concatenate(feature_batches), columns=self.generated_feature_names[:-1])
+        output_features_df[self.config.LABEL_COL] = np.concatenate(label_batches)
+        return output_features_df
+
     def run_feature_generation(self):
         """Main orchestration method for the feature engineering pipeline."""
+        self.profiler.profile_run(self._execute_feature_generation)
+
+    def _execute_feature_generation(self):
         print("--- Initiating Feature Engineering Pipeline ---")
-        input_df = self._load_input_dataset()
+        if self.config.USE_SEGMENT_CORPUS:
+            with self.profiler.stage("segment_corpus_features") as stage:
+                output_features_df = self._run_segment_corpus_feature_generation()
+                stage.rows = len(output_features_df) if output_features_df is not None else 0
+            if output_features_df is not None:
+                with self.profiler.stage("save_features") as stage:
+                    self._save_feature_set_to_csv(output_features_df)
+                    stage.rows = len(output_features_df)
+                print("--- Feature Engineering Pipeline Successfully Completed ---")
+            return
 
-        if input_df is None:
-            print("Pipeline terminated due to issues loading input data.")
+        if self.config.USE_STREAMING_MODE:
+            with self.profiler.stage("stream_features") as stage:
+                stage.rows = self._stream_feature_generation()
             return
 
-        # Create a temporary 'event_block_id' to process windows only within continuous segments of the same label
-        input_df['event_block_id'] = (input_df[self.config.LABEL_COL] != input_df[self.config.LABEL_COL].shift()).cumsum()
-        
-        extracted_features_list = []
-        num_event_blocks = input_df['event_block_id'].nunique()
-        print(f"Data contains {num_event_blocks} distinct event blocks to process for windowing.")
+        with self.profiler.stage("load_dataset") as stage:
+            input_df = self._load_input_dataset()
+            stage.rows = len(input_df) if input_df is not None else 0
 
-        for block_id, block_df in input_df.groupby('event_block_id'):
-            # print(f"Processing block ID: {block_id} ({len(block_df)} rows)") # For debugging
-            start_offset = 0
-            while start_offset + self.config.WINDOW_DURATION_SAMPLES <= len(block_df):
-                window_data = block_df.iloc[start_offset : start_offset + self.config.WINDOW_DURATION_SAMPLES]
-                
-                if len(window_data) == self.config.WINDOW_DURATION_SAMPLES: # Ensure full window
-                    features_for_current_window = self._compute_features_for_window(window_data)
-                    extracted_features_list.append(features_for_current_window)
-                
-                start_offset += self.config.SLIDE_STEP_SAMPLES
+        if input_df is None:
+            print("Pipeline terminated due to issues loading input data.")
+            return
 
-        if not extracted_features_list:
-            print("ALERT: No features were extracted from the data.")
-            print("Check window size, step size settings, and the length of continuous data segments.")
-            if num_event_blocks > 0:
-                 print(f"Event blocks were identified, but might have been too short for window size: {self.config.WINDOW_DURATION_SAMPLES}.")
+        with self.profiler.stage("compute_features") as stage:
+            output_features_df = self.compute_feature_dataframe(input_df)
+            stage.rows = len(input_df)
+        if output_features_df is None:
             return
 
-        # Create DataFrame using the stored order of feature names for consistency
-        output_features_df = pd.DataFrame(extracted_features_list, columns=self.generated_feature_names)
-        self._save_feature_set_to_csv(output_features_df)
+        with self.profiler.stage("save_features") as stage:
+            self._save_feature_set_to_csv(output_features_df)
+            stage.rows = len(output_features_df)
         print("--- Feature Engineering Pipeline Successfully Completed ---")
 
+_worker_cached_keys = None # Cache keys whose features need not be computed (set per worker process)
+
+def _init_segment_worker(cached_keys):
+    global _worker_cached_keys
+    _worker_cached_keys = cached_keys
+
+def _compute_segment_features_task(fe_config, segment_paths):
+    """
+    Process-pool task: reads a batch of segment files and computes their features. When the feature cache is used,
+    each segment's cache key is computed here as well, and segments already in the cache are not computed.
+    """
+    feature_pipeline = FeatureEngineeringPipeline(fe_config)
+    task_results = []
+    for segment_path in segment_paths:
+        cache_key = None
+        try:
+            with open(segment_path, 'rb') as segment_file:
+                segment_bytes = segment_file.read()
+            if _worker_cached_keys is not None:
+                cache_key = compute_segment_cache_key(
+                    segment_bytes, fe_config.WINDOW_DURATION_SAMPLES, fe_config.SLIDE_STEP_SAMPLES, fe_config.FEATURE_SET_VERSION
+                )
+                if cache_key in _worker_cached_keys:
+                    task_results.append((cache_key, None, None))
+                    continue
+            task_results.append((cache_key, feature_pipeline._compute_segment_features(segment_bytes), None))
+        except Exception as e:
+            task_results.append((cache_key, None, str(e)))
+    return task_results
+
 def execute_feature_extraction_workflow(): # Renamed main function
     print("Initializing Feature Extraction Workflow...")
     # Inform user about dependencies, though they are standard for data science
@@ -0,0 +1,109 @@
+import os
+import numpy as np
+from model_features import MODEL_FEATURE_NAMES
+
+# --- Flat-array decision tree: sklearn-free runtime of the exported model (see tree_export.py) ---
+LEAF_FEATURE = -1
+
+def round_threshold_down_to_float32(thresholds):
+    """
+    Largest float32 <= each threshold. For a float32 feature x, x <= t holds exactly when x <= this value, so the
+    float32 comparisons of the firmware and of FlatDecisionTree decide like sklearn's (float32 x vs float64 t).
+    """
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    float32_thresholds = thresholds.astype(np.float32)
+    rounded_up = float32_thresholds.astype(np.float64) > thresholds
+    float32_thresholds[rounded_up] = np.nextafter(float32_thresholds[rounded_up], np.float32(-np.inf))
+    return float32_thresholds
+
+class FlatDecisionTree:
+    """
+    A fitted decision tree as parallel node arrays. Leaves have feature LEAF_FEATURE and point to themselves,
+    so predict() can advance every row max_depth times without checking which rows already reached a leaf.
+    """
+    def __init__(self, node_features, node_thresholds, left_children, right_children, leaf_classes, class_labels):
+        self.node_features = np.asarray(node_features, dtype=np.int32)
+        self.node_thresholds = np.asarray(node_thresholds, dtype=np.float32)
+        self.left_children = np.asarray(left_children, dtype=np.int32)
+        self.right_children = np.asarray(right_children, dtype=np.int32)
+        self.leaf_classes = np.asarray(leaf_classes, dtype=np.int32) # Index into class_labels (majority class of the node)
+        self.class_labels = np.asarray(class_labels)
+        self.max_depth = self._compute_max_depth()
+        # Only the columns some split reads are converted, and node features are renumbered into that column subset
+        self.used_features = np.unique(self.node_features[self.node_features != LEAF_FEATURE])
+        self.used_feature_positions = np.searchsorted(self.used_features, np.maximum(self.node_features, 0)).astype(np.int32)
+        # Plain Python copy of the nodes for predict_row(): (feature, threshold, left, right, class label)
+        self.node_rows = list(zip(self.node_features.tolist(), self.node_thresholds.astype(np.float64).tolist(),
+                                  self.left_children.tolist(), self.right_children.tolist(), self.class_labels[self.leaf_classes].tolist()))
+
+    @classmethod
+    def from_sklearn(cls, tree_model):
+        tree_structure = tree_model.tree_
+        is_leaf = tree_structure.children_left == -1
+        node_numbers = np.arange(tree_structure.node_count)
+        return cls(
+            np.where(is_leaf, LEAF_FEATURE, tree_structure.feature),
+            np.where(is_leaf, 0.0, round_threshold_down_to_float32(tree_structure.threshold)),
+            np.where(is_leaf, node_numbers, tree_structure.children_left),
+            np.where(is_leaf, node_numbers, tree_structure.children_right),
+            np.argmax(tree_structure.value[:, 0, :], axis=1), # Same tie-breaking as predict(): first class wins
+            tree_model.classes_,
+        )
+
+    def _compute_max_depth(self):
+        node_depths = np.zeros(len(self.node_features), dtype=np.int32)
+        for node_number in range(len(self.node_features)): # Children always come after their parent
+            if self.node_features[node_number] != LEAF_FEATURE:
+                node_depths[[self.left_children[node_number], self.right_children[node_number]]] = node_depths[node_number] + 1
+        return int(node_depths.max())
+
+    @property
+    def node_count(self):
+        return len(self.node_features)
+
+    def predict(self, feature_matrix):
+        """Walks all rows down the tree together, one level per step. Same result as DecisionTreeClassifier.predict."""
+        feature_matrix = np.asarray(feature_matrix)
+        current_nodes = np.zeros(len(feature_matrix), dtype=np.int32)
+        if self.max_depth == 0:
+            return self.class_labels[self.leaf_classes[current_nodes]]
+        used_columns = feature_matrix[:, self.used_features].astype(np.float32) # sklearn compares float32 features too
+        row_indices = np.arange(len(feature_matrix))
+        for _ in range(self.max_depth):
+            goes_left = used_columns[row_indices, self.used_feature_positions[current_nodes]] <= self.node_thresholds[current_nodes]
+            current_nodes = np.where(goes_left, self.left_children[current_nodes], self.right_children[current_nodes])
+        return self.class_labels[self.leaf_classes[current_nodes]]
+
+    def predict_row(self, feature_values):
+        """Single-row traversal in plain Python (live, per-window use); same decisions as predict()."""
+        node_feature, node_threshold, left_child, right_child, node_class = self.node_rows[0]
+        while node_feature != LEAF_FEATURE:
+            next_node = left_child if float(np.float32(feature_values[node_feature])) <= node_threshold else right_child
+            node_feature, node_threshold, left_child, right_child, node_class = self.node_rows[next_node]
+        return node_class
+
+def save_flat_model(output_path, flat_tree, scaler_means, scaler_scales, feature_names=MODEL_FEATURE_NAMES):
+    """Writes a temporary file and renames it over output_path, so a server reloading the model never reads a partial file."""
+    if not output_path.endswith('.npz'):
+        output_path += '.npz' # np.savez's naming
+    temporary_path = output_path + '.tmp'
+    with open(temporary_path, 'wb') as model_file:
+        np.savez(
+            model_file,
+            node_features=flat_tree.node_features, node_thresholds=flat_tree.node_thresholds,
+            left_children=flat_tree.left_children, right_children=flat_tree.right_children,
+            leaf_classes=flat_tree.leaf_classes, class_labels=flat_tree.class_labels,
+            scaler_means=np.asarray(scaler_means, dtype=np.float64), scaler_scales=np.asarray(scaler_scales, dtype=np.float64),
+            feature_names=np.asarray(feature_names),
+        )
+    os.replace(temporary_path, output_path)
+
+def load_flat_model(model_path):
+    """Returns (flat_tree, scaler_means, scaler_scales, feature_names) from a file written by save_flat_model()."""
+    with np.load(model_path) as model_arrays:
+        flat_tree = FlatDecisionTree(
+            model_arrays['node_features'], model_arrays['node_thresholds'],
+            model_arrays['left_children'], model_arrays['right_children'],
+            model_arrays['leaf_classes'], model_arrays['class_labels'],
+        )
+        return flat_tree, model_arrays['scaler_means'], model_arrays['scaler_scales'], [str(name) for name in model_arrays['feature_names']]
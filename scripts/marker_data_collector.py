@@ -2,19 +2,32 @@ import serial
 import csv
 import time
 import datetime
+import threading
+from serial_capture import SerialCaptureConfig, SerialCaptureEngine
 
 # --- Configuration Settings ---
 class DataCollectorConfig:
     SERIAL_DEVICE = 'COM3'  # MUDE AQUI para a porta serial correta do seu ESP32
-    SERIAL_BAUD_RATE = 115200
+    SERIAL_BAUD_RATE = 115200 # 921600 for the binary frame mode (frames at 500 Hz - 1 kHz do not fit in 115200 baud)
+    # 'ascii': 'ax,ay,az,marker' text lines (default firmware); 'binary': frames with sequence numbers and CRC
+    # (BINARY_FRAME_MODE 1 in esp32_mpu6050_data_collection.ino, see sensor_frame_protocol.py). Binary needs threaded capture.
+    SERIAL_FRAME_FORMAT = 'ascii'
     OUTPUT_CSV_FILE = 'raw_sensor_log_with_markers_refactored.csv' # Changed filename
     SERIAL_READ_TIMEOUT = 0.05 # Timeout for serial read
+    # Threaded capture: the port is read continuously (also while a command is typed) and rows are written in batches;
+    # False restores the original loop, which stops reading while waiting for a command
+    USE_THREADED_CAPTURE = True
+    STATUS_REPORT_INTERVAL_S = 30 # Capture counters printed this often in threaded mode (0 disables it)
     CSV_FILE_HEADER = ['timestamp_pc', 'accel_x_val', 'accel_y_val', 'accel_z_val', 'esp_event_code'] # Renamed fields
+    # Live classification of the incoming samples with the exported model (see streaming_detector.py)
+    ENABLE_LIVE_CLASSIFICATION = False
+    LIVE_MODEL_PATH = '../decision_tree_parametros/decision_tree_flat.npz'
+    LIVE_HOP_SAMPLES = 10 # Classify the last 50 samples every 10 new samples (0.2 s at 50 Hz)
 
 def display_collection_instructions():
     config = DataCollectorConfig()
     print("\n--- Data Collection Script with Event Markers ---")
-    print(f"Listening on port: {config.SERIAL_DEVICE} at {config.SERIAL_BAUD_RATE} baud")
+    print(f"Listening on port: {config.SERIAL_DEVICE} at {config.SERIAL_BAUD_RATE} baud ({config.SERIAL_FRAME_FORMAT} frames)")
     print(f"Saving data to: {config.OUTPUT_CSV_FILE}")
     print("Commands (type in console and press Enter):")
     print("  'b' - to mark START of an event of interest")
@@ -23,7 +36,10 @@ def display_collection_instructions():
     print("-----------------------------------------")
     print("Simulate events (tremors or non-tremors) and use 'b' and 'e' to define them.")
     print("Labeling (tremor or not) will be done in a later step.")
-    print("NOTICE: Data collection briefly pauses while awaiting your command.")
+    if config.USE_THREADED_CAPTURE:
+        print("Data keeps being captured while you type a command.")
+    else:
+        print("NOTICE: Data collection briefly pauses while awaiting your command.")
 
 def initialize_serial_port(device, baud_rate, timeout_duration):
     try:
@@ -73,7 +89,26 @@ def parse_sensor_data_line(data_line_str):
            print(f"Warning: Unexpected line format: '{data_line_str}'")
         return None
 
-def process_incoming_esp_data(active_serial_conn, data_writer):
+def create_live_detector(config):
+    if not config.ENABLE_LIVE_CLASSIFICATION:
+        return None
+    from streaming_detector import StreamingDetector # Imported here: pulls in pandas and the feature pipeline
+    try:
+        live_detector = StreamingDetector.from_flat_model_file(config.LIVE_MODEL_PATH, hop_samples=config.LIVE_HOP_SAMPLES)
+        print(f"Live classification enabled (model: {config.LIVE_MODEL_PATH}, every {config.LIVE_HOP_SAMPLES} samples).")
+        return live_detector
+    except (OSError, KeyError, ValueError) as e:
+        print(f"Warning: Live classification disabled, model could not be loaded: {e}")
+        return None
+
+def update_live_classification(live_detector, parsed_data):
+    """Feeds one sample ([timestamp, ax, ay, az, marker]) to the detector and prints when the predicted class changes."""
+    previous_prediction = live_detector.last_prediction
+    prediction = live_detector.push_sample(parsed_data[1], parsed_data[2], parsed_data[3])
+    if prediction is not None and prediction != previous_prediction:
+        print(f"[{datetime.datetime.now().strftime('%H:%M:%S')}] Live classification: {'TREMOR' if prediction == 1 else 'normal'}")
+
+def process_incoming_esp_data(active_serial_conn, data_writer, live_detector=None):
     lines_processed_count = 0
     if not active_serial_conn or not data_writer:
         return lines_processed_count
@@ -88,6 +123,8 @@ def process_incoming_esp_data(active_serial_conn, data_writer):
             if parsed_data and parsed_data != "info":
                 data_writer.writerow(parsed_data)
                 lines_processed_count += 1
+                if live_detector is not None:
+                    update_live_classification(live_detector, parsed_data)
             
         except UnicodeDecodeError:
             # print("Warning: Unicode decode error from serial.") # Optionally log
@@ -116,6 +153,31 @@ def handle_user_input_commands(active_serial_conn):
         print("End of input stream (EOF). Exiting...")
         return False # Signal to stop collection
 
+def run_command_loop(active_serial_conn, stop_event):
+    """Command thread of the threaded capture: b/e/q from the console while the capture engine keeps reading."""
+    while not stop_event.is_set():
+        if not handle_user_input_commands(active_serial_conn):
+            stop_event.set()
+
+def run_threaded_capture(active_serial_conn, output_file, data_writer, live_detector, config):
+    row_callback = None
+    if live_detector is not None:
+        row_callback = lambda decoded_row: update_live_classification(live_detector, decoded_row)
+    capture_engine = SerialCaptureEngine(active_serial_conn, data_writer, output_file, SerialCaptureConfig, row_callback,
+                                         binary_frames=config.SERIAL_FRAME_FORMAT == 'binary')
+    capture_engine.start()
+    # input() cannot be interrupted, so the command thread is a daemon and the main thread only waits (Ctrl+C works)
+    threading.Thread(target=run_command_loop, args=(active_serial_conn, capture_engine.stop_requested), name="console-commands", daemon=True).start()
+    try:
+        status_interval = config.STATUS_REPORT_INTERVAL_S or None
+        while not capture_engine.stop_requested.wait(status_interval):
+            print(f"Capture status: {capture_engine.status_line()}")
+    finally:
+        capture_engine.stop() # Writes every row already read before returning
+        if capture_engine.reader_error is not None:
+            print(f"Error reading serial port: {capture_engine.reader_error}")
+        print(f"Capture finished: {capture_engine.status_line()}")
+
 def perform_data_collection_workflow():
     display_collection_instructions()
     config = DataCollectorConfig()
@@ -141,12 +203,22 @@ def perform_data_collection_workflow():
             print("Failed to create CSV output file. Exiting.")
             return
 
+        live_detector = create_live_detector(config)
+
         print("\nType 'b' for START of event, 'e' for END of event, 'q' to QUIT.")
         
+        if config.SERIAL_FRAME_FORMAT == 'binary' and not config.USE_THREADED_CAPTURE:
+            print("ERROR: SERIAL_FRAME_FORMAT 'binary' requires USE_THREADED_CAPTURE = True. Exiting.")
+            return
+
+        if config.USE_THREADED_CAPTURE:
+            run_threaded_capture(serial_port_connection, output_csv_file, csv_file_writer, live_detector, config)
+            return
+
         is_collecting = True
         while is_collecting:
             # Prioritize processing all available data from ESP32
-            process_incoming_esp_data(serial_port_connection, csv_file_writer)
+            process_incoming_esp_data(serial_port_connection, csv_file_writer, live_detector)
             
             # Then, wait for user command
             is_collecting = handle_user_input_commands(serial_port_connection)
@@ -0,0 +1,96 @@
+import struct
+import zlib
+import numpy as np
+from flat_tree import LEAF_FEATURE, FlatDecisionTree
+from model_features import ModelFeatureConfig, MODEL_FEATURE_NAMES, features_read_by_model, model_feature_stream_and_statistic
+
+# --- Compact binary model blob (served to the devices by the alert server's model endpoint) ---
+# Header (20 bytes, little-endian): magic 'GSMB' | version u8 | reserved u8 | window_samples u16 | model_version u32
+#                                   | feature_count u16 | node_count u16 | max_depth u16 | reserved u16
+# Feature (12 bytes): model feature index u8 | stream u8 | statistic u8 | pad u8 | scaler mean f32 | scaler scale f32
+#                     (stream: ModelFeatureConfig.STREAM_NAMES index, statistic: STATISTIC_NAMES index)
+# Node (12 bytes):    feature slot i16 (into the feature table, -1 for leaves) | left u16 | right u16 | class i16 | threshold f32
+# Only the features the tree reads are included. model_version is the CRC-32 of everything after the header, so it
+# identifies the model (same model, same version) and lets the device check a download.
+# Matches this C layout on the ESP32:
+#   struct __attribute__((packed)) ModelFeature { uint8_t index, stream, statistic, pad; float mean, scale; };
+#   struct __attribute__((packed)) ModelNode { int16_t slot; uint16_t left, right; int16_t cls; float threshold; };
+class ModelBlobFormat:
+    MAGIC = b'GSMB'
+    VERSION = 1
+
+BLOB_HEADER = struct.Struct('<4sBBHIHHHH')
+BLOB_FEATURE_DTYPE = np.dtype([
+    ('feature_index', 'u1'),
+    ('stream', 'u1'),
+    ('statistic', 'u1'),
+    ('padding', 'V1'),
+    ('scaler_mean', '<f4'),
+    ('scaler_scale', '<f4'),
+])
+BLOB_NODE_DTYPE = np.dtype([
+    ('feature_slot', '<i2'),
+    ('left', '<u2'),
+    ('right', '<u2'),
+    ('class_label', '<i2'),
+    ('threshold', '<f4'),
+])
+
+def encode_model_blob(flat_tree, scaler_means, scaler_scales, window_samples=ModelFeatureConfig.WINDOW_SAMPLES):
+    """Packs the scaler constants of the features the tree reads and the flat tree into one blob."""
+    used_features = features_read_by_model(flat_tree)
+    feature_table = np.zeros(len(used_features), dtype=BLOB_FEATURE_DTYPE)
+    for feature_slot, feature_index in enumerate(used_features):
+        stream_index, statistic_name = model_feature_stream_and_statistic(feature_index)
+        feature_table[feature_slot]['feature_index'] = feature_index
+        feature_table[feature_slot]['stream'] = stream_index
+        feature_table[feature_slot]['statistic'] = ModelFeatureConfig.STATISTIC_NAMES.index(statistic_name)
+    feature_table['scaler_mean'] = np.asarray(scaler_means, dtype=np.float64)[used_features]
+    feature_table['scaler_scale'] = np.asarray(scaler_scales, dtype=np.float64)[used_features]
+
+    is_leaf = flat_tree.node_features == LEAF_FEATURE
+    node_table = np.zeros(flat_tree.node_count, dtype=BLOB_NODE_DTYPE)
+    node_table['feature_slot'] = np.where(is_leaf, -1, np.searchsorted(used_features, np.maximum(flat_tree.node_features, 0)))
+    node_table['left'] = flat_tree.left_children
+    node_table['right'] = flat_tree.right_children
+    node_table['class_label'] = flat_tree.class_labels[flat_tree.leaf_classes]
+    node_table['threshold'] = flat_tree.node_thresholds
+
+    blob_body = feature_table.tobytes() + node_table.tobytes()
+    model_version = zlib.crc32(blob_body)
+    blob_header = BLOB_HEADER.pack(ModelBlobFormat.MAGIC, ModelBlobFormat.VERSION, 0, window_samples, model_version,
+                                   len(feature_table), len(node_table), flat_tree.max_depth, 0)
+    return blob_header + blob_body
+
+def read_model_blob_version(blob):
+    return BLOB_HEADER.unpack_from(blob)[4]
+
+def decode_model_blob(blob):
+    """
+    Returns (flat_tree, scaler_means, scaler_scales) over all MODEL_FEATURE_NAMES (features the tree does not read get
+    mean 0 and scale 1), i.e. what the device reconstructs from the blob. Raises ValueError on a malformed blob.
+    """
+    if len(blob) < BLOB_HEADER.size:
+        raise ValueError("Model blob shorter than its header")
+    blob_magic, blob_version, _, _, model_version, feature_count, node_count, _, _ = BLOB_HEADER.unpack_from(blob)
+    if blob_magic != ModelBlobFormat.MAGIC or blob_version != ModelBlobFormat.VERSION:
+        raise ValueError(f"Unsupported model blob format {blob_magic!r} v{blob_version}")
+    if len(blob) != BLOB_HEADER.size + feature_count * BLOB_FEATURE_DTYPE.itemsize + node_count * BLOB_NODE_DTYPE.itemsize:
+        raise ValueError(f"Model blob length {len(blob)} does not match {feature_count} features and {node_count} nodes")
+    if zlib.crc32(blob[BLOB_HEADER.size:]) != model_version:
+        raise ValueError("Model blob checksum does not match its model version")
+
+    feature_table = np.frombuffer(blob, dtype=BLOB_FEATURE_DTYPE, count=feature_count, offset=BLOB_HEADER.size)
+    node_table = np.frombuffer(blob, dtype=BLOB_NODE_DTYPE, count=node_count, offset=BLOB_HEADER.size + feature_table.nbytes)
+    scaler_means = np.zeros(len(MODEL_FEATURE_NAMES))
+    scaler_scales = np.ones(len(MODEL_FEATURE_NAMES))
+    scaler_means[feature_table['feature_index']] = feature_table['scaler_mean']
+    scaler_scales[feature_table['feature_index']] = feature_table['scaler_scale']
+
+    is_leaf = node_table['feature_slot'] < 0
+    class_labels, leaf_classes = np.unique(node_table['class_label'], return_inverse=True)
+    flat_tree = FlatDecisionTree(
+        np.where(is_leaf, LEAF_FEATURE, feature_table['feature_index'].astype(np.int32)[np.maximum(node_table['feature_slot'], 0)]),
+        node_table['threshold'], node_table['left'], node_table['right'], leaf_classes, class_labels,
+    )
+    return flat_tree, scaler_means, scaler_scales
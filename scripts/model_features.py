@@ -0,0 +1,100 @@
+import numpy as np
+
+# --- Feature set read by the deployed model (scaler/tree order, as in model_params_for_c.h) ---
+# Same statistics as derive_features_from_sample_window() in the detector firmware:
+# per stream (ax, ay, az, SVM): mean, std, variance, min, max, peak-to-peak, energy and mean absolute value.
+class ModelFeatureConfig:
+    WINDOW_SAMPLES = 50
+    STREAM_NAMES = ['accel_x', 'accel_y', 'accel_z', 'svm']
+    STATISTIC_NAMES = ['mean', 'std', 'var', 'min', 'max', 'ptp', 'energy', 'mav']
+
+MODEL_FEATURE_NAMES = [
+    f'{statistic}_{stream}' for stream in ModelFeatureConfig.STREAM_NAMES for statistic in ModelFeatureConfig.STATISTIC_NAMES
+]
+
+def compute_model_features(sample_windows):
+    """
+    Computes the 32 model features for a batch of raw windows in one vectorized pass.
+    sample_windows: array of shape (n_windows, window_samples, 3) with ax/ay/az in m/s^2.
+    Returns an (n_windows, 32) float64 array in MODEL_FEATURE_NAMES order.
+    """
+    axes_windows = np.asarray(sample_windows, dtype=np.float64)
+    svm_windows = np.sqrt(np.sum(axes_windows**2, axis=2))
+    # (n_windows, n_streams, window_samples), contiguous along the samples for the reductions
+    stream_windows = np.ascontiguousarray(np.concatenate([axes_windows.transpose(0, 2, 1), svm_windows[:, np.newaxis, :]], axis=1))
+
+    window_means = stream_windows.mean(axis=-1)
+    window_variances = np.mean((stream_windows - window_means[..., np.newaxis])**2, axis=-1)
+    window_mins = stream_windows.min(axis=-1)
+    window_maxs = stream_windows.max(axis=-1)
+    statistics = [
+        window_means,
+        np.sqrt(window_variances),
+        window_variances,
+        window_mins,
+        window_maxs,
+        window_maxs - window_mins,
+        np.sum(stream_windows**2, axis=-1),
+        np.mean(np.abs(stream_windows), axis=-1),
+    ]
+    return np.stack(statistics, axis=-1).reshape(len(stream_windows), -1)
+
+def model_feature_stream_and_statistic(feature_index):
+    """(stream index, statistic name) of a MODEL_FEATURE_NAMES position."""
+    stream_index, statistic_index = divmod(int(feature_index), len(ModelFeatureConfig.STATISTIC_NAMES))
+    return stream_index, ModelFeatureConfig.STATISTIC_NAMES[statistic_index]
+
+def features_read_by_model(tree_model):
+    """
+    Sorted MODEL_FEATURE_NAMES positions some split of the model compares (FlatDecisionTree or a fitted sklearn tree),
+    or None when they cannot be determined (then every feature has to be computed).
+    """
+    used_features = getattr(tree_model, 'used_features', None)
+    if used_features is None and hasattr(tree_model, 'tree_'):
+        node_features = tree_model.tree_.feature
+        used_features = np.unique(node_features[node_features >= 0])
+    return None if used_features is None else np.asarray(used_features, dtype=np.int64)
+
+def compute_selected_model_features(sample_windows, feature_indices):
+    """
+    compute_model_features restricted to the given positions: only their streams (the SVM stream only if read) and
+    only the statistics they need plus those these depend on (std/var need the mean, ptp the min and max) are computed.
+    Returns an (n_windows, 32) float64 array with the selected columns filled in (equal to compute_model_features)
+    and the others zero, so scaler and tree indexing stay unchanged.
+    """
+    axes_windows = np.asarray(sample_windows, dtype=np.float64)
+    feature_matrix = np.zeros((len(axes_windows), len(MODEL_FEATURE_NAMES)))
+    statistics_by_stream = {}
+    for feature_index in np.asarray(feature_indices).tolist():
+        stream_index, statistic_name = model_feature_stream_and_statistic(feature_index)
+        statistics_by_stream.setdefault(stream_index, {})[statistic_name] = feature_index
+
+    for stream_index, feature_positions in statistics_by_stream.items():
+        if stream_index < 3:
+            stream_windows = np.ascontiguousarray(axes_windows[:, :, stream_index])
+        else:
+            stream_windows = np.sqrt(np.sum(axes_windows**2, axis=2))
+        computed_statistics = {}
+        if feature_positions.keys() & {'mean', 'std', 'var'}:
+            computed_statistics['mean'] = stream_windows.mean(axis=-1)
+        if feature_positions.keys() & {'std', 'var'}:
+            computed_statistics['var'] = np.mean((stream_windows - computed_statistics['mean'][:, np.newaxis])**2, axis=-1)
+            computed_statistics['std'] = np.sqrt(computed_statistics['var'])
+        if feature_positions.keys() & {'min', 'ptp'}:
+            computed_statistics['min'] = stream_windows.min(axis=-1)
+        if feature_positions.keys() & {'max', 'ptp'}:
+            computed_statistics['max'] = stream_windows.max(axis=-1)
+        if 'ptp' in feature_positions:
+            computed_statistics['ptp'] = computed_statistics['max'] - computed_statistics['min']
+        if 'energy' in feature_positions:
+            computed_statistics['energy'] = np.sum(stream_windows**2, axis=-1)
+        if 'mav' in feature_positions:
+            computed_statistics['mav'] = np.mean(np.abs(stream_windows), axis=-1)
+        for statistic_name, feature_index in feature_positions.items():
+            feature_matrix[:, feature_index] = computed_statistics[statistic_name]
+    return feature_matrix
+
+def standardize_features(feature_matrix, scaler_means, scaler_scales):
+    """StandardScaler.transform without scikit-learn (a zero scale leaves the feature only centered, as in the firmware)."""
+    safe_scales = np.where(np.asarray(scaler_scales) == 0, 1.0, scaler_scales)
+    return (feature_matrix - scaler_means) / safe_scales
@@ -0,0 +1,384 @@
+import argparse
+import hashlib
+import io
+import os
+import sqlite3
+import time
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+
+from columnar_store import label_from_segment_path
+
+# --- Configuration for the Segment Catalog ---
+class SegmentCatalogConfig:
+    SEGMENTS_ROOT_DIR = '../dataset_segments'
+    CATALOG_PATH = '../dataset_segments/segment_catalog.db' # Derived file, rebuilt by 'refresh'
+    TIMESTAMP_COLUMN = 'timestamp_pc'
+    ROW_OFFSET_STRIDE = 25      # Byte offset of every Nth data row is kept (a read seeks there, then skips < N lines)
+    COMMIT_BATCH_SIZE = 1000    # Indexed segments committed per transaction (an interrupted refresh keeps its progress)
+    MAX_QUERY_VARIABLES = 500   # Segment IDs bound per 'IN (...)' lookup
+    WINDOW_SAMPLES = 50         # Same defaults as feature_extractor.py
+    SLIDE_STEP_SAMPLES = 25
+
+SEGMENT_TABLE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS segments (
+    segment_id INTEGER PRIMARY KEY,
+    relative_path TEXT NOT NULL UNIQUE,
+    label INTEGER NOT NULL,
+    row_count INTEGER NOT NULL,
+    start_us INTEGER,
+    end_us INTEGER,
+    file_bytes INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    header_line TEXT NOT NULL,
+    row_offsets BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_segments_label_rows ON segments (label, row_count);
+CREATE INDEX IF NOT EXISTS idx_segments_start ON segments (start_us);
+CREATE TABLE IF NOT EXISTS segment_snapshot (
+    snapshot_id INTEGER PRIMARY KEY CHECK (snapshot_id = 0),
+    segment_ids BLOB NOT NULL,
+    labels BLOB NOT NULL,
+    row_counts BLOB NOT NULL
+);
+"""
+
+ENTRY_COLUMNS = "segment_id, relative_path, label, row_count, start_us, end_us, file_bytes, sha256"
+SegmentEntry = namedtuple('SegmentEntry', ['segment_id', 'relative_path', 'label', 'row_count', 'start_us', 'end_us', 'file_bytes', 'sha256'])
+
+def _iso_to_epoch_us(timestamp_text):
+    try:
+        return int(np.datetime64(timestamp_text.strip(), 'us').astype(np.int64))
+    except ValueError:
+        return None
+
+def index_segment_bytes(segment_bytes, row_offset_stride=SegmentCatalogConfig.ROW_OFFSET_STRIDE, timestamp_column=SegmentCatalogConfig.TIMESTAMP_COLUMN):
+    """
+    Catalog fields of one segment CSV: header line, data row count, first/last timestamp (epoch us, None
+    without a timestamp column) and the byte offsets of every row_offset_stride-th data row.
+    """
+    header_end = segment_bytes.find(b'\n')
+    if header_end < 0:
+        return segment_bytes.decode('utf-8').strip(), 0, None, None, np.zeros(0, dtype=np.int64)
+    header_line = segment_bytes[:header_end].decode('utf-8').strip()
+    newline_positions = np.flatnonzero(np.frombuffer(segment_bytes, dtype=np.uint8) == ord('\n'))
+    row_starts = np.concatenate(([header_end + 1], newline_positions[1:] + 1))
+    row_starts = row_starts[row_starts < len(segment_bytes)]
+    row_count = len(row_starts)
+    start_us = end_us = None
+    header_columns = header_line.split(',')
+    if row_count and timestamp_column in header_columns:
+        timestamp_index = header_columns.index(timestamp_column)
+        last_row_end = newline_positions[-1] if newline_positions[-1] >= row_starts[-1] else len(segment_bytes)
+        first_row = segment_bytes[row_starts[0]:newline_positions[1] if len(newline_positions) > 1 else len(segment_bytes)]
+        last_row = segment_bytes[row_starts[-1]:last_row_end]
+        start_us = _iso_to_epoch_us(first_row.decode('utf-8').split(',')[timestamp_index])
+        end_us = _iso_to_epoch_us(last_row.decode('utf-8').split(',')[timestamp_index])
+    return header_line, row_count, start_us, end_us, row_starts[::row_offset_stride].astype(np.int64)
+
+class SegmentCatalog:
+    """
+    SQLite index of the per-segment CSVs under a segments directory (one row per file: label, row count,
+    start/end timestamps, checksum and row byte offsets). refresh() only re-reads files that are new or whose
+    size or modification time changed, and drops entries of deleted files. Queries and balanced sampling run
+    on the indexes and on a snapshot of (segment_id, label, row_count) arrays kept in the catalog itself, so
+    sampling over 100k segments does not build 100k Python rows; read_rows() opens just the one segment file
+    and seeks to the requested rows.
+    """
+    def __init__(self, catalog_path=SegmentCatalogConfig.CATALOG_PATH, segments_root_dir=SegmentCatalogConfig.SEGMENTS_ROOT_DIR, config_obj=SegmentCatalogConfig):
+        self.config = config_obj
+        self.catalog_path = catalog_path
+        self.segments_root_dir = segments_root_dir
+        catalog_dir = os.path.dirname(catalog_path)
+        if catalog_dir:
+            os.makedirs(catalog_dir, exist_ok=True)
+        self.connection = sqlite3.connect(catalog_path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SEGMENT_TABLE_SCHEMA)
+        self.connection.commit()
+        self._segment_snapshot = None
+        self._snapshot_data_version = None
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _scan_segment_files(self):
+        """relative path -> (size, mtime_ns) of every segment CSV under the root directory."""
+        found_files = {}
+        pending_dirs = [self.segments_root_dir]
+        while pending_dirs:
+            with os.scandir(pending_dirs.pop()) as dir_entries:
+                for dir_entry in dir_entries:
+                    if dir_entry.is_dir():
+                        pending_dirs.append(dir_entry.path)
+                    elif dir_entry.name.endswith('.csv'):
+                        file_stat = dir_entry.stat()
+                        relative_path = os.path.relpath(dir_entry.path, self.segments_root_dir).replace(os.sep, '/')
+                        found_files[relative_path] = (file_stat.st_size, file_stat.st_mtime_ns)
+        return found_files
+
+    def refresh(self, verify_checksums=False):
+        """
+        Brings the catalog in line with the segments directory. With verify_checksums, files whose size and
+        modification time are unchanged are hashed too (catches edits that preserved the mtime).
+        Returns a dict with the number of added, updated, removed and unchanged segments.
+        """
+        if not os.path.isdir(self.segments_root_dir):
+            raise FileNotFoundError(f"Segments directory '{self.segments_root_dir}' not found.")
+        found_files = self._scan_segment_files()
+        cataloged_files = {
+            relative_path: (file_bytes, mtime_ns, checksum)
+            for relative_path, file_bytes, mtime_ns, checksum in self.connection.execute("SELECT relative_path, file_bytes, mtime_ns, sha256 FROM segments")
+        }
+        refresh_counts = {'added': 0, 'updated': 0, 'removed': 0, 'unchanged': 0}
+
+        removed_paths = [(relative_path,) for relative_path in cataloged_files if relative_path not in found_files]
+        self.connection.executemany("DELETE FROM segments WHERE relative_path = ?", removed_paths)
+        refresh_counts['removed'] = len(removed_paths)
+
+        pending_rows = []
+        for relative_path in sorted(found_files):
+            file_bytes, mtime_ns = found_files[relative_path]
+            cataloged = cataloged_files.get(relative_path)
+            if cataloged is not None and cataloged[:2] == (file_bytes, mtime_ns) and not verify_checksums:
+                refresh_counts['unchanged'] += 1
+                continue
+            with open(os.path.join(self.segments_root_dir, relative_path), 'rb') as segment_file:
+                segment_bytes = segment_file.read()
+            checksum = hashlib.sha256(segment_bytes).hexdigest()
+            if cataloged is not None and cataloged[2] == checksum:
+                if cataloged[:2] != (file_bytes, mtime_ns): # Touched but identical: only the stat fields move
+                    self.connection.execute("UPDATE segments SET file_bytes = ?, mtime_ns = ? WHERE relative_path = ?", (file_bytes, mtime_ns, relative_path))
+                refresh_counts['unchanged'] += 1
+                continue
+            header_line, row_count, start_us, end_us, row_offsets = index_segment_bytes(
+                segment_bytes, self.config.ROW_OFFSET_STRIDE, self.config.TIMESTAMP_COLUMN)
+            pending_rows.append((
+                relative_path, label_from_segment_path(relative_path), row_count, start_us, end_us,
+                len(segment_bytes), mtime_ns, checksum, header_line, row_offsets.tobytes(),
+            ))
+            refresh_counts['added' if cataloged is None else 'updated'] += 1
+            if len(pending_rows) >= self.config.COMMIT_BATCH_SIZE:
+                self._upsert_segments(pending_rows)
+                pending_rows = []
+        self._upsert_segments(pending_rows)
+        has_snapshot = self.connection.execute("SELECT COUNT(*) FROM segment_snapshot").fetchone()[0]
+        if refresh_counts['added'] or refresh_counts['updated'] or refresh_counts['removed'] or not has_snapshot:
+            self._write_snapshot()
+        return refresh_counts
+
+    def _upsert_segments(self, segment_rows):
+        # Updating in place keeps the segment_id of a modified file stable
+        self.connection.executemany(
+            """INSERT INTO segments (relative_path, label, row_count, start_us, end_us, file_bytes, mtime_ns, sha256, header_line, row_offsets)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT(relative_path) DO UPDATE SET
+                   label = excluded.label, row_count = excluded.row_count, start_us = excluded.start_us, end_us = excluded.end_us,
+                   file_bytes = excluded.file_bytes, mtime_ns = excluded.mtime_ns, sha256 = excluded.sha256,
+                   header_line = excluded.header_line, row_offsets = excluded.row_offsets""",
+            segment_rows,
+        )
+        self.connection.commit()
+
+    def _write_snapshot(self):
+        segment_rows = np.array(self.connection.execute("SELECT segment_id, label, row_count FROM segments ORDER BY segment_id").fetchall(), dtype=np.int64).reshape(-1, 3)
+        self.connection.execute(
+            "INSERT OR REPLACE INTO segment_snapshot (snapshot_id, segment_ids, labels, row_counts) VALUES (0, ?, ?, ?)",
+            tuple(np.ascontiguousarray(segment_rows[:, column]).tobytes() for column in range(3)),
+        )
+        self.connection.commit()
+        self._segment_snapshot = None
+
+    def segment_arrays(self):
+        """
+        (segment_ids, labels, row_counts) int64 arrays of every cataloged segment. Cached, and reloaded only when
+        the catalog was changed (by this or another connection) since the last call.
+        """
+        data_version = self.connection.execute("PRAGMA data_version").fetchone()[0]
+        if self._segment_snapshot is None or data_version != self._snapshot_data_version:
+            snapshot_row = self.connection.execute("SELECT segment_ids, labels, row_counts FROM segment_snapshot").fetchone()
+            if snapshot_row is None:
+                self._write_snapshot()
+                snapshot_row = self.connection.execute("SELECT segment_ids, labels, row_counts FROM segment_snapshot").fetchone()
+            self._segment_snapshot = tuple(np.frombuffer(column_blob, dtype=np.int64) for column_blob in snapshot_row)
+            self._snapshot_data_version = data_version
+        return self._segment_snapshot
+
+    def query(self, label=None, min_rows=None, max_rows=None, start_after_us=None, end_before_us=None, limit=None):
+        """Segments matching all given filters, in segment_id order."""
+        conditions, parameters = [], []
+        for condition, parameter in (("label = ?", label), ("row_count >= ?", min_rows), ("row_count <= ?", max_rows),
+                                     ("start_us >= ?", start_after_us), ("end_us <= ?", end_before_us)):
+            if parameter is not None:
+                conditions.append(condition)
+                parameters.append(parameter)
+        sql = f"SELECT {ENTRY_COLUMNS} FROM segments"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY segment_id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            parameters.append(int(limit))
+        return [SegmentEntry(*row) for row in self.connection.execute(sql, parameters)]
+
+    def get_entries(self, segment_ids):
+        entries = []
+        segment_ids = [int(segment_id) for segment_id in segment_ids]
+        for chunk_start in range(0, len(segment_ids), self.config.MAX_QUERY_VARIABLES):
+            id_chunk = segment_ids[chunk_start : chunk_start + self.config.MAX_QUERY_VARIABLES]
+            placeholders = ",".join("?" * len(id_chunk))
+            entries.extend(SegmentEntry(*row) for row in self.connection.execute(
+                f"SELECT {ENTRY_COLUMNS} FROM segments WHERE segment_id IN ({placeholders})", id_chunk))
+        return sorted(entries)
+
+    def summary(self):
+        """label -> (segments, total rows)."""
+        _, labels, row_counts = self.segment_arrays()
+        return {
+            int(label): (int(np.count_nonzero(labels == label)), int(row_counts[labels == label].sum()))
+            for label in np.unique(labels)
+        }
+
+    def _labeled_segment_rows(self, min_rows):
+        """label -> (segment_id array, row_count array) of segments with a known label and at least min_rows rows."""
+        segment_ids, labels, row_counts = self.segment_arrays()
+        eligible = (labels >= 0) & (row_counts >= min_rows)
+        return {
+            int(label): (segment_ids[eligible & (labels == label)], row_counts[eligible & (labels == label)])
+            for label in np.unique(labels[eligible])
+        }
+
+    def balanced_subset(self, segments_per_label=None, min_rows=0, random_seed=42):
+        """
+        Random segments with the same count for every label (default: as many as the rarest label has).
+        Only the catalog is read; the segment files are not opened.
+        """
+        labeled_segments = self._labeled_segment_rows(min_rows)
+        if not labeled_segments:
+            return []
+        available_counts = [len(segment_ids) for segment_ids, _ in labeled_segments.values()]
+        subset_size = min(available_counts) if segments_per_label is None else min(segments_per_label, min(available_counts))
+        if segments_per_label is not None and subset_size < segments_per_label:
+            print(f"Warning: only {subset_size} segments per label available (requested {segments_per_label}).")
+        rng = np.random.default_rng(random_seed)
+        chosen_ids = [rng.choice(segment_ids, size=subset_size, replace=False) for segment_ids, _ in labeled_segments.values()]
+        return self.get_entries(np.concatenate(chosen_ids))
+
+    def balanced_windows(self, windows_per_label=None, window_samples=SegmentCatalogConfig.WINDOW_SAMPLES,
+                         slide_step_samples=SegmentCatalogConfig.SLIDE_STEP_SAMPLES, random_seed=42):
+        """
+        Random sliding windows (same grid as feature_extractor.py) with the same count for every label,
+        drawn uniformly over all windows of that label. Returns (segment_ids, labels, first_rows) arrays sorted
+        by segment and row, ready for read_rows().
+        """
+        labeled_segments = self._labeled_segment_rows(window_samples)
+        if not labeled_segments:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        window_counts_by_label = {
+            label: (row_counts - window_samples) // slide_step_samples + 1
+            for label, (_, row_counts) in labeled_segments.items()
+        }
+        available_windows = min(int(window_counts.sum()) for window_counts in window_counts_by_label.values())
+        sample_size = available_windows if windows_per_label is None else min(windows_per_label, available_windows)
+        if windows_per_label is not None and sample_size < windows_per_label:
+            print(f"Warning: only {sample_size} windows per label available (requested {windows_per_label}).")
+
+        rng = np.random.default_rng(random_seed)
+        chosen_segment_ids, chosen_labels, chosen_first_rows = [], [], []
+        for label, (segment_ids, _) in labeled_segments.items():
+            window_ends = np.cumsum(window_counts_by_label[label])
+            window_numbers = np.sort(rng.choice(int(window_ends[-1]), size=sample_size, replace=False))
+            segment_positions = np.searchsorted(window_ends, window_numbers, side='right')
+            window_starts = window_ends - window_counts_by_label[label]
+            first_rows = (window_numbers - window_starts[segment_positions]) * slide_step_samples
+            chosen_segment_ids.append(segment_ids[segment_positions])
+            chosen_labels.append(np.full(sample_size, label, dtype=np.int64))
+            chosen_first_rows.append(first_rows)
+
+        chosen_segment_ids, chosen_labels, chosen_first_rows = (np.concatenate(chosen) for chosen in (chosen_segment_ids, chosen_labels, chosen_first_rows))
+        file_order = np.lexsort((chosen_first_rows, chosen_segment_ids))
+        return chosen_segment_ids[file_order], chosen_labels[file_order], chosen_first_rows[file_order]
+
+    def read_rows(self, segment_id, first_row=0, num_rows=None):
+        """
+        DataFrame with rows [first_row, first_row + num_rows) of a segment. Seeks to the nearest stored row
+        offset, so only that part of the file is read.
+        """
+        catalog_row = self.connection.execute(
+            "SELECT relative_path, header_line, row_offsets, row_count FROM segments WHERE segment_id = ?", (int(segment_id),)).fetchone()
+        if catalog_row is None:
+            raise KeyError(f"Segment {segment_id} is not in the catalog.")
+        relative_path, header_line, row_offsets_blob, row_count = catalog_row
+        row_offsets = np.frombuffer(row_offsets_blob, dtype=np.int64)
+        stop_row = row_count if num_rows is None else min(first_row + num_rows, row_count)
+        if first_row >= stop_row:
+            return pd.read_csv(io.StringIO(header_line + '\n'))
+
+        stride = self.config.ROW_OFFSET_STRIDE
+        anchor_index = first_row // stride
+        end_anchor_index = -(-stop_row // stride)
+        with open(os.path.join(self.segments_root_dir, relative_path), 'rb') as segment_file:
+            segment_file.seek(int(row_offsets[anchor_index]))
+            if end_anchor_index < len(row_offsets):
+                chunk_bytes = segment_file.read(int(row_offsets[end_anchor_index] - row_offsets[anchor_index]))
+            else:
+                chunk_bytes = segment_file.read()
+        chunk_lines = chunk_bytes.splitlines()[first_row - anchor_index * stride : stop_row - anchor_index * stride]
+        return pd.read_csv(io.BytesIO(header_line.encode('utf-8') + b'\n' + b'\n'.join(chunk_lines)))
+
+def _format_epoch_us(epoch_us):
+    return '-' if epoch_us is None else str(np.datetime64(int(epoch_us), 'us'))
+
+def execute_segment_catalog_tool():
+    parser = argparse.ArgumentParser(description="Build and query the segment catalog of dataset_segments/.")
+    parser.add_argument('command', choices=['refresh', 'summary', 'balanced', 'windows'])
+    parser.add_argument('--segments-dir', default=SegmentCatalogConfig.SEGMENTS_ROOT_DIR)
+    parser.add_argument('--catalog', default=SegmentCatalogConfig.CATALOG_PATH)
+    parser.add_argument('--verify', action='store_true', help="refresh: hash every file, not only new or modified ones")
+    parser.add_argument('--count', type=int, help="balanced/windows: segments or windows per label (default: as many as the rarest label has)")
+    parser.add_argument('--min-rows', type=int, default=0, help="balanced: skip segments shorter than this")
+    parser.add_argument('--window-samples', type=int, default=SegmentCatalogConfig.WINDOW_SAMPLES)
+    parser.add_argument('--step-samples', type=int, default=SegmentCatalogConfig.SLIDE_STEP_SAMPLES)
+    parser.add_argument('--seed', type=int, default=42)
+    arguments = parser.parse_args()
+
+    with SegmentCatalog(arguments.catalog, arguments.segments_dir) as segment_catalog:
+        if arguments.command == 'refresh':
+            refresh_start = time.perf_counter()
+            try:
+                refresh_counts = segment_catalog.refresh(verify_checksums=arguments.verify)
+            except FileNotFoundError as e:
+                print(f"ERROR: {e}")
+                return
+            print(f"Catalog '{arguments.catalog}' refreshed in {time.perf_counter() - refresh_start:.2f} s: "
+                  + ", ".join(f"{count} {state}" for state, count in refresh_counts.items()))
+        elif arguments.command == 'summary':
+            for label, (segment_count, total_rows) in segment_catalog.summary().items():
+                print(f"label {label}: {segment_count} segments, {total_rows} rows")
+        elif arguments.command == 'balanced':
+            query_start = time.perf_counter()
+            entries = segment_catalog.balanced_subset(arguments.count, arguments.min_rows, arguments.seed)
+            query_ms = (time.perf_counter() - query_start) * 1000
+            for entry in entries:
+                print(f"{entry.label}  {entry.row_count:>7}  {_format_epoch_us(entry.start_us)}  {entry.relative_path}")
+            print(f"{len(entries)} segments selected in {query_ms:.1f} ms")
+        else:
+            query_start = time.perf_counter()
+            segment_ids, labels, first_rows = segment_catalog.balanced_windows(arguments.count, arguments.window_samples, arguments.step_samples, arguments.seed)
+            query_ms = (time.perf_counter() - query_start) * 1000
+            paths_by_id = {entry.segment_id: entry.relative_path for entry in segment_catalog.get_entries(np.unique(segment_ids))}
+            for segment_id, label, first_row in zip(segment_ids, labels, first_rows):
+                print(f"{label}  rows {first_row}-{first_row + arguments.window_samples - 1}  {paths_by_id[segment_id]}")
+            print(f"{len(segment_ids)} windows selected in {query_ms:.1f} ms")
+
+if __name__ == '__main__':
+    execute_segment_catalog_tool()
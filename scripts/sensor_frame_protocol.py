@@ -0,0 +1,99 @@
+import numpy as np
+
+# --- Binary sample frames of the collection firmware (BINARY_FRAME_MODE in esp32_mpu6050_data_collection.ino) ---
+# Frame (24 bytes, little-endian):
+#   sync 0xAA 0x55 | sequence u16 | device_time_us u32 (micros()) | ax, ay, az float32 (m/s^2) | marker u8 | reserved u8
+#   | crc16 u16 (CRC-16/CCITT-FALSE over the 20 bytes from sequence to reserved)
+# Matches this C layout on the ESP32:
+#   struct __attribute__((packed)) SampleFrame { uint8_t sync[2]; uint16_t seq; uint32_t t_us; float accel[3]; uint8_t marker; uint8_t reserved; uint16_t crc; };
+class SensorFrameProtocol:
+    SYNC_BYTES = b'\xaa\x55'
+    FRAME_BYTES = 24
+    CRC_START = 2  # CRC covers frame bytes [CRC_START, CRC_END)
+    CRC_END = 22
+    SEQUENCE_MODULUS = 1 << 16
+    DEVICE_CLOCK_MODULUS = 1 << 32 # micros() wraps after ~71.6 minutes
+
+SENSOR_FRAME_DTYPE = np.dtype([
+    ('sync', 'V2'),
+    ('sequence', '<u2'),
+    ('device_time_us', '<u4'),
+    ('accel', '<f4', (3,)),
+    ('marker', 'u1'),
+    ('reserved', 'u1'),
+    ('crc', '<u2'),
+])
+
+def _build_crc16_table():
+    crc_table = np.zeros(256, dtype=np.uint16)
+    for byte_value in range(256):
+        crc = byte_value << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+        crc_table[byte_value] = crc & 0xFFFF
+    return crc_table
+
+CRC16_TABLE = _build_crc16_table()
+
+def compute_frame_crcs(frame_bytes_matrix):
+    """CRC-16/CCITT-FALSE of many frames at once: frame_bytes_matrix is (n_frames, n_bytes) uint8, one column per step."""
+    crcs = np.full(len(frame_bytes_matrix), 0xFFFF, dtype=np.uint16)
+    for byte_column in frame_bytes_matrix.T:
+        crcs = (crcs << 8) ^ CRC16_TABLE[(crcs >> 8) ^ byte_column]
+    return crcs
+
+def encode_sensor_frames(sequences, device_times_us, accel_values, markers):
+    """Builds consecutive frames (used by the fake device and tests; the firmware fills the same packed struct)."""
+    sensor_frames = np.zeros(len(sequences), dtype=SENSOR_FRAME_DTYPE)
+    sensor_frames['sync'] = SensorFrameProtocol.SYNC_BYTES
+    sensor_frames['sequence'] = np.asarray(sequences, dtype=np.int64) % SensorFrameProtocol.SEQUENCE_MODULUS
+    sensor_frames['device_time_us'] = np.asarray(device_times_us, dtype=np.int64) % SensorFrameProtocol.DEVICE_CLOCK_MODULUS
+    sensor_frames['accel'] = accel_values
+    sensor_frames['marker'] = markers
+    frame_bytes_matrix = sensor_frames.view(np.uint8).reshape(-1, SensorFrameProtocol.FRAME_BYTES)
+    sensor_frames['crc'] = compute_frame_crcs(frame_bytes_matrix[:, SensorFrameProtocol.CRC_START:SensorFrameProtocol.CRC_END])
+    return sensor_frames.tobytes()
+
+def find_valid_frames(stream_bytes):
+    """
+    Locates frames in a byte stream. Returns (frames, consumed_bytes, skipped_bytes, crc_errors): frames is a structured
+    array of the valid frames in order, consumed_bytes how much of stream_bytes was used up (the rest may be the start
+    of a frame). Aligned runs of frames are checked in bulk; bytes outside frames and frames failing the CRC are
+    skipped by searching for the next sync word.
+    """
+    valid_blocks = []
+    skipped_bytes = 0
+    crc_errors = 0
+    position = 0
+    stream_length = len(stream_bytes)
+    frame_size = SensorFrameProtocol.FRAME_BYTES
+    while stream_length - position >= frame_size:
+        sync_position = stream_bytes.find(SensorFrameProtocol.SYNC_BYTES, position)
+        if sync_position < 0:
+            # Keep a last byte that may be the first half of a sync word
+            last_byte_is_sync_start = stream_bytes[-1:] == SensorFrameProtocol.SYNC_BYTES[:1]
+            skipped_bytes += stream_length - position - last_byte_is_sync_start
+            return _join_frame_blocks(valid_blocks), stream_length - last_byte_is_sync_start, skipped_bytes, crc_errors
+        skipped_bytes += sync_position - position
+        position = sync_position
+        candidate_count = (stream_length - position) // frame_size
+        if candidate_count == 0:
+            break
+        candidate_frames = np.frombuffer(stream_bytes, dtype=SENSOR_FRAME_DTYPE, count=candidate_count, offset=position)
+        candidate_bytes = np.frombuffer(stream_bytes, dtype=np.uint8, count=candidate_count * frame_size, offset=position).reshape(candidate_count, frame_size)
+        has_sync = (candidate_bytes[:, 0] == SensorFrameProtocol.SYNC_BYTES[0]) & (candidate_bytes[:, 1] == SensorFrameProtocol.SYNC_BYTES[1])
+        aligned_count = candidate_count if has_sync.all() else int(np.argmin(has_sync))
+        crc_matches = compute_frame_crcs(candidate_bytes[:aligned_count, SensorFrameProtocol.CRC_START:SensorFrameProtocol.CRC_END]) == candidate_frames['crc'][:aligned_count]
+        valid_count = aligned_count if crc_matches.all() else int(np.argmin(crc_matches))
+        valid_blocks.append(candidate_frames[:valid_count])
+        position += valid_count * frame_size
+        if valid_count < aligned_count:
+            crc_errors += 1 # Corrupt frame (or a sync pattern inside other data): look for the next sync word after it
+            skipped_bytes += 2
+            position += 2
+    return _join_frame_blocks(valid_blocks), position, skipped_bytes, crc_errors
+
+def _join_frame_blocks(valid_blocks):
+    if not valid_blocks:
+        return np.zeros(0, dtype=SENSOR_FRAME_DTYPE)
+    return valid_blocks[0] if len(valid_blocks) == 1 else np.concatenate(valid_blocks)
@@ -0,0 +1,291 @@
+import datetime
+import threading
+import time
+from collections import deque
+import numpy as np
+from sensor_frame_protocol import SensorFrameProtocol, find_valid_frames
+
+# --- Configuration for the Threaded Serial Capture ---
+class SerialCaptureConfig:
+    RING_BUFFER_BYTES = 4 * 1024 * 1024 # Bytes read but not yet decoded (~6 min of ASCII samples at 115200 baud)
+    WRITE_BATCH_ROWS = 500              # Rows written to the CSV in one call
+    WRITE_FLUSH_INTERVAL_S = 0.5        # Longest time a decoded row waits before it is written and flushed
+    MAX_PRINTED_WARNINGS = 20           # Malformed lines are always counted, but only the first ones are printed
+    # Binary frames: a device clock jump larger than this between consecutive frames is taken as a board reset
+    DEVICE_RESET_JUMP_S = 10.0
+
+class ByteRingBuffer:
+    """
+    Fixed-size byte FIFO between the serial reader thread and the decoder/writer thread. Each write() is kept as
+    a segment with the monotonic time it was read at. When the buffer is full the incoming bytes are dropped and
+    counted, and the next segment is flagged so the decoder discards the line broken by the gap.
+    """
+    def __init__(self, capacity_bytes):
+        self.capacity_bytes = capacity_bytes
+        self.buffer = bytearray(capacity_bytes)
+        self.read_position = 0
+        self.used_bytes = 0
+        self.segments = deque() # (length, read_time, follows_gap)
+        self.dropped_bytes = 0
+        self.dropped_newlines = 0 # Complete lines lost with the dropped bytes (line-based streams)
+        self.gap_pending = False
+        self.data_available = threading.Condition()
+
+    def write(self, data, read_time):
+        with self.data_available:
+            if len(data) > self.capacity_bytes - self.used_bytes:
+                self.dropped_bytes += len(data)
+                self.dropped_newlines += data.count(b"\n")
+                self.gap_pending = True
+                return False
+            write_position = (self.read_position + self.used_bytes) % self.capacity_bytes
+            first_part = min(len(data), self.capacity_bytes - write_position)
+            self.buffer[write_position:write_position + first_part] = data[:first_part]
+            self.buffer[:len(data) - first_part] = data[first_part:]
+            self.used_bytes += len(data)
+            self.segments.append((len(data), read_time, self.gap_pending))
+            self.gap_pending = False
+            self.data_available.notify()
+            return True
+
+    def read_segments(self, timeout):
+        """Waits up to timeout for data, then takes everything buffered as a list of (bytes, read_time, follows_gap)."""
+        with self.data_available:
+            if not self.used_bytes:
+                self.data_available.wait(timeout)
+            taken_segments = []
+            while self.segments:
+                segment_length, read_time, follows_gap = self.segments.popleft()
+                first_part = min(segment_length, self.capacity_bytes - self.read_position)
+                segment_bytes = bytes(self.buffer[self.read_position:self.read_position + first_part]) + bytes(self.buffer[:segment_length - first_part])
+                self.read_position = (self.read_position + segment_length) % self.capacity_bytes
+                self.used_bytes -= segment_length
+                taken_segments.append((segment_bytes, read_time, follows_gap))
+            return taken_segments
+
+class CaptureCounters:
+    def __init__(self):
+        self.rows_written = 0
+        self.malformed_lines = 0 # Wrong field count or unparsable numbers
+        self.broken_lines = 0    # Lines cut in two by a ring buffer overflow (discarded by the decoder)
+        self.info_lines = 0      # "INFO:" messages of the firmware
+        # Binary frame mode
+        self.missing_frames = 0  # Sequence numbers never received (serial errors, buffer overflows)
+        self.crc_errors = 0
+        self.skipped_bytes = 0   # Bytes outside valid frames (boot messages, noise)
+        self.device_resets = 0
+
+class AsciiLineDecoder:
+    """Splits the ASCII stream of esp32_mpu6050_data_collection.ino ('ax,ay,az,marker' lines) into sample rows."""
+    def __init__(self, counters, info_callback=print, max_printed_warnings=SerialCaptureConfig.MAX_PRINTED_WARNINGS):
+        self.counters = counters
+        self.info_callback = info_callback
+        self.max_printed_warnings = max_printed_warnings
+        self.partial_line = b""
+        self.skipping_to_newline = False
+
+    def _report_malformed_line(self, line_bytes):
+        self.counters.malformed_lines += 1
+        if self.counters.malformed_lines <= self.max_printed_warnings:
+            print(f"Warning: Unexpected line format: '{line_bytes.decode('utf-8', 'replace')}'")
+
+    def decode(self, data, read_time, follows_gap=False):
+        """Returns the (read_time, ax, ay, az, marker) rows completed by data."""
+        if follows_gap:
+            # Bytes were lost before data: the buffered partial line and the line data starts in are broken
+            self.partial_line = b""
+            self.skipping_to_newline = True
+        if self.skipping_to_newline:
+            first_newline = data.find(b"\n")
+            if first_newline < 0:
+                return []
+            data = data[first_newline + 1:]
+            self.skipping_to_newline = False
+            self.counters.broken_lines += 1
+
+        lines = (self.partial_line + data).split(b"\n")
+        self.partial_line = lines.pop()
+        decoded_rows = []
+        for line_bytes in lines:
+            line_bytes = line_bytes.strip()
+            if not line_bytes:
+                continue
+            fields = line_bytes.split(b",")
+            if len(fields) == 4:
+                try: # float()/int() accept ASCII bytes directly, no decode step needed
+                    decoded_rows.append((read_time, float(fields[0]), float(fields[1]), float(fields[2]), int(fields[3])))
+                    continue
+                except ValueError:
+                    pass
+            if line_bytes.startswith(b"INFO:"):
+                self.counters.info_lines += 1
+                self.info_callback(f"ESP32 Info: {line_bytes.decode('utf-8', 'replace')}")
+            else:
+                self._report_malformed_line(line_bytes)
+        return decoded_rows
+
+    def describe_losses(self, ring_buffer):
+        dropped_lines = ring_buffer.dropped_newlines + self.counters.broken_lines
+        return (f"{self.counters.malformed_lines} malformed lines, {dropped_lines} lines dropped "
+                f"({ring_buffer.dropped_bytes} bytes lost to buffer overflow), {self.counters.info_lines} info messages")
+
+class BinaryFrameDecoder:
+    """
+    Decodes the binary frames of esp32_mpu6050_data_collection.ino (BINARY_FRAME_MODE, see sensor_frame_protocol.py)
+    in bulk with NumPy. Lost frames are counted exactly from the sequence numbers, and each row gets its own time from
+    the device clock (anchored to the read time of the first frame) instead of the time its chunk was read.
+    """
+    def __init__(self, counters, device_reset_jump_s=SerialCaptureConfig.DEVICE_RESET_JUMP_S):
+        self.counters = counters
+        self.device_reset_jump_us = int(device_reset_jump_s * 1e6)
+        self.pending_bytes = b""
+        self.last_sequence = None
+        self.last_device_time_us = None # Unwrapped (micros() overflows every ~71.6 minutes)
+        self.monotonic_anchor = None
+        self.device_time_anchor_us = None
+
+    def decode(self, data, read_time, follows_gap=False):
+        """Returns the (time, ax, ay, az, marker) rows of the frames completed by data."""
+        if follows_gap:
+            self.pending_bytes = b"" # The frame cut by the gap fails its sync/CRC anyway; the sequence numbers count it
+        sensor_frames, consumed_bytes, skipped_bytes, crc_errors = find_valid_frames(self.pending_bytes + data)
+        self.pending_bytes = (self.pending_bytes + data)[consumed_bytes:]
+        self.counters.skipped_bytes += skipped_bytes
+        self.counters.crc_errors += crc_errors
+        if not len(sensor_frames):
+            return []
+
+        sequences = sensor_frames['sequence'].astype(np.int64)
+        device_times = sensor_frames['device_time_us'].astype(np.int64)
+        previous_sequence = sequences[0] - 1 if self.last_sequence is None else self.last_sequence
+        previous_time = device_times[0] if self.last_device_time_us is None else self.last_device_time_us
+        sequence_steps = np.diff(sequences, prepend=previous_sequence) % SensorFrameProtocol.SEQUENCE_MODULUS
+        time_steps = np.diff(device_times, prepend=previous_time % SensorFrameProtocol.DEVICE_CLOCK_MODULUS) % SensorFrameProtocol.DEVICE_CLOCK_MODULUS
+        reset_steps = time_steps > self.device_reset_jump_us
+        if self.monotonic_anchor is None or reset_steps.any():
+            # First frames, or the board restarted (its clock and sequence begin again): re-anchor on this read
+            if self.monotonic_anchor is not None:
+                self.counters.device_resets += int(reset_steps.sum())
+            first_reset = int(np.argmax(reset_steps)) if reset_steps.any() else 0
+            time_steps[reset_steps] = 0
+            sequence_steps[reset_steps] = 1
+            unwrapped_times = previous_time + np.cumsum(time_steps)
+            self.monotonic_anchor = read_time - (unwrapped_times[-1] - unwrapped_times[first_reset]) / 1e6
+            self.device_time_anchor_us = int(unwrapped_times[first_reset])
+        else:
+            unwrapped_times = previous_time + np.cumsum(time_steps)
+        # A step of 0 is a repeated frame, anything above 1 a gap (frames lost in transit or to a buffer overflow)
+        self.counters.missing_frames += int(np.maximum(sequence_steps - 1, 0).sum())
+        self.last_sequence = int(sequences[-1])
+        self.last_device_time_us = int(unwrapped_times[-1])
+
+        row_times = self.monotonic_anchor + (unwrapped_times - self.device_time_anchor_us) / 1e6
+        accel_values = sensor_frames['accel'].astype(np.float64)
+        return list(zip(row_times.tolist(), accel_values[:, 0].tolist(), accel_values[:, 1].tolist(),
+                        accel_values[:, 2].tolist(), sensor_frames['marker'].tolist()))
+
+    def describe_losses(self, ring_buffer):
+        return (f"{self.counters.missing_frames} frames missing (sequence gaps), {self.counters.crc_errors} CRC errors, "
+                f"{self.counters.skipped_bytes} bytes outside frames ({ring_buffer.dropped_bytes} bytes lost to buffer overflow), "
+                f"{self.counters.device_resets} device resets")
+
+class MonotonicTimestampFormatter:
+    """ISO timestamps derived from time.monotonic() (immune to wall clock jumps), anchored to the wall clock once."""
+    def __init__(self):
+        self.wall_clock_anchor = datetime.datetime.now()
+        self.monotonic_anchor = time.monotonic()
+
+    def format(self, monotonic_time):
+        return (self.wall_clock_anchor + datetime.timedelta(seconds=monotonic_time - self.monotonic_anchor)).isoformat()
+
+class SerialCaptureEngine:
+    """
+    Captures the serial stream without ever pausing the port: a reader thread moves whatever bytes are waiting into a
+    ByteRingBuffer, and a writer thread decodes them and appends the rows to the CSV in batches. row_callback (if given)
+    sees every decoded row, e.g. for live classification. Operator commands are written to the port from any thread.
+    """
+    def __init__(self, serial_conn, csv_writer, output_file, config_obj=SerialCaptureConfig, row_callback=None, line_decoder=None, binary_frames=False):
+        self.serial_conn = serial_conn
+        self.csv_writer = csv_writer
+        self.output_file = output_file
+        self.config = config_obj
+        self.row_callback = row_callback
+        self.counters = CaptureCounters()
+        if line_decoder is None:
+            line_decoder = (BinaryFrameDecoder(self.counters, config_obj.DEVICE_RESET_JUMP_S) if binary_frames
+                            else AsciiLineDecoder(self.counters, max_printed_warnings=config_obj.MAX_PRINTED_WARNINGS))
+        self.line_decoder = line_decoder
+        self.ring_buffer = ByteRingBuffer(config_obj.RING_BUFFER_BYTES)
+        self.timestamp_formatter = MonotonicTimestampFormatter()
+        self.stop_requested = threading.Event()
+        self.reader_finished = threading.Event()
+        self.reader_error = None
+        self.reader_thread = threading.Thread(target=self._run_reader, name="serial-reader", daemon=True)
+        self.writer_thread = threading.Thread(target=self._run_writer, name="csv-writer", daemon=True)
+
+    def start(self):
+        self.reader_thread.start()
+        self.writer_thread.start()
+
+    def _run_reader(self):
+        try:
+            while not self.stop_requested.is_set():
+                # Blocks for at most the port timeout when idle, otherwise takes everything the OS has buffered
+                received_bytes = self.serial_conn.read(max(self.serial_conn.in_waiting, 1))
+                if received_bytes:
+                    self.ring_buffer.write(received_bytes, time.monotonic())
+        except Exception as e: # Port closed or device unplugged
+            self.reader_error = e
+            self.stop_requested.set()
+        finally:
+            self.reader_finished.set()
+            with self.ring_buffer.data_available:
+                self.ring_buffer.data_available.notify()
+
+    def write_command(self, command_bytes):
+        self.serial_conn.write(command_bytes)
+
+    def _write_rows(self, pending_rows):
+        formatted_times = {} # ASCII rows read together share their read time: format it once
+        csv_rows = []
+        for read_time, ax, ay, az, event_marker in pending_rows:
+            timestamp_str = formatted_times.get(read_time)
+            if timestamp_str is None:
+                timestamp_str = formatted_times[read_time] = self.timestamp_formatter.format(read_time)
+            csv_rows.append((timestamp_str, ax, ay, az, event_marker))
+        self.csv_writer.writerows(csv_rows)
+        self.output_file.flush()
+        self.counters.rows_written += len(csv_rows)
+
+    def _run_writer(self):
+        pending_rows = []
+        last_write_time = time.monotonic()
+        while True:
+            reader_done = self.reader_finished.is_set() # Checked before reading, so the final drain is complete
+            for segment_bytes, read_time, follows_gap in self.ring_buffer.read_segments(self.config.WRITE_FLUSH_INTERVAL_S):
+                decoded_rows = self.line_decoder.decode(segment_bytes, read_time, follows_gap)
+                if self.row_callback is not None:
+                    for decoded_row in decoded_rows:
+                        self.row_callback(decoded_row)
+                pending_rows.extend(decoded_rows)
+            if pending_rows and (reader_done or len(pending_rows) >= self.config.WRITE_BATCH_ROWS
+                                 or time.monotonic() - last_write_time >= self.config.WRITE_FLUSH_INTERVAL_S):
+                self._write_rows(pending_rows)
+                pending_rows = []
+                last_write_time = time.monotonic()
+            if reader_done:
+                break
+
+    def stop(self):
+        """Stops reading, then waits until every byte already read has been decoded and written."""
+        self.stop_requested.set()
+        self.reader_thread.join()
+        self.writer_thread.join()
+
+    @property
+    def dropped_lines(self):
+        """Lines lost to ring buffer overflows: the ones inside the dropped bytes plus the ones cut by a gap."""
+        return self.ring_buffer.dropped_newlines + self.counters.broken_lines
+
+    def status_line(self):
+        return f"{self.counters.rows_written} rows written, {self.line_decoder.describe_losses(self.ring_buffer)}"
@@ -0,0 +1,234 @@
+import cProfile
+import io
+import json
+import pstats
+import resource
+import sys
+import threading
+import time
+from collections import Counter
+
+# --- Per-stage instrumentation of the offline pipelines (extract_labeled_segments.py, feature_extractor.py) ---
+# Enabled through the pipeline config: ENABLE_STAGE_PROFILING, PROFILER_MODE and PROFILE_OUTPUT_PATH, STAGE_REPORT_PATH.
+class StageProfilerConfig:
+    SAMPLING_INTERVAL_S = 0.005 # Stack sampling period of the 'sampling' profiler mode
+    TOP_FUNCTIONS_PRINTED = 15  # Functions listed after a cProfile run
+
+def _read_peak_rss_mb():
+    """Peak RSS of this process (VmHWM), falling back to ru_maxrss where /proc is not available."""
+    try:
+        with open('/proc/self/status') as status_file:
+            for status_line in status_file:
+                if status_line.startswith('VmHWM:'):
+                    return int(status_line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 if sys.platform != 'darwin' else 1024**2)
+
+def _reset_peak_rss():
+    """Starts a new VmHWM measurement (Linux clear_refs). Returns False where peaks can only be process-wide."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs_file:
+            clear_refs_file.write('5')
+        return True
+    except OSError:
+        return False
+
+class StageRecord:
+    __slots__ = ('name', 'rows', 'wall_seconds', 'cpu_seconds', 'peak_rss_mb', 'peak_is_stage_local')
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = None # Set by the instrumented code
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.peak_rss_mb = None
+        self.peak_is_stage_local = False
+
+    @property
+    def rows_per_s(self):
+        if not self.rows or self.wall_seconds <= 0:
+            return None
+        return self.rows / self.wall_seconds
+
+    def as_dict(self):
+        return {'stage': self.name, 'rows': int(self.rows) if self.rows is not None else None, 'wall_seconds': self.wall_seconds, 'cpu_seconds': self.cpu_seconds,
+                'rows_per_s': self.rows_per_s, 'peak_rss_mb': self.peak_rss_mb, 'peak_is_stage_local': self.peak_is_stage_local}
+
+class _DisabledStage:
+    """Shared context of a disabled profiler: entering and exiting it does nothing, assigning rows is ignored."""
+    __slots__ = ('rows',)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+_DISABLED_STAGE = _DisabledStage()
+
+class _ActiveStage:
+    __slots__ = ('profiler', 'record', 'wall_started', 'cpu_started')
+
+    def __init__(self, profiler, record):
+        self.profiler = profiler
+        self.record = record
+
+    def __enter__(self):
+        # Resetting the peak would hide the enclosing stages' peak so far: hand it to them first
+        self.profiler._carry_peak_to_open_stages()
+        self.record.peak_is_stage_local = _reset_peak_rss()
+        self.profiler.open_records.append(self.record)
+        self.cpu_started = time.process_time()
+        self.wall_started = time.perf_counter()
+        return self.record
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.record.wall_seconds += time.perf_counter() - self.wall_started
+        self.record.cpu_seconds += time.process_time() - self.cpu_started
+        self.profiler._carry_peak_to_open_stages()
+        self.profiler.open_records.remove(self.record)
+        self.profiler.records.append(self.record)
+        return False
+
+class SamplingProfiler:
+    """
+    Low-overhead statistical profiler: a thread samples the profiled thread's stack every interval and counts
+    collapsed stacks ('module:function;module:function ...'), the input format of flamegraph.pl and speedscope.
+    """
+    def __init__(self, interval_s=StageProfilerConfig.SAMPLING_INTERVAL_S):
+        self.interval_s = interval_s
+        self.stack_counts = Counter()
+        self.target_thread_id = None
+        self.stop_requested = threading.Event()
+        self.sampler_thread = None
+
+    def enable(self):
+        self.target_thread_id = threading.get_ident()
+        self.stop_requested.clear()
+        self.sampler_thread = threading.Thread(target=self._run_sampler, name="stack-sampler", daemon=True)
+        self.sampler_thread.start()
+
+    def _run_sampler(self):
+        while not self.stop_requested.wait(self.interval_s):
+            frame = sys._current_frames().get(self.target_thread_id)
+            stack_entries = []
+            while frame is not None:
+                stack_entries.append(f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}")
+                frame = frame.f_back
+            if stack_entries:
+                self.stack_counts[";".join(reversed(stack_entries))] += 1
+
+    def disable(self):
+        self.stop_requested.set()
+        self.sampler_thread.join()
+
+    def dump_stats(self, output_path):
+        with open(output_path, 'w') as output_file:
+            for collapsed_stack, sample_count in self.stack_counts.most_common():
+                output_file.write(f"{collapsed_stack} {sample_count}\n")
+
+    def top_functions(self, limit):
+        """(function, share of samples in which it is on the stack) for the most frequent functions."""
+        function_counts = Counter()
+        for collapsed_stack, sample_count in self.stack_counts.items():
+            for function_name in set(collapsed_stack.split(";")):
+                function_counts[function_name] += sample_count
+        total_samples = max(sum(self.stack_counts.values()), 1)
+        return [(function_name, sample_count / total_samples) for function_name, sample_count in function_counts.most_common(limit)]
+
+class StageProfiler:
+    """
+    Records wall time, CPU time, rows, rows/s and peak RSS of named pipeline stages:
+
+        with profiler.stage("read_source") as stage:
+            source_df = pd.read_csv(path)
+            stage.rows = len(source_df)
+
+    A disabled profiler hands out one shared no-op context, so instrumented code costs a method call per stage.
+    profile_run() optionally wraps a whole run in cProfile or the sampling profiler and writes the profile to a file.
+    """
+    def __init__(self, enabled=False, profiler_mode=None, profile_output_path=None, report_path=None):
+        self.enabled = enabled
+        self.profiler_mode = profiler_mode if enabled else None
+        self.profile_output_path = profile_output_path
+        self.report_path = report_path
+        self.records = []      # Finished stages, in completion order
+        self.open_records = [] # Stages being measured (outermost first)
+
+    @classmethod
+    def from_config(cls, config_obj):
+        return cls(getattr(config_obj, 'ENABLE_STAGE_PROFILING', False), getattr(config_obj, 'PROFILER_MODE', None),
+                   getattr(config_obj, 'PROFILE_OUTPUT_PATH', None), getattr(config_obj, 'STAGE_REPORT_PATH', None))
+
+    def _carry_peak_to_open_stages(self):
+        if not self.open_records:
+            return
+        current_peak_mb = _read_peak_rss_mb()
+        for record in self.open_records:
+            record.peak_rss_mb = max(record.peak_rss_mb or 0.0, current_peak_mb)
+
+    def stage(self, stage_name):
+        if not self.enabled:
+            return _DISABLED_STAGE
+        return _ActiveStage(self, StageRecord(stage_name))
+
+    def profile_run(self, run_function):
+        """Calls run_function() under the configured profiler (if any) and prints the stage report afterwards."""
+        if not self.enabled:
+            return run_function()
+        code_profiler = None
+        if self.profiler_mode == 'cprofile':
+            code_profiler = cProfile.Profile()
+        elif self.profiler_mode == 'sampling':
+            code_profiler = SamplingProfiler()
+        elif self.profiler_mode:
+            print(f"Warning: Unknown PROFILER_MODE '{self.profiler_mode}' (use 'cprofile' or 'sampling'). Profiling only stage times.")
+        run_started = time.perf_counter()
+        if code_profiler is not None:
+            code_profiler.enable()
+        try:
+            return run_function()
+        finally:
+            if code_profiler is not None:
+                code_profiler.disable()
+            self.print_report(time.perf_counter() - run_started)
+            if code_profiler is not None:
+                self._report_code_profile(code_profiler)
+            if self.report_path:
+                self.write_report(self.report_path)
+
+    def print_report(self, total_wall_seconds=None):
+        if not self.records:
+            return
+        print("\n--- Stage profile ---")
+        print(f"{'stage':<34} {'rows':>12} {'wall s':>9} {'cpu s':>9} {'rows/s':>13} {'peak RSS MB':>12}")
+        for record in self.records:
+            rows_text = f"{record.rows:,}" if record.rows is not None else "-"
+            rate_text = f"{record.rows_per_s:,.0f}" if record.rows_per_s is not None else "-"
+            peak_text = f"{record.peak_rss_mb:.1f}" + ("" if record.peak_is_stage_local else "*")
+            print(f"{record.name:<34} {rows_text:>12} {record.wall_seconds:>9.3f} {record.cpu_seconds:>9.3f} {rate_text:>13} {peak_text:>12}")
+        if total_wall_seconds is not None:
+            print(f"{'total':<34} {'':>12} {total_wall_seconds:>9.3f}")
+        if not all(record.peak_is_stage_local for record in self.records):
+            print("* process-wide peak (per-stage peak RSS needs Linux /proc/self/clear_refs)")
+
+    def _report_code_profile(self, code_profiler):
+        if isinstance(code_profiler, cProfile.Profile):
+            profile_text = io.StringIO()
+            pstats.Stats(code_profiler, stream=profile_text).sort_stats('cumulative').print_stats(StageProfilerConfig.TOP_FUNCTIONS_PRINTED)
+            print(profile_text.getvalue())
+        else:
+            print(f"Most sampled functions ({sum(code_profiler.stack_counts.values())} samples):")
+            for function_name, sample_share in code_profiler.top_functions(StageProfilerConfig.TOP_FUNCTIONS_PRINTED):
+                print(f"  {sample_share:>6.1%}  {function_name}")
+        if self.profile_output_path:
+            code_profiler.dump_stats(self.profile_output_path)
+            print(f"Profile written to: {self.profile_output_path}"
+                  + (" (open with snakeviz or pstats)" if isinstance(code_profiler, cProfile.Profile) else " (collapsed stacks for flamegraph.pl / speedscope)"))
+
+    def write_report(self, report_path):
+        with open(report_path, 'w') as report_file:
+            json.dump({'stages': [record.as_dict() for record in self.records]}, report_file, indent=2)
+            report_file.write('\n')
+        print(f"Stage report written to: {report_path}")
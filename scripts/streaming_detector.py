@@ -0,0 +1,241 @@
+import argparse
+import math
+import time
+from collections import deque, namedtuple
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from feature_extractor import FeatureExtractorConfig, FeatureEngineeringPipeline
+from flat_tree import load_flat_model
+from model_features import (ModelFeatureConfig, MODEL_FEATURE_NAMES, compute_model_features, features_read_by_model,
+                            model_feature_stream_and_statistic, standardize_features)
+
+# --- Configuration for Live (Per-Sample) Detection ---
+class StreamingDetectorConfig:
+    FLAT_MODEL_PATH = '../decision_tree_parametros/decision_tree_flat.npz' # Written by tree_export.py
+    WINDOW_SAMPLES = ModelFeatureConfig.WINDOW_SAMPLES
+    HOP_SAMPLES = 1 # Classify every HOP_SAMPLES new samples once the window is full (firmware: WINDOW_SAMPLES)
+    # Running sums drift by rounding as samples enter and leave; they are recomputed from the window this often
+    RESYNC_INTERVAL_SAMPLES = 100000
+
+class RollingStreamStatistics:
+    """
+    Window statistics of one signal, updated in O(1) per sample: running sums (of x - shift, its square and |x|)
+    for mean/variance/energy/MAV, and monotonic deques of (sample number, value) for min/max.
+    The shift (first sample seen) keeps the variance sums small for signals with a large offset such as gravity.
+    Without track_extremes the deques are not maintained and min/max/ptp are reported as 0.
+    """
+    __slots__ = ('window_samples', 'track_extremes', 'window_values', 'shift', 'shifted_sum', 'shifted_square_sum', 'absolute_sum',
+                 'min_candidates', 'max_candidates', 'samples_seen')
+
+    def __init__(self, window_samples, track_extremes=True):
+        self.window_samples = window_samples
+        self.track_extremes = track_extremes
+        self.window_values = deque()
+        self.shift = None
+        self.shifted_sum = 0.0
+        self.shifted_square_sum = 0.0
+        self.absolute_sum = 0.0
+        self.min_candidates = deque() # Increasing values: the front is the window minimum
+        self.max_candidates = deque() # Decreasing values: the front is the window maximum
+        self.samples_seen = 0
+
+    def push(self, value):
+        if self.shift is None:
+            self.shift = value
+        shifted_value = value - self.shift
+        self.window_values.append(value)
+        self.shifted_sum += shifted_value
+        self.shifted_square_sum += shifted_value * shifted_value
+        self.absolute_sum += abs(value)
+        if len(self.window_values) > self.window_samples:
+            leaving_value = self.window_values.popleft()
+            shifted_leaving = leaving_value - self.shift
+            self.shifted_sum -= shifted_leaving
+            self.shifted_square_sum -= shifted_leaving * shifted_leaving
+            self.absolute_sum -= abs(leaving_value)
+        if not self.track_extremes:
+            return
+
+        sample_number = self.samples_seen
+        self.samples_seen += 1
+        while self.min_candidates and self.min_candidates[-1][1] >= value:
+            self.min_candidates.pop()
+        self.min_candidates.append((sample_number, value))
+        while self.max_candidates and self.max_candidates[-1][1] <= value:
+            self.max_candidates.pop()
+        self.max_candidates.append((sample_number, value))
+        oldest_in_window = self.samples_seen - self.window_samples
+        if self.min_candidates[0][0] < oldest_in_window:
+            self.min_candidates.popleft()
+        if self.max_candidates[0][0] < oldest_in_window:
+            self.max_candidates.popleft()
+
+    def resync(self):
+        """Recomputes the running sums exactly from the values in the window (O(window), called rarely)."""
+        if not self.window_values:
+            return
+        self.shift = self.window_values[-1]
+        self.shifted_sum = math.fsum(value - self.shift for value in self.window_values)
+        self.shifted_square_sum = math.fsum((value - self.shift)**2 for value in self.window_values)
+        self.absolute_sum = math.fsum(abs(value) for value in self.window_values)
+
+    def statistics(self):
+        """[mean, std, var, min, max, ptp, energy, mav] of the current window (ModelFeatureConfig.STATISTIC_NAMES order)."""
+        num_values = len(self.window_values)
+        shifted_mean = self.shifted_sum / num_values
+        variance = max(self.shifted_square_sum / num_values - shifted_mean * shifted_mean, 0.0)
+        window_min = self.min_candidates[0][1] if self.track_extremes else 0.0
+        window_max = self.max_candidates[0][1] if self.track_extremes else 0.0
+        energy = self.shifted_square_sum + 2.0 * self.shift * self.shifted_sum + num_values * self.shift * self.shift
+        return [shifted_mean + self.shift, math.sqrt(variance), variance, window_min, window_max, window_max - window_min,
+                energy, self.absolute_sum / num_values]
+
+class RollingWindowFeatures:
+    """
+    The 32 model features (MODEL_FEATURE_NAMES order) of the last window_samples samples, updated per sample.
+    Given required_features, only the streams (and min/max tracking) those need are updated; the other features stay 0.
+    """
+    def __init__(self, window_samples=StreamingDetectorConfig.WINDOW_SAMPLES, resync_interval=StreamingDetectorConfig.RESYNC_INTERVAL_SAMPLES,
+                 required_features=None):
+        self.window_samples = window_samples
+        self.resync_interval = resync_interval
+        if required_features is None:
+            extremes_by_stream = {stream_index: True for stream_index in range(len(ModelFeatureConfig.STREAM_NAMES))}
+        else:
+            extremes_by_stream = {}
+            for feature_index in np.asarray(required_features).tolist():
+                stream_index, statistic_name = model_feature_stream_and_statistic(feature_index)
+                extremes_by_stream[stream_index] = extremes_by_stream.get(stream_index, False) or statistic_name in ('min', 'max', 'ptp')
+        self.stream_statistics = [
+            RollingStreamStatistics(window_samples, extremes_by_stream[stream_index]) if stream_index in extremes_by_stream else None
+            for stream_index in range(len(ModelFeatureConfig.STREAM_NAMES))
+        ]
+        self.active_streams = [(stream_index, rolling_statistics) for stream_index, rolling_statistics in enumerate(self.stream_statistics) if rolling_statistics is not None]
+        self.samples_seen = 0
+
+    def push_sample(self, ax, ay, az):
+        stream_values = (ax, ay, az, math.sqrt(ax * ax + ay * ay + az * az) if self.stream_statistics[3] is not None else 0.0)
+        for stream_index, rolling_statistics in self.active_streams:
+            rolling_statistics.push(stream_values[stream_index])
+        self.samples_seen += 1
+        if self.samples_seen % self.resync_interval == 0:
+            for _, rolling_statistics in self.active_streams:
+                rolling_statistics.resync()
+
+    @property
+    def is_window_full(self):
+        return self.samples_seen >= self.window_samples
+
+    def feature_vector(self):
+        feature_values = []
+        for rolling_statistics in self.stream_statistics:
+            feature_values.extend(rolling_statistics.statistics() if rolling_statistics is not None else [0.0] * len(ModelFeatureConfig.STATISTIC_NAMES))
+        return feature_values
+
+class StreamingDetector:
+    """
+    Classifies the sliding window ending at the newest sample every hop_samples samples, at a constant cost per
+    sample (no window is ever re-scanned). push_sample() returns the predicted class when a classification ran, else None.
+    With prune_features, only the statistics the tree reads are maintained.
+    """
+    def __init__(self, flat_tree, scaler_means, scaler_scales, feature_names=MODEL_FEATURE_NAMES,
+                 window_samples=StreamingDetectorConfig.WINDOW_SAMPLES, hop_samples=StreamingDetectorConfig.HOP_SAMPLES, prune_features=True):
+        if list(feature_names) != MODEL_FEATURE_NAMES:
+            raise ValueError("Model feature order does not match MODEL_FEATURE_NAMES")
+        self.flat_tree = flat_tree
+        self.scaler_means = [float(mean) for mean in scaler_means]
+        self.scaler_scales = [float(scale) if scale != 0 else 1.0 for scale in scaler_scales]
+        self.hop_samples = hop_samples
+        self.rolling_features = RollingWindowFeatures(window_samples, required_features=features_read_by_model(flat_tree) if prune_features else None)
+        self.windows_classified = 0
+        self.last_prediction = None
+
+    @classmethod
+    def from_flat_model_file(cls, flat_model_path=StreamingDetectorConfig.FLAT_MODEL_PATH, **detector_options):
+        return cls(*load_flat_model(flat_model_path), **detector_options)
+
+    def scaled_feature_vector(self):
+        return [(feature_value - mean) / scale for feature_value, mean, scale in zip(self.rolling_features.feature_vector(), self.scaler_means, self.scaler_scales)]
+
+    def push_sample(self, ax, ay, az):
+        self.rolling_features.push_sample(ax, ay, az)
+        if not self.rolling_features.is_window_full:
+            return None
+        if (self.rolling_features.samples_seen - self.rolling_features.window_samples) % self.hop_samples:
+            return None
+        self.windows_classified += 1
+        self.last_prediction = self.flat_tree.predict_row(self.scaled_feature_vector())
+        return self.last_prediction
+
+# Result of comparing the detector with the batch feature implementations over one sample stream
+StreamingEquivalence = namedtuple('StreamingEquivalence', ['windows_classified', 'pipeline_windows', 'batch_deviation', 'pipeline_deviation',
+                                                           'predictions_identical', 'streaming_seconds'])
+
+def measure_streaming_equivalence(samples, hop_samples, flat_model_path=StreamingDetectorConfig.FLAT_MODEL_PATH):
+    """
+    Feeds (n_samples, 3) ax/ay/az samples through the detector and compares every window it classifies with the
+    batch implementations: compute_model_features + tree for all 32 features and the prediction,
+    FeatureEngineeringPipeline for the statistics both compute (mean, std, variance, min, max, range, energy).
+    Deviations are the largest relative differences (|a - b| / (1 + |b|)).
+    """
+    samples = np.asarray(samples, dtype=np.float64)
+    fe_config = FeatureExtractorConfig()
+    fe_config.WINDOW_DURATION_SAMPLES = StreamingDetectorConfig.WINDOW_SAMPLES
+    fe_config.SLIDE_STEP_SAMPLES = hop_samples
+    source_df = pd.DataFrame(samples, columns=fe_config.SENSOR_AXES_COLS)
+    source_df[fe_config.LABEL_COL] = 0 # One block, so the pipeline windows the whole stream like the detector
+
+    detector = StreamingDetector.from_flat_model_file(flat_model_path, hop_samples=hop_samples, prune_features=False) # All 32 statistics are compared
+    streamed_features, streamed_predictions = [], []
+    start_time = time.perf_counter()
+    for ax, ay, az in samples.tolist():
+        prediction = detector.push_sample(ax, ay, az)
+        if prediction is not None:
+            streamed_features.append(detector.rolling_features.feature_vector())
+            streamed_predictions.append(prediction)
+    streaming_seconds = time.perf_counter() - start_time
+    streamed_features = np.array(streamed_features)
+
+    sample_windows = sliding_window_view(samples, StreamingDetectorConfig.WINDOW_SAMPLES, axis=0)[::hop_samples].transpose(0, 2, 1)
+    batch_features = compute_model_features(sample_windows)
+    batch_predictions = detector.flat_tree.predict(standardize_features(batch_features, detector.scaler_means, detector.scaler_scales))
+    pipeline_df = FeatureEngineeringPipeline(fe_config).compute_feature_dataframe(source_df)
+    if len(streamed_features) != len(batch_features) or len(streamed_features) != len(pipeline_df):
+        return StreamingEquivalence(len(streamed_predictions), len(pipeline_df), math.inf, math.inf, False, streaming_seconds)
+
+    shared_statistics = {'mean': 'mean', 'std': 'std_dev', 'var': 'variance', 'min': 'min_val', 'max': 'max_val', 'ptp': 'range_val', 'energy': 'energy_sum'}
+    pipeline_prefixes = dict(zip(ModelFeatureConfig.STREAM_NAMES, ['x', 'y', 'z', 'svm']))
+    pipeline_deviation = 0.0
+    for feature_index, feature_name in enumerate(MODEL_FEATURE_NAMES):
+        statistic_name, stream_name = feature_name.split('_', 1)
+        if statistic_name in shared_statistics:
+            pipeline_column = pipeline_df[f"{pipeline_prefixes[stream_name]}_{shared_statistics[statistic_name]}"].to_numpy()
+            pipeline_deviation = max(pipeline_deviation, np.max(np.abs(streamed_features[:, feature_index] - pipeline_column) / (1.0 + np.abs(pipeline_column))))
+    batch_deviation = np.max(np.abs(streamed_features - batch_features) / (1.0 + np.abs(batch_features)))
+    predictions_identical = np.array_equal(np.array(streamed_predictions), batch_predictions)
+    return StreamingEquivalence(len(streamed_predictions), len(pipeline_df), float(batch_deviation), float(pipeline_deviation),
+                                predictions_identical, streaming_seconds)
+
+def run_equivalence_check(features_source_csv, hop_samples, num_samples=None):
+    """Runs measure_streaming_equivalence on a raw sample CSV (feature_extractor.py input) and prints the result."""
+    source_df = pd.read_csv(features_source_csv, nrows=num_samples)
+    source_df = source_df.rename(columns={'accel_x': 'accel_x_val', 'accel_y': 'accel_y_val', 'accel_z': 'accel_z_val'})
+    samples = source_df[FeatureExtractorConfig.SENSOR_AXES_COLS].to_numpy(dtype=np.float64)
+    equivalence = measure_streaming_equivalence(samples, hop_samples)
+
+    print(f"Windows classified: {equivalence.windows_classified} (hop {hop_samples}), pipeline windows: {equivalence.pipeline_windows}")
+    print(f"Max relative deviation vs compute_model_features: {equivalence.batch_deviation:.2e}, vs FeatureEngineeringPipeline: {equivalence.pipeline_deviation:.2e}")
+    print(f"Predictions identical to batch path: {equivalence.predictions_identical}")
+    print(f"Streaming cost: {equivalence.streaming_seconds / len(samples) * 1e6:.1f} us per sample ({len(samples) / equivalence.streaming_seconds:,.0f} samples/s)")
+
+def execute_streaming_equivalence_check():
+    parser = argparse.ArgumentParser(description="Check the streaming detector against the batch feature implementations.")
+    parser.add_argument('source_csv', help="raw sample CSV with accel_x/y/z (or accel_*_val) columns")
+    parser.add_argument('--hop', type=int, default=StreamingDetectorConfig.HOP_SAMPLES)
+    parser.add_argument('--samples', type=int, help="only the first N samples")
+    arguments = parser.parse_args()
+    run_equivalence_check(arguments.source_csv, arguments.hop, arguments.samples)
+
+if __name__ == '__main__':
+    execute_streaming_equivalence_check()
@@ -0,0 +1,371 @@
+import argparse
+import copy
+import hashlib
+import json
+import os
+import pickle
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import StratifiedKFold, cross_val_score, train_test_split
+from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.tree._tree import TREE_LEAF, Tree
+from columnar_store import is_columnar_store_path, load_table
+from model_features import ModelFeatureConfig, MODEL_FEATURE_NAMES, model_feature_stream_and_statistic
+from tree_export import TreeExportConfig, export_model_artifacts
+
+# --- Configuration for the Model-Selection Trainer (replaces the train/decision_tree_train_model.ipynb loop) ---
+class ModelSelectionConfig:
+    FEATURES_PATH = '../data/processed_data/dataset_with_features.csv' # CSV or columnar store written by feature_extractor.py
+    LABEL_COL = 'label'
+    # Scaled float32 training matrix (memory-mapped read-only by every worker), test split, scaler and fold splits,
+    # keyed by the source file and split settings: later runs skip the CSV parse entirely
+    CACHE_DIR = '../data/processed_data/training_cache'
+    OUTPUT_DIR = '../decision_tree_parametros' # decision_tree_model.pkl, feature_scaler.pkl, decision_tree_flat.npz
+    C_HEADER_OUTPUT = TreeExportConfig.C_HEADER_OUTPUT
+    REPORT_FILENAME = 'model_selection_report.json'
+    TEST_SIZE = 0.2
+    RANDOM_SEED = 42
+    CV_FOLDS = 5
+    NUM_WORKERS = 0 # Search processes; 0 uses one per CPU core, 1 runs in-process
+
+    # Search space (every combination is cross-validated on every feature subset)
+    MAX_DEPTHS = [3, 4, 5, 6, 8, None]
+    MIN_SAMPLES_LEAF = [1, 10]
+    CRITERIA = ['gini', 'entropy']
+    CLASS_WEIGHTS = ['balanced']
+    # Statistics of the three axes that need no squares or square roots (the cheapest subset to compute on the ESP32)
+    LOW_COST_STATISTICS = ['mean', 'min', 'max', 'ptp', 'mav']
+
+    # Early stopping: after MIN_FOLDS_BEFORE_STOPPING folds, configurations whose mean fold accuracy trails the
+    # best by more than EARLY_STOP_MARGIN are not evaluated on the remaining folds
+    MIN_FOLDS_BEFORE_STOPPING = 2
+    EARLY_STOP_MARGIN = 0.02
+    WORKER_FOLD_CACHE_ENTRIES = 8 # (fold, feature subset) training matrices kept per worker
+
+def build_feature_subsets(low_cost_statistics=ModelSelectionConfig.LOW_COST_STATISTICS):
+    """Named feature subsets (MODEL_FEATURE_NAMES positions): all features, each stream alone, the axes, the low-cost statistics."""
+    feature_positions = {
+        feature_index: model_feature_stream_and_statistic(feature_index) for feature_index in range(len(MODEL_FEATURE_NAMES))
+    }
+    feature_subsets = {'all': list(range(len(MODEL_FEATURE_NAMES)))}
+    for stream_index, stream_name in enumerate(ModelFeatureConfig.STREAM_NAMES):
+        feature_subsets[f'{stream_name}_only'] = [index for index, (stream, _) in feature_positions.items() if stream == stream_index]
+    svm_stream_index = ModelFeatureConfig.STREAM_NAMES.index('svm')
+    feature_subsets['axes_only'] = [index for index, (stream, _) in feature_positions.items() if stream != svm_stream_index]
+    feature_subsets['low_cost'] = [index for index, (stream, statistic) in feature_positions.items()
+                                   if stream != svm_stream_index and statistic in low_cost_statistics]
+    return feature_subsets
+
+def build_search_configurations(config_obj, feature_subsets):
+    """Every (feature subset, tree hyperparameters) combination, as dicts."""
+    return [
+        {'feature_subset': subset_name, 'tree_parameters': {'max_depth': max_depth, 'min_samples_leaf': min_samples_leaf,
+                                                            'criterion': criterion, 'class_weight': class_weight}}
+        for subset_name, max_depth, min_samples_leaf, criterion, class_weight in product(
+            feature_subsets, config_obj.MAX_DEPTHS, config_obj.MIN_SAMPLES_LEAF, config_obj.CRITERIA, config_obj.CLASS_WEIGHTS)
+    ]
+
+def describe_configuration(configuration):
+    tree_parameters = configuration['tree_parameters']
+    return (f"{configuration['feature_subset']}, depth {tree_parameters['max_depth']}, leaf {tree_parameters['min_samples_leaf']}, "
+            f"{tree_parameters['criterion']}, {tree_parameters['class_weight']}")
+
+# --- Cached training matrices and fold splits ---
+def _source_fingerprint(features_path):
+    """Path, size and modification time of the source (every file of a columnar store)."""
+    if os.path.isdir(features_path):
+        file_paths = sorted(os.path.join(features_path, filename) for filename in os.listdir(features_path))
+    else:
+        file_paths = [features_path]
+    return [(os.path.abspath(file_path), os.stat(file_path).st_size, os.stat(file_path).st_mtime_ns) for file_path in file_paths]
+
+def _read_feature_table(features_path, label_col):
+    """Feature matrix (float64, MODEL_FEATURE_NAMES order) and labels, with the notebook's NaN handling."""
+    feature_table = load_table(features_path)
+    missing_columns = [name for name in MODEL_FEATURE_NAMES + [label_col] if name not in feature_table]
+    if missing_columns:
+        raise ValueError(f"Feature dataset '{features_path}' lacks columns: {missing_columns}")
+    feature_matrix = np.column_stack([np.asarray(feature_table[name], dtype=np.float64) for name in MODEL_FEATURE_NAMES])
+    labels = np.asarray(feature_table[label_col])
+    if np.isnan(feature_matrix).any():
+        print("Warning: NaN values in the feature dataset. Filling them with the column mean.")
+        column_means = np.nanmean(feature_matrix, axis=0)
+        feature_matrix = np.where(np.isnan(feature_matrix), column_means, feature_matrix)
+        complete_rows = ~np.isnan(feature_matrix).any(axis=1) # Columns that are entirely NaN
+        feature_matrix, labels = feature_matrix[complete_rows], labels[complete_rows]
+    return feature_matrix, labels
+
+def prepare_training_cache(features_path, cache_dir, label_col, test_size, random_seed):
+    """
+    Returns (matrix_dir, feature_scaler, cache_hit). On a miss the source is parsed once, split (stratified),
+    standardized with a scaler fitted on the training split, and stored as .npy files (training features as float32,
+    the dtype the tree fits on anyway). The metadata file is written last, so an interrupted build is simply redone.
+    """
+    cache_key_source = json.dumps({'source': _source_fingerprint(features_path), 'label': label_col, 'test_size': test_size,
+                                   'seed': random_seed, 'features': MODEL_FEATURE_NAMES})
+    matrix_dir = os.path.join(cache_dir, hashlib.sha256(cache_key_source.encode()).hexdigest()[:16])
+    metadata_path = os.path.join(matrix_dir, 'metadata.json')
+    if os.path.exists(metadata_path):
+        with open(os.path.join(matrix_dir, 'feature_scaler.pkl'), 'rb') as scaler_file:
+            return matrix_dir, pickle.load(scaler_file), True
+
+    feature_matrix, labels = _read_feature_table(features_path, label_col)
+    train_rows, test_rows = train_test_split(np.arange(len(labels)), test_size=test_size, random_state=random_seed, stratify=labels)
+    train_rows.sort()
+    test_rows.sort()
+    feature_scaler = StandardScaler().fit(pd.DataFrame(feature_matrix[train_rows], columns=MODEL_FEATURE_NAMES))
+    os.makedirs(matrix_dir, exist_ok=True)
+    scaled_matrix = (feature_matrix - feature_scaler.mean_) / feature_scaler.scale_
+    np.save(os.path.join(matrix_dir, 'train_features.npy'), np.ascontiguousarray(scaled_matrix[train_rows], dtype=np.float32))
+    np.save(os.path.join(matrix_dir, 'train_labels.npy'), labels[train_rows])
+    np.save(os.path.join(matrix_dir, 'test_features.npy'), np.ascontiguousarray(scaled_matrix[test_rows], dtype=np.float32))
+    np.save(os.path.join(matrix_dir, 'test_labels.npy'), labels[test_rows])
+    with open(os.path.join(matrix_dir, 'feature_scaler.pkl'), 'wb') as scaler_file:
+        pickle.dump(feature_scaler, scaler_file)
+    with open(metadata_path, 'w') as metadata_file:
+        json.dump({'source': features_path, 'train_rows': len(train_rows), 'test_rows': len(test_rows)}, metadata_file)
+    return matrix_dir, feature_scaler, False
+
+def prepare_fold_splits(matrix_dir, cv_folds, random_seed):
+    """Stratified, shuffled fold splits of the training rows, computed once per (folds, seed) and reused. Returns the file path."""
+    fold_path = os.path.join(matrix_dir, f'folds_{cv_folds}_seed_{random_seed}.npz')
+    if not os.path.exists(fold_path):
+        train_labels = np.load(os.path.join(matrix_dir, 'train_labels.npy'))
+        fold_splitter = StratifiedKFold(n_splits=cv_folds, shuffle=True, random_state=random_seed)
+        fold_arrays = {}
+        for fold_number, (fit_rows, validation_rows) in enumerate(fold_splitter.split(np.zeros(len(train_labels)), train_labels)):
+            fold_arrays[f'fit_{fold_number}'] = fit_rows
+            fold_arrays[f'validation_{fold_number}'] = validation_rows
+        np.savez(fold_path, **fold_arrays)
+    return fold_path
+
+def load_fold_splits(fold_path):
+    with np.load(fold_path) as fold_arrays:
+        return [(fold_arrays[f'fit_{fold_number}'], fold_arrays[f'validation_{fold_number}']) for fold_number in range(len(fold_arrays.files) // 2)]
+
+# --- Search workers ---
+# Per-process state: the memory-mapped training matrix is shared read-only through the page cache
+_worker_state = {}
+
+def _initialize_search_worker(matrix_dir, fold_path, random_seed, fold_cache_entries):
+    _worker_state['features'] = np.load(os.path.join(matrix_dir, 'train_features.npy'), mmap_mode='r')
+    _worker_state['labels'] = np.load(os.path.join(matrix_dir, 'train_labels.npy'))
+    _worker_state['folds'] = load_fold_splits(fold_path)
+    _worker_state['random_seed'] = random_seed
+    _worker_state['fold_cache_entries'] = fold_cache_entries
+    _worker_state['fold_matrices'] = OrderedDict()
+
+def _get_fold_matrices(fold_number, feature_subset):
+    """Fit/validation matrices of one fold restricted to the subset's columns (small per-worker LRU cache)."""
+    fold_matrices = _worker_state['fold_matrices']
+    cache_key = (fold_number, tuple(feature_subset))
+    if cache_key in fold_matrices:
+        fold_matrices.move_to_end(cache_key)
+        return fold_matrices[cache_key]
+    fit_rows, validation_rows = _worker_state['folds'][fold_number]
+    training_features = _worker_state['features']
+    fold_entry = (training_features[np.ix_(fit_rows, feature_subset)], _worker_state['labels'][fit_rows],
+                  training_features[np.ix_(validation_rows, feature_subset)], _worker_state['labels'][validation_rows])
+    fold_matrices[cache_key] = fold_entry
+    if len(fold_matrices) > _worker_state['fold_cache_entries']:
+        fold_matrices.popitem(last=False)
+    return fold_entry
+
+def _evaluate_fold_task(search_task):
+    """Fits one configuration on one fold. Returns (configuration number, validation accuracy)."""
+    configuration_number, fold_number, feature_subset, tree_parameters = search_task
+    fit_matrix, fit_labels, validation_matrix, validation_labels = _get_fold_matrices(fold_number, feature_subset)
+    tree_model = DecisionTreeClassifier(random_state=_worker_state['random_seed'], **tree_parameters).fit(fit_matrix, fit_labels)
+    return configuration_number, float(np.mean(tree_model.predict(validation_matrix) == validation_labels))
+
+def run_racing_search(configurations, feature_subsets, matrix_dir, fold_path, config_obj, worker_count, early_stopping=True):
+    """
+    Cross-validates all configurations fold by fold (all surviving configurations of a fold run in parallel).
+    Returns (fold accuracies per configuration, fits run). Configurations dropped early have fewer fold accuracies.
+    """
+    cv_folds = len(load_fold_splits(fold_path))
+    fold_accuracies = [[] for _ in configurations]
+    # Tasks of one feature subset are kept together so workers reuse their fold matrices
+    surviving_configurations = sorted(range(len(configurations)), key=lambda number: configurations[number]['feature_subset'])
+    worker_arguments = (matrix_dir, fold_path, config_obj.RANDOM_SEED, config_obj.WORKER_FOLD_CACHE_ENTRIES)
+    worker_pool = None
+    if worker_count > 1:
+        worker_pool = ProcessPoolExecutor(max_workers=worker_count, initializer=_initialize_search_worker, initargs=worker_arguments)
+    else:
+        _initialize_search_worker(*worker_arguments)
+    fits_run = 0
+    try:
+        for fold_number in range(cv_folds):
+            search_tasks = [
+                (number, fold_number, feature_subsets[configurations[number]['feature_subset']], configurations[number]['tree_parameters'])
+                for number in surviving_configurations
+            ]
+            if worker_pool is not None:
+                task_results = worker_pool.map(_evaluate_fold_task, search_tasks, chunksize=max(1, len(search_tasks) // (worker_count * 4)))
+            else:
+                task_results = map(_evaluate_fold_task, search_tasks)
+            for configuration_number, validation_accuracy in task_results:
+                fold_accuracies[configuration_number].append(validation_accuracy)
+            fits_run += len(search_tasks)
+
+            if early_stopping and fold_number + 1 >= config_obj.MIN_FOLDS_BEFORE_STOPPING and fold_number + 1 < cv_folds:
+                mean_accuracies = {number: np.mean(fold_accuracies[number]) for number in surviving_configurations}
+                best_mean_accuracy = max(mean_accuracies.values())
+                surviving_configurations = [number for number in surviving_configurations
+                                            if mean_accuracies[number] >= best_mean_accuracy - config_obj.EARLY_STOP_MARGIN]
+                print(f"  Fold {fold_number + 1}/{cv_folds}: best mean accuracy {best_mean_accuracy:.4f}, "
+                      f"{len(surviving_configurations)} of {len(configurations)} configurations continue")
+    finally:
+        if worker_pool is not None:
+            worker_pool.shutdown()
+    return fold_accuracies, fits_run
+
+def rank_configurations(configurations, feature_subsets, fold_accuracies, cv_folds):
+    """Fully evaluated configurations, best first: highest mean accuracy, then fewer features and shallower trees (cheaper on the ESP32)."""
+    completed_numbers = [number for number in range(len(configurations)) if len(fold_accuracies[number]) == cv_folds]
+    def ranking_key(number):
+        max_depth = configurations[number]['tree_parameters']['max_depth']
+        return (-round(float(np.mean(fold_accuracies[number])), 4), len(feature_subsets[configurations[number]['feature_subset']]),
+                max_depth if max_depth is not None else float('inf'))
+    return sorted(completed_numbers, key=ranking_key)
+
+def expand_tree_to_model_features(tree_model, feature_subset, feature_count=len(MODEL_FEATURE_NAMES)):
+    """
+    The tree fitted on the subset's columns as the same tree over all feature_count features: every split reads its
+    feature at the MODEL_FEATURE_NAMES position, nodes, thresholds and leaf values are unchanged.
+    """
+    tree_state = tree_model.tree_.__getstate__()
+    node_array = tree_state['nodes'].copy()
+    is_split = node_array['left_child'] != TREE_LEAF
+    node_array['feature'][is_split] = np.asarray(feature_subset)[node_array['feature'][is_split]]
+    expanded_tree = Tree(feature_count, np.asarray(tree_model.tree_.n_classes, dtype=np.intp), tree_model.n_outputs_)
+    expanded_tree.__setstate__({**tree_state, 'nodes': node_array})
+    expanded_model = copy.deepcopy(tree_model)
+    expanded_model.tree_ = expanded_tree
+    expanded_model.n_features_in_ = feature_count
+    return expanded_model
+
+def fit_final_model(matrix_dir, feature_subset, tree_parameters, random_seed):
+    """
+    Fits the chosen configuration on the whole training split, on the subset's columns exactly as cross-validation
+    did (so the saved tree is the one that was evaluated), and returns it over the 32-feature layout the scaler, the
+    exports and the firmware expect.
+    """
+    training_features = np.load(os.path.join(matrix_dir, 'train_features.npy'), mmap_mode='r')[:, feature_subset]
+    tree_model = DecisionTreeClassifier(random_state=random_seed, **tree_parameters)
+    tree_model.fit(training_features, np.load(os.path.join(matrix_dir, 'train_labels.npy')))
+    return expand_tree_to_model_features(tree_model, feature_subset)
+
+def run_serial_notebook_search(features_path, configurations, feature_subsets, fold_splits, config_obj):
+    """
+    The notebook's procedure, once per configuration: read the feature file, split, standardize (float64 DataFrame),
+    fit the model and run cross_val_score serially (on the same folds). Returns (wall seconds, mean accuracies).
+    """
+    start_time = time.perf_counter()
+    mean_accuracies = []
+    for configuration in configurations:
+        features_df = pd.read_csv(features_path)
+        feature_columns = features_df[MODEL_FEATURE_NAMES]
+        train_features, _, train_labels, _ = train_test_split(
+            feature_columns, features_df[config_obj.LABEL_COL], test_size=config_obj.TEST_SIZE,
+            random_state=config_obj.RANDOM_SEED, stratify=features_df[config_obj.LABEL_COL])
+        scaled_train_features = StandardScaler().fit_transform(train_features)[:, feature_subsets[configuration['feature_subset']]]
+        tree_model = DecisionTreeClassifier(random_state=config_obj.RANDOM_SEED, **configuration['tree_parameters'])
+        tree_model.fit(scaled_train_features, train_labels)
+        mean_accuracies.append(float(np.mean(cross_val_score(tree_model, scaled_train_features, train_labels, cv=fold_splits, scoring='accuracy'))))
+    return time.perf_counter() - start_time, mean_accuracies
+
+def execute_model_selection_workflow():
+    config = ModelSelectionConfig
+    parser = argparse.ArgumentParser(description="Parallel, cached decision tree model selection (hyperparameters x feature subsets).")
+    parser.add_argument('--features', default=config.FEATURES_PATH, help="feature dataset (CSV or columnar store)")
+    parser.add_argument('--output-dir', default=config.OUTPUT_DIR, help="where the model, scaler, flat model and report go")
+    parser.add_argument('--header-output', default=config.C_HEADER_OUTPUT)
+    parser.add_argument('--cache-dir', default=config.CACHE_DIR)
+    parser.add_argument('--workers', type=int, default=config.NUM_WORKERS, help="0: one per CPU core")
+    parser.add_argument('--folds', type=int, default=config.CV_FOLDS)
+    parser.add_argument('--no-early-stopping', action='store_true')
+    parser.add_argument('--compare-serial', action='store_true', help="also time the notebook's serial procedure on the same grid")
+    arguments = parser.parse_args()
+    worker_count = arguments.workers if arguments.workers > 0 else (os.cpu_count() or 1)
+
+    print("--- Decision Tree Model Selection ---")
+    workflow_started = time.perf_counter()
+    try:
+        matrix_dir, feature_scaler, cache_hit = prepare_training_cache(arguments.features, arguments.cache_dir, config.LABEL_COL, config.TEST_SIZE, config.RANDOM_SEED)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"CRITICAL ERROR: Feature dataset could not be loaded: {e}")
+        return
+    fold_path = prepare_fold_splits(matrix_dir, arguments.folds, config.RANDOM_SEED)
+    load_seconds = time.perf_counter() - workflow_started
+    train_rows = len(np.load(os.path.join(matrix_dir, 'train_labels.npy'), mmap_mode='r'))
+    print(f"Training matrix: {train_rows} windows x {len(MODEL_FEATURE_NAMES)} features, float32 "
+          f"({'cache hit' if cache_hit else 'built from ' + arguments.features}, {load_seconds:.2f} s)")
+
+    feature_subsets = build_feature_subsets()
+    configurations = build_search_configurations(config, feature_subsets)
+    print(f"Searching {len(configurations)} configurations ({len(feature_subsets)} feature subsets) x {arguments.folds} folds "
+          f"with {worker_count} worker(s), early stopping {'off' if arguments.no_early_stopping else 'on'}")
+    search_started = time.perf_counter()
+    fold_accuracies, fits_run = run_racing_search(configurations, feature_subsets, matrix_dir, fold_path, config, worker_count,
+                                                  early_stopping=not arguments.no_early_stopping)
+    search_seconds = time.perf_counter() - search_started
+    ranked_numbers = rank_configurations(configurations, feature_subsets, fold_accuracies, arguments.folds)
+    print(f"Search finished in {search_seconds:.2f} s: {fits_run} of {len(configurations) * arguments.folds} fits run")
+
+    print(f"\n{'rank':>4} {'cv accuracy':>12} {'std':>7}  configuration")
+    for rank, number in enumerate(ranked_numbers[:10], start=1):
+        print(f"{rank:>4} {np.mean(fold_accuracies[number]):>12.4f} {np.std(fold_accuracies[number]):>7.4f}  {describe_configuration(configurations[number])}")
+
+    best_configuration = configurations[ranked_numbers[0]]
+    final_started = time.perf_counter()
+    tree_model = fit_final_model(matrix_dir, feature_subsets[best_configuration['feature_subset']], best_configuration['tree_parameters'], config.RANDOM_SEED)
+    test_features = np.load(os.path.join(matrix_dir, 'test_features.npy'))
+    test_labels = np.load(os.path.join(matrix_dir, 'test_labels.npy'))
+    test_accuracy = float(np.mean(tree_model.predict(test_features) == test_labels))
+    features_read = [MODEL_FEATURE_NAMES[index] for index in np.unique(tree_model.tree_.feature[tree_model.tree_.feature >= 0])]
+    print(f"\nBest: {describe_configuration(best_configuration)}")
+    print(f"Test accuracy: {test_accuracy:.4f} ({len(test_labels)} windows), tree reads {len(features_read)} features: {features_read}")
+
+    os.makedirs(arguments.output_dir, exist_ok=True)
+    with open(os.path.join(arguments.output_dir, 'decision_tree_model.pkl'), 'wb') as model_file:
+        pickle.dump(tree_model, model_file)
+    with open(os.path.join(arguments.output_dir, 'feature_scaler.pkl'), 'wb') as scaler_file:
+        pickle.dump(feature_scaler, scaler_file)
+    print(f"Model and scaler saved to: '{arguments.output_dir}'")
+    verification_csv = arguments.features if not is_columnar_store_path(arguments.features) else TreeExportConfig.VERIFICATION_FEATURES_CSV
+    exported = export_model_artifacts(tree_model, feature_scaler, os.path.join(arguments.output_dir, 'decision_tree_flat.npz'),
+                                      arguments.header_output, verification_csv)
+    final_seconds = time.perf_counter() - final_started
+    total_seconds = time.perf_counter() - workflow_started
+
+    selection_report = {
+        'best_configuration': best_configuration, 'cv_accuracy': float(np.mean(fold_accuracies[ranked_numbers[0]])),
+        'test_accuracy': test_accuracy, 'features_read': features_read, 'exported': exported,
+        'configurations': len(configurations), 'fits_run': fits_run, 'workers': worker_count,
+        'seconds': {'load': load_seconds, 'search': search_seconds, 'final_fit_and_export': final_seconds, 'total': total_seconds},
+    }
+    print(f"\nWall time: load {load_seconds:.2f} s, search {search_seconds:.2f} s, final fit + export {final_seconds:.2f} s, total {total_seconds:.2f} s")
+    if arguments.compare_serial:
+        if is_columnar_store_path(arguments.features):
+            print("Warning: --compare-serial needs a CSV feature dataset (the notebook reads CSV). Skipped.")
+        else:
+            print("Timing the notebook's serial procedure on the same grid...")
+            serial_seconds, serial_accuracies = run_serial_notebook_search(arguments.features, configurations, feature_subsets, load_fold_splits(fold_path), config)
+            serial_best = configurations[int(np.argmax(serial_accuracies))]
+            print(f"Serial notebook procedure: {serial_seconds:.2f} s for the search -> speedup {serial_seconds / search_seconds:.1f}x "
+                  f"(search) / {serial_seconds / total_seconds:.1f}x (whole run incl. export); best mean accuracy "
+                  f"{max(serial_accuracies):.4f} ({describe_configuration(serial_best)})")
+            selection_report['serial_notebook_seconds'] = serial_seconds
+            selection_report['speedup'] = serial_seconds / search_seconds
+    with open(os.path.join(arguments.output_dir, config.REPORT_FILENAME), 'w') as report_file:
+        json.dump(selection_report, report_file, indent=2)
+    print(f"Report saved to: '{os.path.join(arguments.output_dir, config.REPORT_FILENAME)}'")
+
+if __name__ == '__main__':
+    execute_model_selection_workflow()
@@ -0,0 +1,230 @@
+import argparse
+import pickle
+import numpy as np
+import pandas as pd
+from model_features import (ModelFeatureConfig, MODEL_FEATURE_NAMES, compute_model_features, compute_selected_model_features,
+                            features_read_by_model, model_feature_stream_and_statistic, standardize_features)
+from flat_tree import FlatDecisionTree, save_flat_model
+from model_blob import encode_model_blob, read_model_blob_version
+
+# --- Configuration for the Decision Tree Export ---
+class TreeExportConfig:
+    MODEL_PATH = '../decision_tree_parametros/decision_tree_model.pkl'
+    SCALER_PATH = '../decision_tree_parametros/feature_scaler.pkl'
+    FLAT_MODEL_OUTPUT = '../decision_tree_parametros/decision_tree_flat.npz' # Scaler + flat tree, loadable without scikit-learn
+    C_HEADER_OUTPUT = '../firmware_v2/detector_serial_v2/detector_model_generated.h'
+    VERIFICATION_FEATURES_CSV = '../data/processed_data/dataset_with_features.csv' # Rows checked against sklearn after export
+    NUM_RANDOM_VERIFICATION_ROWS = 100000
+    NUM_PRUNED_VERIFICATION_WINDOWS = 20000 # Raw windows on which pruned feature computation must predict like the full one
+
+def _format_c_array(c_type, array_name, values, value_format):
+    return f"const {c_type} {array_name}[{len(values)}] = {{{', '.join(value_format(value) for value in values)}}};"
+
+def _format_c_float(value):
+    float_text = f"{float(value):.9g}" # 9 significant digits round-trip any float32 exactly
+    return float_text + ("f" if any(marker in float_text for marker in ".en") else ".0f")
+
+C_STREAM_NAMES = ['ax', 'ay', 'az', 'svm'] # ModelFeatureConfig.STREAM_NAMES order
+
+def _generate_c_feature_function(used_features, scaler_scales, feature_names):
+    """
+    Straight-line C that computes and standardizes only the features the tree reads, in at most two passes over the
+    window (the second one only for std/var). Same formulas as compute_model_features.
+    """
+    statistics_by_stream = {}
+    for feature_index in used_features:
+        stream_index, statistic_name = model_feature_stream_and_statistic(feature_index)
+        statistics_by_stream.setdefault(stream_index, {})[statistic_name] = int(feature_index)
+
+    accumulator_lines, first_pass_lines, deviation_lines, result_lines = [], [], [], []
+    for stream_index, feature_positions in sorted(statistics_by_stream.items()):
+        stream = C_STREAM_NAMES[stream_index]
+        needed = feature_positions.keys()
+        if needed & {'mean', 'std', 'var'}:
+            accumulator_lines.append(f"    float sum_{stream} = 0.0f;")
+            first_pass_lines.append(f"        sum_{stream} += value_{stream};")
+            result_lines.append(f"    const float mean_{stream} = sum_{stream} / count;")
+        if needed & {'std', 'var'}:
+            accumulator_lines.append(f"    float deviation_sum_{stream} = 0.0f;")
+            value_expression = "sqrtf(ax[i] * ax[i] + ay[i] * ay[i] + az[i] * az[i])" if stream == 'svm' else f"{stream}[i]"
+            deviation_lines.append(f"        const float deviation_{stream} = {value_expression} - mean_{stream};")
+            deviation_lines.append(f"        deviation_sum_{stream} += deviation_{stream} * deviation_{stream};")
+        if needed & {'min', 'ptp'}:
+            accumulator_lines.append(f"    float min_{stream} = INFINITY;")
+            first_pass_lines.append(f"        min_{stream} = fminf(min_{stream}, value_{stream});")
+        if needed & {'max', 'ptp'}:
+            accumulator_lines.append(f"    float max_{stream} = -INFINITY;")
+            first_pass_lines.append(f"        max_{stream} = fmaxf(max_{stream}, value_{stream});")
+        if 'energy' in needed:
+            accumulator_lines.append(f"    float energy_{stream} = 0.0f;")
+            first_pass_lines.append(f"        energy_{stream} += value_{stream} * value_{stream};")
+        if 'mav' in needed:
+            accumulator_lines.append(f"    float absolute_sum_{stream} = 0.0f;")
+            first_pass_lines.append(f"        absolute_sum_{stream} += fabsf(value_{stream});")
+
+    statistic_expressions = {
+        'mean': "mean_{0}", 'var': "deviation_sum_{0} / count", 'std': "sqrtf(deviation_sum_{0} / count)",
+        'min': "min_{0}", 'max': "max_{0}", 'ptp': "max_{0} - min_{0}", 'energy': "energy_{0}", 'mav': "absolute_sum_{0} / count",
+    }
+    standardize_lines = []
+    for stream_index, feature_positions in sorted(statistics_by_stream.items()):
+        for statistic_name, feature_index in sorted(feature_positions.items(), key=lambda item: item[1]):
+            feature_value = statistic_expressions[statistic_name].format(C_STREAM_NAMES[stream_index])
+            if scaler_scales[feature_index] == 0:
+                standardize_lines.append(f"    scaled_features[{feature_index}] = ({feature_value}) - detector_scaler_means[{feature_index}];")
+            else:
+                standardize_lines.append(f"    scaled_features[{feature_index}] = (({feature_value}) - detector_scaler_means[{feature_index}]) / detector_scaler_scales[{feature_index}];")
+
+    value_lines = [f"        const float value_{stream} = {stream}[i];" for stream in C_STREAM_NAMES[:3]
+                   if any(f"value_{stream}" in line for line in first_pass_lines)]
+    if 3 in statistics_by_stream and first_pass_lines:
+        value_lines.append("        const float value_svm = sqrtf(ax[i] * ax[i] + ay[i] * ay[i] + az[i] * az[i]);")
+    function_lines = [
+        "// Computes and standardizes only the features the tree reads ("
+        + ", ".join(f"{feature_index}:{feature_names[feature_index]}" for feature_index in used_features) + ");",
+        "// the other entries of scaled_features are not written. Replaces computing all features + standardizing them.",
+        "inline void detector_compute_scaled_features(const float* ax, const float* ay, const float* az, int count, float* scaled_features) {",
+        *accumulator_lines,
+    ]
+    if first_pass_lines:
+        function_lines += ["    for (int i = 0; i < count; i++) {", *value_lines, *first_pass_lines, "    }"]
+    function_lines += result_lines
+    if deviation_lines:
+        function_lines += ["    for (int i = 0; i < count; i++) {", *deviation_lines, "    }"]
+    function_lines += [*standardize_lines, "}"]
+    return function_lines
+
+def generate_c_model_header(flat_tree, scaler_means, scaler_scales, feature_names=MODEL_FEATURE_NAMES):
+    """
+    C/Arduino header with the scaler constants, the flat tree arrays and its traversal (replaces hand-written if/else rules).
+    Identified by the model version of the blob the server serves, so the same model always gives the same header.
+    """
+    model_version = read_model_blob_version(encode_model_blob(flat_tree, scaler_means, scaler_scales))
+    header_lines = [
+        "// --- Generated by scripts/tree_export.py: do not edit by hand, re-run the export after retraining ---",
+        f"// Model version: {model_version:08x} (CRC-32 of the model blob served by the alert server)",
+        "#pragma once",
+        "#include <stdint.h>",
+        "#include <math.h>",
+        "",
+        f"const uint32_t DETECTOR_MODEL_VERSION = 0x{model_version:08x}u;",
+        f"const int DETECTOR_MODEL_FEATURE_COUNT = {len(feature_names)};",
+        "// Feature order: " + ", ".join(f"{feature_index}:{feature_name}" for feature_index, feature_name in enumerate(feature_names)),
+        _format_c_array("float", "detector_scaler_means", scaler_means, _format_c_float),
+        _format_c_array("float", "detector_scaler_scales", scaler_scales, _format_c_float),
+        "",
+        f"// Decision tree: {flat_tree.node_count} nodes, depth {flat_tree.max_depth}. Leaves have feature -1.",
+        "// Thresholds are rounded down to float so that `feature <= threshold` decides exactly like the trained model.",
+        f"const int DETECTOR_TREE_NODE_COUNT = {flat_tree.node_count};",
+        _format_c_array("int16_t", "detector_tree_features", flat_tree.node_features, str),
+        _format_c_array("float", "detector_tree_thresholds", flat_tree.node_thresholds, _format_c_float),
+        _format_c_array("int16_t", "detector_tree_left", flat_tree.left_children, str),
+        _format_c_array("int16_t", "detector_tree_right", flat_tree.right_children, str),
+        _format_c_array("int16_t", "detector_tree_classes", flat_tree.class_labels[flat_tree.leaf_classes], str),
+        "",
+        "// Expects standardized features (see detector_scaler_means/detector_scaler_scales).",
+        "inline int detector_tree_predict(const float* scaled_features) {",
+        "    int node = 0;",
+        "    while (detector_tree_features[node] >= 0) {",
+        "        node = (scaled_features[detector_tree_features[node]] <= detector_tree_thresholds[node]) ? detector_tree_left[node] : detector_tree_right[node];",
+        "    }",
+        "    return detector_tree_classes[node];",
+        "}",
+        "",
+        *_generate_c_feature_function(features_read_by_model(flat_tree).tolist(), scaler_scales, feature_names),
+        "",
+    ]
+    return "\n".join(header_lines)
+
+def verify_against_sklearn(flat_tree, tree_model, feature_matrix):
+    """Returns the number of rows on which FlatDecisionTree.predict and the sklearn model disagree."""
+    return int(np.count_nonzero(flat_tree.predict(feature_matrix) != tree_model.predict(np.asarray(feature_matrix, dtype=np.float64))))
+
+def verify_pruned_features(flat_tree, scaler_means, scaler_scales, num_windows, random_seed=42):
+    """
+    Returns the number of raw windows (at rest and shaking, with random orientation) on which computing only the
+    features the tree reads predicts differently from computing all of them.
+    """
+    rng = np.random.default_rng(random_seed)
+    gravity_offsets = rng.normal(0, 1, (num_windows, 1, 3))
+    gravity_offsets *= 9.81 / np.linalg.norm(gravity_offsets, axis=2, keepdims=True)
+    shake_amplitudes = rng.choice([0.02, 0.1, 0.5, 2.0, 5.0], size=(num_windows, 1, 1))
+    sample_windows = (gravity_offsets + rng.normal(0, 1, (num_windows, ModelFeatureConfig.WINDOW_SAMPLES, 3)) * shake_amplitudes).astype(np.float32)
+    full_predictions = flat_tree.predict(standardize_features(compute_model_features(sample_windows), scaler_means, scaler_scales))
+    pruned_features = compute_selected_model_features(sample_windows, features_read_by_model(flat_tree))
+    pruned_predictions = flat_tree.predict(standardize_features(pruned_features, scaler_means, scaler_scales))
+    return int(np.count_nonzero(full_predictions != pruned_predictions))
+
+def build_verification_matrix(tree_model, feature_scaler, features_csv, num_random_rows, random_seed=42):
+    """Scaled training rows, random rows, and rows placed exactly on and next to every split threshold."""
+    verification_blocks = []
+    try:
+        training_features = pd.read_csv(features_csv)[MODEL_FEATURE_NAMES].to_numpy()
+        verification_blocks.append((training_features - feature_scaler.mean_) / feature_scaler.scale_)
+    except (FileNotFoundError, KeyError) as e:
+        print(f"Warning: Training features not used for verification ({e})")
+    rng = np.random.default_rng(random_seed)
+    verification_blocks.append(rng.normal(0, 2, (num_random_rows, tree_model.n_features_in_)))
+
+    tree_structure = tree_model.tree_
+    for node_number in np.flatnonzero(tree_structure.children_left != -1):
+        split_threshold = tree_structure.threshold[node_number]
+        float32_threshold = np.float32(split_threshold)
+        boundary_values = np.array([
+            split_threshold, np.nextafter(split_threshold, np.inf), np.nextafter(split_threshold, -np.inf),
+            float32_threshold, np.nextafter(float32_threshold, np.float32(np.inf)), np.nextafter(float32_threshold, np.float32(-np.inf)),
+        ], dtype=np.float64)
+        boundary_rows = rng.normal(0, 2, (len(boundary_values) * 200, tree_model.n_features_in_))
+        boundary_rows[:, tree_structure.feature[node_number]] = np.repeat(boundary_values, 200)
+        verification_blocks.append(boundary_rows)
+    return np.concatenate(verification_blocks)
+
+def export_model_artifacts(tree_model, feature_scaler, flat_output_path, header_output_path, verification_features_csv=TreeExportConfig.VERIFICATION_FEATURES_CSV):
+    """Verifies the flat tree against sklearn and writes the .npz flat model and the C header. Returns False if nothing was written."""
+    scaler_feature_names = list(getattr(feature_scaler, 'feature_names_in_', MODEL_FEATURE_NAMES))
+    if scaler_feature_names != MODEL_FEATURE_NAMES:
+        print("CRITICAL ERROR: Scaler feature order does not match the firmware feature order (MODEL_FEATURE_NAMES).")
+        return False
+
+    flat_tree = FlatDecisionTree.from_sklearn(tree_model)
+    print(f"Tree: {flat_tree.node_count} nodes, depth {flat_tree.max_depth}, classes {flat_tree.class_labels.tolist()}")
+    verification_matrix = build_verification_matrix(tree_model, feature_scaler, verification_features_csv, TreeExportConfig.NUM_RANDOM_VERIFICATION_ROWS)
+    mismatched_rows = verify_against_sklearn(flat_tree, tree_model, verification_matrix)
+    if mismatched_rows:
+        print(f"CRITICAL ERROR: Flat tree disagrees with sklearn on {mismatched_rows} of {len(verification_matrix)} rows. Nothing written.")
+        return False
+    print(f"Verified: identical predictions to sklearn on {len(verification_matrix)} rows.")
+    mismatched_windows = verify_pruned_features(flat_tree, feature_scaler.mean_, feature_scaler.scale_, TreeExportConfig.NUM_PRUNED_VERIFICATION_WINDOWS)
+    if mismatched_windows:
+        print(f"CRITICAL ERROR: Pruned feature computation changes {mismatched_windows} of {TreeExportConfig.NUM_PRUNED_VERIFICATION_WINDOWS} predictions. Nothing written.")
+        return False
+    used_feature_names = [scaler_feature_names[feature_index] for feature_index in features_read_by_model(flat_tree)]
+    print(f"Verified: computing only the {len(used_feature_names)} features the tree reads ({', '.join(used_feature_names)}) "
+          f"gives identical predictions on {TreeExportConfig.NUM_PRUNED_VERIFICATION_WINDOWS} raw windows.")
+
+    save_flat_model(flat_output_path, flat_tree, feature_scaler.mean_, feature_scaler.scale_, scaler_feature_names)
+    model_blob = encode_model_blob(flat_tree, feature_scaler.mean_, feature_scaler.scale_)
+    print(f"Flat model (scaler + tree) saved to: '{flat_output_path}' "
+          f"(served as a {len(model_blob)}-byte blob, model version {read_model_blob_version(model_blob):08x})")
+    with open(header_output_path, 'w') as header_file:
+        header_file.write(generate_c_model_header(flat_tree, feature_scaler.mean_, feature_scaler.scale_, scaler_feature_names))
+    print(f"C header saved to: '{header_output_path}'")
+    return True
+
+def execute_tree_export_workflow():
+    parser = argparse.ArgumentParser(description="Export the trained decision tree + scaler to flat arrays (.npz) and a C header.")
+    parser.add_argument('--model', default=TreeExportConfig.MODEL_PATH)
+    parser.add_argument('--scaler', default=TreeExportConfig.SCALER_PATH)
+    parser.add_argument('--flat-output', default=TreeExportConfig.FLAT_MODEL_OUTPUT)
+    parser.add_argument('--header-output', default=TreeExportConfig.C_HEADER_OUTPUT)
+    arguments = parser.parse_args()
+
+    print("--- Decision Tree Export ---")
+    with open(arguments.model, 'rb') as model_file:
+        tree_model = pickle.load(model_file)
+    with open(arguments.scaler, 'rb') as scaler_file:
+        feature_scaler = pickle.load(scaler_file)
+    export_model_artifacts(tree_model, feature_scaler, arguments.flat_output, arguments.header_output)
+
+if __name__ == '__main__':
+    execute_tree_export_workflow()
@@ -0,0 +1,155 @@
+import asyncio
+import pickle
+import time
+from collections import deque
+import numpy as np
+from flat_tree import load_flat_model
+from model_features import (ModelFeatureConfig, MODEL_FEATURE_NAMES, compute_model_features, compute_selected_model_features,
+                            features_read_by_model, standardize_features)
+
+# --- Configuration for Server-Side Window Classification ---
+class WindowInferenceConfig:
+    MODEL_PATH = '../decision_tree_parametros/decision_tree_model.pkl'
+    SCALER_PATH = '../decision_tree_parametros/feature_scaler.pkl'
+    FLAT_MODEL_PATH = '../decision_tree_parametros/decision_tree_flat.npz' # Written by tree_export.py
+    WINDOW_SAMPLES = ModelFeatureConfig.WINDOW_SAMPLES
+    # Micro-batching: requests arriving within MAX_BATCH_DELAY_MS of the first queued one are classified together,
+    # in a single vectorized feature/scale/predict call of at most MAX_BATCH_WINDOWS windows
+    MAX_BATCH_WINDOWS = 256
+    MAX_BATCH_DELAY_MS = 5.0
+    LATENCY_SAMPLES_KEPT = 100000
+
+# Window payload: WINDOW_SAMPLES rows of ax, ay, az as little-endian float32 (the firmware's sample buffer as-is);
+# one request may carry several consecutive windows
+WINDOW_SAMPLE_DTYPE = np.dtype('<f4')
+
+def decode_window_payload(payload, window_samples=WindowInferenceConfig.WINDOW_SAMPLES):
+    """Returns the windows of a request body as an (n_windows, window_samples, 3) float32 view. Raises ValueError."""
+    window_bytes = window_samples * 3 * WINDOW_SAMPLE_DTYPE.itemsize
+    if not payload or len(payload) % window_bytes:
+        raise ValueError(f"Payload of {len(payload)} bytes is not a whole number of {window_bytes}-byte windows")
+    return np.frombuffer(payload, dtype=WINDOW_SAMPLE_DTYPE).reshape(-1, window_samples, 3)
+
+def encode_window_payload(sample_windows):
+    return np.ascontiguousarray(sample_windows, dtype=WINDOW_SAMPLE_DTYPE).tobytes()
+
+class WindowClassifier:
+    """
+    Feature extraction, standardization and prediction for a whole batch of raw windows in one call each.
+    With prune_features, only the features the tree reads are computed (the deployed tree reads 2 of the 32).
+    """
+    def __init__(self, tree_model, scaler_means, scaler_scales, feature_names=MODEL_FEATURE_NAMES, prune_features=True):
+        if list(feature_names) != MODEL_FEATURE_NAMES:
+            raise ValueError("Scaler feature order does not match MODEL_FEATURE_NAMES")
+        self.tree_model = tree_model # Anything with predict(): a DecisionTreeClassifier or a FlatDecisionTree
+        self.scaler_means = np.asarray(scaler_means, dtype=np.float64)
+        self.scaler_scales = np.asarray(scaler_scales, dtype=np.float64)
+        self.required_features = features_read_by_model(tree_model) if prune_features else None
+
+    @classmethod
+    def from_pickle_files(cls, model_path, scaler_path, prune_features=True):
+        with open(model_path, 'rb') as model_file:
+            tree_model = pickle.load(model_file)
+        with open(scaler_path, 'rb') as scaler_file:
+            feature_scaler = pickle.load(scaler_file)
+        return cls(tree_model, feature_scaler.mean_, feature_scaler.scale_, getattr(feature_scaler, 'feature_names_in_', MODEL_FEATURE_NAMES), prune_features)
+
+    @classmethod
+    def from_flat_model_file(cls, flat_model_path, prune_features=True):
+        """Loads the .npz written by tree_export.py (scaler + flat tree): no scikit-learn import needed."""
+        return cls(*load_flat_model(flat_model_path), prune_features=prune_features)
+
+    def predict_windows(self, sample_windows):
+        """sample_windows: (n_windows, window_samples, 3). Returns the predicted class of each window."""
+        if self.required_features is None:
+            feature_matrix = compute_model_features(sample_windows)
+        else:
+            feature_matrix = compute_selected_model_features(sample_windows, self.required_features)
+        scaled_features = standardize_features(feature_matrix, self.scaler_means, self.scaler_scales)
+        return np.asarray(self.tree_model.predict(scaled_features))
+
+class MicroBatchInferenceService:
+    """
+    Collects the windows of concurrent requests (asyncio) and classifies them together: the first queued request
+    opens a batch that is run after MAX_BATCH_DELAY_MS or as soon as MAX_BATCH_WINDOWS windows are waiting.
+    Must be started from the running event loop.
+    """
+    def __init__(self, window_classifier, config_obj=WindowInferenceConfig):
+        self.window_classifier = window_classifier
+        self.config = config_obj
+        self.pending_requests = None
+        self.batcher_task = None
+        self.window_latencies_ms = deque(maxlen=config_obj.LATENCY_SAMPLES_KEPT)
+        self.batches_run = 0
+        self.windows_classified = 0
+
+    def start(self):
+        self.pending_requests = asyncio.Queue()
+        self.batcher_task = asyncio.get_running_loop().create_task(self._run_batcher())
+
+    async def stop(self):
+        if self.batcher_task is not None:
+            self.batcher_task.cancel()
+            try:
+                await self.batcher_task
+            except asyncio.CancelledError:
+                pass
+
+    async def classify_windows(self, sample_windows):
+        """Queues the windows of one request and returns their predictions once their batch has run."""
+        result_future = asyncio.get_running_loop().create_future()
+        self.pending_requests.put_nowait((sample_windows, result_future, time.perf_counter()))
+        return await result_future
+
+    async def _collect_batch(self):
+        batch_requests = [await self.pending_requests.get()]
+        batch_windows = len(batch_requests[0][0])
+        batch_deadline = time.perf_counter() + self.config.MAX_BATCH_DELAY_MS / 1000.0
+        while batch_windows < self.config.MAX_BATCH_WINDOWS:
+            remaining_seconds = batch_deadline - time.perf_counter()
+            try:
+                if remaining_seconds <= 0:
+                    next_request = self.pending_requests.get_nowait()
+                else:
+                    next_request = await asyncio.wait_for(self.pending_requests.get(), remaining_seconds)
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                break
+            batch_requests.append(next_request)
+            batch_windows += len(next_request[0])
+        return batch_requests
+
+    async def _run_batcher(self):
+        while True:
+            batch_requests = await self._collect_batch()
+            request_windows = [sample_windows for sample_windows, _, _ in batch_requests]
+            try:
+                batch_predictions = self.window_classifier.predict_windows(np.concatenate(request_windows))
+            except Exception as e:
+                for _, result_future, _ in batch_requests:
+                    if not result_future.done():
+                        result_future.set_exception(e)
+                continue
+
+            finished_at = time.perf_counter()
+            split_points = np.cumsum([len(sample_windows) for sample_windows in request_windows])[:-1]
+            for (sample_windows, result_future, queued_at), request_predictions in zip(batch_requests, np.split(batch_predictions, split_points)):
+                if not result_future.done(): # The client may have gone away meanwhile
+                    result_future.set_result(request_predictions)
+                self.window_latencies_ms.extend([(finished_at - queued_at) * 1000.0] * len(sample_windows))
+            self.batches_run += 1
+            self.windows_classified += len(batch_predictions)
+
+    def take_report(self):
+        """One-line summary since the previous report (mean batch size and per-window latency percentiles)."""
+        sorted_latencies = sorted(self.window_latencies_ms)
+        def percentile(fraction):
+            if not sorted_latencies:
+                return 0.0
+            return sorted_latencies[min(len(sorted_latencies) - 1, int(fraction * len(sorted_latencies)))]
+        report = (f"{self.windows_classified} windows in {self.batches_run} batches "
+                  f"(mean batch {self.windows_classified / max(self.batches_run, 1):.1f}), "
+                  f"window latency p50 {percentile(0.50):.2f} ms, p99 {percentile(0.99):.2f} ms")
+        self.window_latencies_ms.clear()
+        self.batches_run = 0
+        self.windows_classified = 0
+        return report
@@ -0,0 +1,131 @@
+from bisect import bisect_left
+from collections import OrderedDict, deque
+import time
+
+# --- Configuration of the /metrics endpoint (Prometheus text exposition format) ---
+class ServerMetricsConfig:
+    # Upper bounds (seconds) of the request latency histogram buckets; +Inf is added implicitly
+    LATENCY_BUCKETS_S = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+    ALERT_RATE_WINDOW_S = 60       # Per-device alert rate is averaged over this window
+    MAX_TRACKED_DEVICES = 10000    # Least recently alerting devices beyond this are dropped from the per-device series
+    OTHER_PATH_LABEL = "other"     # Label of requests to unknown paths (keeps the number of series bounded)
+
+class _LatencyHistogram:
+    __slots__ = ('bucket_counts', 'latency_sum_s', 'request_count')
+
+    def __init__(self, bucket_count):
+        self.bucket_counts = [0] * (bucket_count + 1) # Last slot: above the largest bucket bound
+        self.latency_sum_s = 0.0
+        self.request_count = 0
+
+class _DeviceAlertCounter:
+    __slots__ = ('total_alerts', 'recent_alert_times')
+
+    def __init__(self):
+        self.total_alerts = 0
+        self.recent_alert_times = deque()
+
+def _escape_label_value(label_value):
+    return str(label_value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+class ServerMetrics:
+    """
+    In-memory metrics of the alert server, rendered on request in the Prometheus text format:
+    request counters by path and status, a latency histogram per path, per-device alert totals and rates,
+    and gauges (queue depths, open connections) that are read from callbacks only when /metrics is scraped.
+    Recording costs a few dictionary operations; nothing is recorded when the server runs without metrics.
+    Not locked: both server modes record from a single thread.
+    """
+    def __init__(self, known_paths, config_obj=ServerMetricsConfig):
+        self.config = config_obj
+        self.known_paths = frozenset(known_paths)
+        self.latency_bounds_s = tuple(config_obj.LATENCY_BUCKETS_S)
+        self.request_counts = {}       # (path, status code) -> requests
+        self.latency_histograms = {}   # path -> _LatencyHistogram
+        self.device_alerts = OrderedDict() # device IP -> _DeviceAlertCounter, least recently alerting first
+        self.gauge_callbacks = []      # (metric name, help text, callback returning a number)
+        self.started_at = time.time()
+
+    def register_gauge(self, metric_name, help_text, value_callback):
+        self.gauge_callbacks.append((metric_name, help_text, value_callback))
+
+    def record_request(self, raw_path, status_code, latency_seconds):
+        request_path = raw_path.split("?", 1)[0]
+        if request_path not in self.known_paths:
+            request_path = self.config.OTHER_PATH_LABEL
+        count_key = (request_path, status_code)
+        self.request_counts[count_key] = self.request_counts.get(count_key, 0) + 1
+        latency_histogram = self.latency_histograms.get(request_path)
+        if latency_histogram is None:
+            latency_histogram = self.latency_histograms[request_path] = _LatencyHistogram(len(self.latency_bounds_s))
+        latency_histogram.bucket_counts[bisect_left(self.latency_bounds_s, latency_seconds)] += 1
+        latency_histogram.latency_sum_s += latency_seconds
+        latency_histogram.request_count += 1
+
+    def record_device_alert(self, device_ip, now=None):
+        now = time.monotonic() if now is None else now
+        device_counter = self.device_alerts.get(device_ip)
+        if device_counter is None:
+            device_counter = self.device_alerts[device_ip] = _DeviceAlertCounter()
+            if len(self.device_alerts) > self.config.MAX_TRACKED_DEVICES:
+                self.device_alerts.popitem(last=False)
+        else:
+            self.device_alerts.move_to_end(device_ip)
+        device_counter.total_alerts += 1
+        device_counter.recent_alert_times.append(now)
+        self._expire_alert_times(device_counter, now)
+
+    def _expire_alert_times(self, device_counter, now):
+        oldest_kept = now - self.config.ALERT_RATE_WINDOW_S
+        recent_alert_times = device_counter.recent_alert_times
+        while recent_alert_times and recent_alert_times[0] < oldest_kept:
+            recent_alert_times.popleft()
+
+    def render(self, now=None):
+        """Returns the exposition text (bytes) of all metrics."""
+        now = time.monotonic() if now is None else now
+        output_lines = [
+            "# HELP alert_server_requests_total HTTP requests handled, by path and status code.",
+            "# TYPE alert_server_requests_total counter",
+        ]
+        for (request_path, status_code), request_count in sorted(self.request_counts.items()):
+            output_lines.append(f'alert_server_requests_total{{path="{_escape_label_value(request_path)}",status="{status_code}"}} {request_count}')
+
+        output_lines.append("# HELP alert_server_request_duration_seconds Time from parsed request to response written.")
+        output_lines.append("# TYPE alert_server_request_duration_seconds histogram")
+        for request_path, latency_histogram in sorted(self.latency_histograms.items()):
+            path_label = f'path="{_escape_label_value(request_path)}"'
+            cumulative_count = 0
+            for bucket_bound, bucket_count in zip(self.latency_bounds_s, latency_histogram.bucket_counts):
+                cumulative_count += bucket_count
+                output_lines.append(f'alert_server_request_duration_seconds_bucket{{{path_label},le="{bucket_bound:g}"}} {cumulative_count}')
+            output_lines.append(f'alert_server_request_duration_seconds_bucket{{{path_label},le="+Inf"}} {latency_histogram.request_count}')
+            output_lines.append(f'alert_server_request_duration_seconds_sum{{{path_label}}} {latency_histogram.latency_sum_s:.6f}')
+            output_lines.append(f'alert_server_request_duration_seconds_count{{{path_label}}} {latency_histogram.request_count}')
+
+        output_lines.append("# HELP alert_server_device_alerts_total Alerts received per device.")
+        output_lines.append("# TYPE alert_server_device_alerts_total counter")
+        rate_lines = [
+            f"# HELP alert_server_device_alert_rate Alerts per second per device over the last {self.config.ALERT_RATE_WINDOW_S} s.",
+            "# TYPE alert_server_device_alert_rate gauge",
+        ]
+        for device_ip, device_counter in self.device_alerts.items():
+            self._expire_alert_times(device_counter, now)
+            device_label = f'device_ip="{_escape_label_value(device_ip)}"'
+            output_lines.append(f"alert_server_device_alerts_total{{{device_label}}} {device_counter.total_alerts}")
+            rate_lines.append(f"alert_server_device_alert_rate{{{device_label}}} {len(device_counter.recent_alert_times) / self.config.ALERT_RATE_WINDOW_S:.4f}")
+        output_lines.extend(rate_lines)
+
+        for metric_name, help_text, value_callback in self.gauge_callbacks:
+            try:
+                gauge_value = value_callback()
+            except Exception: # A gauge of a component that is shutting down: leave it out of this scrape
+                continue
+            output_lines.append(f"# HELP {metric_name} {help_text}")
+            output_lines.append(f"# TYPE {metric_name} gauge")
+            output_lines.append(f"{metric_name} {gauge_value}")
+
+        output_lines.append("# HELP alert_server_start_time_seconds Unix time at which the server started.")
+        output_lines.append("# TYPE alert_server_start_time_seconds gauge")
+        output_lines.append(f"alert_server_start_time_seconds {self.started_at:.3f}")
+        return ("\n".join(output_lines) + "\n").encode()
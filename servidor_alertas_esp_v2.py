@@ -1,44 +1,465 @@
 from http.server import BaseHTTPRequestHandler, HTTPServer
+from http import HTTPStatus
 from urllib.parse import urlparse, parse_qs
+from collections import deque
+import asyncio
 import datetime # Changed from time for more structured timestamping
+import json
+import math
 import os
+import queue
+import threading
+import sys
+import time
+import numpy as np
+from alert_store import AlertStore, AlertStoreConfig
+from alert_correlation import ACTION_FORWARD, AlertCorrelationConfig, AlertCorrelationEngine
+from alert_batch_protocol import DeviceSequenceTracker, build_batch_ack, decode_alert_batch, event_name_for_code
+from server_metrics import ServerMetrics, ServerMetricsConfig
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts")) # Model code shared with the training scripts
+from window_inference import MicroBatchInferenceService, WindowInferenceConfig, decode_window_payload
+from model_registry import ModelRegistry, ModelRegistryConfig
 
 class ServerConfig:
     LISTEN_ADDRESS = "0.0.0.0"  # Listens on all available network interfaces
     LISTEN_PORT = 8081         # Changed port number, ensure ESP32 matches
     ALERT_ENDPOINT_PATH = "/incoming_alert" # Changed endpoint name
+    # POST endpoint for packed binary alert batches (see alert_batch_protocol.py); the GET endpoint stays for older firmware
+    ALERT_BATCH_ENDPOINT_PATH = "/incoming_alert_batch"
+
+    # 'asyncio': concurrent server with HTTP keep-alive and non-blocking logging
+    # 'legacy': original single-threaded http.server implementation
+    SERVER_MODE = "asyncio"
+    KEEP_ALIVE_TIMEOUT_S = 15        # Idle keep-alive connections are closed after this many seconds
+    MAX_CONNECTIONS = 4096           # Connections above this limit get an immediate 503
+    MAX_PENDING_REQUESTS = 1024      # Requests being handled at once; beyond this the server answers 503 (Retry-After)
+    MAX_REQUEST_HEADER_BYTES = 8192
+    MAX_REQUEST_BODY_BYTES = 64 * 1024
+    MAX_PENDING_LOG_LINES = 10000    # Log lines waiting for the console; further lines are dropped (and counted)
+    STATS_REPORT_INTERVAL_S = 10     # Period of the requests/s and latency report (0 disables it)
+    LATENCY_SAMPLES_KEPT = 100000    # Latency samples kept per report interval for the percentiles
+
+    # Persistent alert history (None disables it); queried via ALERT_HISTORY_ENDPOINT_PATH?seconds=10 or ?device_ip=X
+    ALERT_HISTORY_DB_PATH = "alert_history.db"
+    ALERT_HISTORY_ENDPOINT_PATH = "/alert_history"
+    MAX_ALERT_HISTORY_SECONDS = 10 * 365 * 24 * 3600 # Widest ?seconds= window a query may ask for (ten years)
+    MAX_ALERT_HISTORY_LIMIT = 100000                  # Most rows one history query may return
+
+    # Fleet-wide correlation: collapse repeated alerts, rate-limit flapping devices, raise fleet events
+    # (thresholds live in alert_correlation.AlertCorrelationConfig)
+    ENABLE_ALERT_CORRELATION = True
+    FLEET_EVENT_TYPE = "FleetEvent" # Event type under which fleet events are stored in the alert history
+
+    # Server-side classification of raw sample windows (POST body: float32 ax/ay/az, see scripts/window_inference.py);
+    # answers one byte (predicted class) per window. None for INFERENCE_MODEL_PATH disables the endpoint.
+    # A .npz model is the flat export of scripts/tree_export.py (scaler included, no scikit-learn needed);
+    # a .pkl model is the notebook's DecisionTreeClassifier, used with INFERENCE_SCALER_PATH.
+    INFERENCE_ENDPOINT_PATH = "/classify_window"
+    INFERENCE_MODEL_PATH = "decision_tree_parametros/decision_tree_flat.npz"
+    INFERENCE_SCALER_PATH = "decision_tree_parametros/feature_scaler.pkl"
+    INFERENCE_MAX_BATCH_WINDOWS = 256 # asyncio mode micro-batches concurrent requests up to this many windows
+    INFERENCE_MAX_BATCH_DELAY_MS = 5.0 # ...or until the oldest queued request has waited this long
+
+    # Over-the-air model distribution: GET MODEL_BLOB_ENDPOINT_PATH returns the served model as a compact blob
+    # (scripts/model_blob.py) with an ETag; devices polling with If-None-Match get 304 while the model is unchanged.
+    # The model files are re-read when they change on disk (e.g. after tree_export.py), without a restart.
+    MODEL_BLOB_ENDPOINT_PATH = "/model"
+    MODEL_RELOAD_CHECK_INTERVAL_S = 2.0 # 0 disables hot reload
+
+    # Prometheus-format metrics (request counters, latency histograms, per-device alert rates, queue depths);
+    # False disables both the endpoint and the recording (bucket bounds etc. in server_metrics.ServerMetricsConfig)
+    ENABLE_METRICS = True
+    METRICS_ENDPOINT_PATH = "/metrics"
+
+def format_log_timestamp():
+    return datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+
+class NonBlockingConsoleLogger:
+    """
+    Hands log lines to a background thread so request handling never waits on the console. At most max_pending_lines
+    wait for the writer; during a log storm further lines are dropped, counted in dropped_lines and reported.
+    """
+    def __init__(self, max_pending_lines=ServerConfig.MAX_PENDING_LOG_LINES):
+        self.pending_lines = queue.Queue(maxsize=max_pending_lines)
+        self.dropped_lines = 0
+        self.reported_dropped_lines = 0
+        self.writer_thread = threading.Thread(target=self._write_pending_lines, name="alert-log-writer", daemon=True)
+        self.writer_thread.start()
+
+    def log(self, message):
+        try:
+            self.pending_lines.put_nowait(message)
+        except queue.Full:
+            self.dropped_lines += 1
+
+    def _write_pending_lines(self):
+        while True:
+            message = self.pending_lines.get()
+            if message is None:
+                break
+            print(message)
+            if self.dropped_lines != self.reported_dropped_lines and self.pending_lines.empty():
+                print(f"Warning: {self.dropped_lines - self.reported_dropped_lines} log lines dropped (console too slow).")
+                self.reported_dropped_lines = self.dropped_lines
+
+    def close(self):
+        try:
+            self.pending_lines.put(None, timeout=5)
+        except queue.Full:
+            pass
+        self.writer_thread.join(timeout=5)
+
+class AlertRequestRouter:
+    """
+    Request handling shared by both server modes. handle_request() returns (status_code, content_type, body_bytes[, extra_headers]).
+    log_line is print for the legacy server and the non-blocking logger for the asyncio server.
+    Alerts are also queued to alert_store (if given), which persists them without blocking the handler, and passed
+    through correlation_engine (if given): only the first alert of a device burst is logged and fleet events are reported.
+    Sample windows are classified by the model currently served by model_registry, through inference_service
+    (micro-batching, asyncio mode only; the result is then a coroutine) when one is given; the same registry serves
+    the model blob. metrics (if given) counts device alerts and serves METRICS_ENDPOINT_PATH.
+    """
+    def __init__(self, config_obj, log_line=print, alert_store=None, correlation_engine=None, model_registry=None, inference_service=None,
+                 metrics=None):
+        self.config = config_obj
+        self.log_line = log_line
+        self.alert_store = alert_store
+        self.correlation_engine = correlation_engine
+        self.model_registry = model_registry
+        self.inference_service = inference_service
+        self.metrics = metrics
+        self.sequence_tracker = DeviceSequenceTracker()
+
+    def handle_request(self, method, raw_path, client_ip, request_body=b"", request_headers=None):
+        """request_headers: lower-case header names -> values (only If-None-Match is read)."""
+        if method == "POST" and urlparse(raw_path).path == self.config.ALERT_BATCH_ENDPOINT_PATH:
+            return self._handle_alert_batch(client_ip, request_body)
+        if method == "POST" and urlparse(raw_path).path == self.config.INFERENCE_ENDPOINT_PATH and self.model_registry is not None:
+            return self._handle_window_classification(client_ip, request_body)
+        if method != "GET":
+            return 501, "text/plain", f"Unsupported method ('{method}')".encode()
+        url_components = urlparse(raw_path)
+        request_params = parse_qs(url_components.query)
+        timestamp_str = format_log_timestamp()
+
+        if url_components.path == self.config.ALERT_ENDPOINT_PATH:
+            event_category = request_params.get("event_type", ["N/A"])[0]
+            self._process_device_alert(client_ip, event_category, timestamp_str)
+            # Add more details if they are sent by ESP32, e.g.:
+            # sensor_val = request_params.get("value", ["N/A"])[0]
+
+            return 200, "text/plain", b"Notification successfully logged by server."
+        if url_components.path == self.config.MODEL_BLOB_ENDPOINT_PATH and self.model_registry is not None:
+            return self._handle_model_blob_request(request_headers or {})
+        if url_components.path == self.config.ALERT_HISTORY_ENDPOINT_PATH and self.alert_store is not None:
+            return self._handle_alert_history_query(request_params)
+        if url_components.path == self.config.METRICS_ENDPOINT_PATH and self.metrics is not None:
+            return 200, "text/plain; version=0.0.4", self.metrics.render()
+        self.log_line(f"[{timestamp_str}] Denied request for unknown path: {raw_path} from {client_ip}")
+        return 404, "text/plain", b"Requested resource not found on this server."
+
+    def _process_device_alert(self, client_ip, event_category, timestamp_str, detail_line=""):
+        notification_line = f"[{timestamp_str}] EVENT NOTIFICATION from {client_ip}:\n  Event Category: {event_category}{detail_line}"
+        if self.metrics is not None:
+            self.metrics.record_device_alert(client_ip)
+        if self.alert_store is not None:
+            self.alert_store.record_alert(client_ip, event_category)
+        if self.correlation_engine is None:
+            self.log_line(notification_line)
+            return
+
+        correlation_decision = self.correlation_engine.process_alert(client_ip)
+        if correlation_decision.action == ACTION_FORWARD:
+            self.log_line(notification_line)
+        fleet_event = correlation_decision.fleet_event
+        if fleet_event is not None:
+            self.log_line(f"[{timestamp_str}] FLEET EVENT: {fleet_event.device_count} distinct devices alerted "
+                          f"within {fleet_event.window_ms} ms (latest: {client_ip}, type: {event_category})")
+            if self.alert_store is not None:
+                self.alert_store.record_alert("fleet", self.config.FLEET_EVENT_TYPE)
+
+    def _handle_alert_batch(self, client_ip, request_body):
+        """Decodes a packed alert batch in one step and acknowledges all of its records with a single binary reply."""
+        try:
+            boot_id, alert_records = decode_alert_batch(request_body)
+        except ValueError as e:
+            self.log_line(f"[{format_log_timestamp()}] Rejected alert batch from {client_ip}: {e}")
+            return 400, "application/octet-stream", build_batch_ack(0, 0, status=1)
+
+        device_boot = (client_ip, boot_id) # Sequences restart at 0 on every boot
+        # Only batches without a boot id (version 1 firmware) need the counter-restart heuristic
+        new_records = self.sequence_tracker.filter_new_records(device_boot, alert_records, detect_counter_resets=boot_id == 0)
+        timestamp_str = format_log_timestamp()
+        for event_code, device_time_ms, window_mean in zip(new_records['event_code'].tolist(), new_records['device_time_ms'].tolist(), new_records['window_mean'].tolist()):
+            detail_line = f"\n  Device time: {device_time_ms} ms, window means AX:{window_mean[0]:.2f} AY:{window_mean[1]:.2f} AZ:{window_mean[2]:.2f}"
+            self._process_device_alert(client_ip, event_name_for_code(event_code), timestamp_str, detail_line)
+        highest_sequence = self.sequence_tracker.highest_sequence.get(device_boot, 0)
+        return 200, "application/octet-stream", build_batch_ack(len(new_records), highest_sequence)
+
+    def _handle_window_classification(self, client_ip, request_body):
+        served_model = self.model_registry.current
+        if served_model is None:
+            return 503, "text/plain", b"No model loaded."
+        try:
+            sample_windows = decode_window_payload(request_body)
+        except ValueError as e:
+            self.log_line(f"[{format_log_timestamp()}] Rejected sample windows from {client_ip}: {e}")
+            return 400, "text/plain", str(e).encode()
+        if self.inference_service is not None:
+            return self._classify_windows_batched(sample_windows)
+        return 200, "application/octet-stream", served_model.window_classifier.predict_windows(sample_windows).astype(np.uint8).tobytes()
+
+    async def _classify_windows_batched(self, sample_windows):
+        window_predictions = await self.inference_service.classify_windows(sample_windows)
+        return 200, "application/octet-stream", window_predictions.astype(np.uint8).tobytes()
+
+    def _handle_model_blob_request(self, request_headers):
+        """The precomputed blob of the served model, or 304 when the device already has it (If-None-Match)."""
+        served_model = self.model_registry.current
+        if served_model is None:
+            return 503, "text/plain", b"No model loaded."
+        known_etags = request_headers.get("if-none-match", "")
+        if known_etags and (known_etags.strip() == "*" or served_model.etag in (etag.strip() for etag in known_etags.split(","))):
+            return 304, "application/octet-stream", b"", served_model.blob_headers
+        return 200, "application/octet-stream", served_model.blob_bytes, served_model.blob_headers
+
+    def _handle_alert_history_query(self, request_params):
+        """?seconds=N lists fleet-wide alerts of the last N seconds, ?device_ip=X the history of one device."""
+        try:
+            result_limit = int(request_params.get("limit", ["1000"])[0])
+            seconds_back = float(request_params.get("seconds", ["10"])[0])
+        except ValueError:
+            return 400, "text/plain", b"Invalid 'seconds' or 'limit' parameter."
+        # inf/nan seconds or an out-of-range limit would otherwise fail inside SQLite
+        if not (math.isfinite(seconds_back) and 0 <= seconds_back <= self.config.MAX_ALERT_HISTORY_SECONDS):
+            return 400, "text/plain", b"'seconds' must be a finite number between 0 and %d." % self.config.MAX_ALERT_HISTORY_SECONDS
+        if not 0 < result_limit <= self.config.MAX_ALERT_HISTORY_LIMIT:
+            return 400, "text/plain", b"'limit' must be between 1 and %d." % self.config.MAX_ALERT_HISTORY_LIMIT
+        if "device_ip" in request_params:
+            alert_rows = self.alert_store.device_history(request_params["device_ip"][0], result_limit)
+        else:
+            alert_rows = self.alert_store.alerts_since(seconds_back, limit=result_limit)
+        response_payload = [
+            {"received_at_us": received_at_us, "device_ip": device_ip, "event_type": event_type}
+            for received_at_us, device_ip, event_type in alert_rows
+        ]
+        return 200, "application/json", json.dumps(response_payload).encode()
 
 class ESP32NotificationHandler(BaseHTTPRequestHandler):
-    def _send_response_message(self, code, content_type, message_bytes):
+    request_router = AlertRequestRouter(ServerConfig)
+
+    def _send_response_message(self, code, content_type, message_bytes, extra_headers=()):
         self.send_response(code)
         self.send_header("Content-type", content_type)
+        for header_name, header_value in extra_headers:
+            self.send_header(header_name, header_value)
         self.end_headers()
         self.wfile.write(message_bytes)
 
     def do_GET(self):
-        url_components = urlparse(self.path)
-        request_params = parse_qs(url_components.query)
-        timestamp_str = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+        request_started = time.perf_counter()
+        request_headers = {header_name.lower(): header_value for header_name, header_value in self.headers.items()}
+        route_result = self.request_router.handle_request("GET", self.path, self.client_address[0], request_headers=request_headers)
+        status_code = route_result[0]
+        self._send_response_message(*route_result[:3], route_result[3] if len(route_result) > 3 else ())
+        if self.request_router.metrics is not None:
+            self.request_router.metrics.record_request(self.path, status_code, time.perf_counter() - request_started)
 
-        if url_components.path == ServerConfig.ALERT_ENDPOINT_PATH:
-            event_category = request_params.get("event_type", ["N/A"])[0]
-            device_ip = self.client_address[0]
-            
-            print(f"[{timestamp_str}] EVENT NOTIFICATION from {device_ip}:")
-            print(f"  Event Category: {event_category}")
-            # Add more details if they are sent by ESP32, e.g.:
-            # sensor_val = request_params.get("value", ["N/A"])[0]
-            # print(f"  Sensor Value: {sensor_val}")
+    def do_POST(self):
+        request_started = time.perf_counter()
+        content_length = int(self.headers.get("Content-Length", 0) or 0)
+        request_body = self.rfile.read(content_length) if content_length else b""
+        status_code, content_type, message_bytes = self.request_router.handle_request("POST", self.path, self.client_address[0], request_body)[:3]
+        self._send_response_message(status_code, content_type, message_bytes)
+        if self.request_router.metrics is not None:
+            self.request_router.metrics.record_request(self.path, status_code, time.perf_counter() - request_started)
 
-            self._send_response_message(200, "text/plain", b"Notification successfully logged by server.")
-        else:
-            print(f"[{timestamp_str}] Denied request for unknown path: {self.path} from {self.client_address[0]}")
-            self._send_response_message(404, "text/plain", b"Requested resource not found on this server.")
+class RequestLatencyStats:
+    """Request counters and latency samples of the current report interval."""
+    def __init__(self, max_samples):
+        self.latency_samples_ms = deque(maxlen=max_samples)
+        self.interval_requests = 0
+        self.interval_rejected = 0
+        self.interval_started = time.monotonic()
+
+    def record(self, latency_seconds):
+        self.interval_requests += 1
+        self.latency_samples_ms.append(latency_seconds * 1000.0)
+
+    def take_report(self):
+        """Returns a one-line summary of the interval and starts a new one."""
+        elapsed_seconds = max(time.monotonic() - self.interval_started, 1e-9)
+        sorted_samples = sorted(self.latency_samples_ms)
+        def percentile(fraction):
+            if not sorted_samples:
+                return 0.0
+            return sorted_samples[min(len(sorted_samples) - 1, int(fraction * len(sorted_samples)))]
+        report = (f"{self.interval_requests} requests in {elapsed_seconds:.1f}s "
+                  f"({self.interval_requests / elapsed_seconds:.0f} req/s), "
+                  f"latency p50 {percentile(0.50):.2f} ms, p99 {percentile(0.99):.2f} ms, "
+                  f"{self.interval_rejected} rejected")
+        self.latency_samples_ms.clear()
+        self.interval_requests = 0
+        self.interval_rejected = 0
+        self.interval_started = time.monotonic()
+        return report
+
+class RequestRejected(Exception):
+    """Raised while reading a request that is answered with status_code and the connection closed."""
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+
+class AsyncAlertHTTPServer:
+    """
+    asyncio HTTP/1.1 server for the alert endpoints: every connection is served concurrently, keep-alive
+    connections are reused, in-flight requests are bounded (excess gets 503) and logging never blocks the loop.
+    """
+    def __init__(self, config_obj, request_router, log_line):
+        self.config = config_obj
+        self.request_router = request_router
+        self.log_line = log_line
+        self.inference_service = request_router.inference_service
+        self.metrics = request_router.metrics
+        self.latency_stats = RequestLatencyStats(config_obj.LATENCY_SAMPLES_KEPT)
+        self.active_connections = 0
+        self.pending_requests = 0
+
+    async def _read_request(self, reader):
+        """
+        Parses one request. Returns (method, path, version, headers, body), or None when the connection ends.
+        Raises RequestRejected for a malformed request line, Content-Length or a body above MAX_REQUEST_BODY_BYTES.
+        """
+        try:
+            header_block = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=self.config.KEEP_ALIVE_TIMEOUT_S)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ConnectionError):
+            return None
+        header_lines = header_block.decode("latin-1").split("\r\n")
+        request_line_parts = header_lines[0].split()
+        if len(request_line_parts) != 3:
+            raise RequestRejected(400, "Malformed request line.")
+        method, raw_path, http_version = request_line_parts
+        request_headers = {}
+        for header_line in header_lines[1:]:
+            if ":" in header_line:
+                header_name, header_value = header_line.split(":", 1)
+                request_headers[header_name.strip().lower()] = header_value.strip()
+
+        request_body = b""
+        content_length_text = request_headers.get("content-length", "0") or "0"
+        if not content_length_text.isdigit():
+            raise RequestRejected(400, f"Invalid Content-Length '{content_length_text}'.")
+        content_length = int(content_length_text)
+        if content_length > self.config.MAX_REQUEST_BODY_BYTES:
+            raise RequestRejected(413, f"Request body above {self.config.MAX_REQUEST_BODY_BYTES} bytes.")
+        if content_length:
+            try:
+                request_body = await asyncio.wait_for(reader.readexactly(content_length), timeout=self.config.KEEP_ALIVE_TIMEOUT_S)
+            except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                return None
+        return method, raw_path, http_version, request_headers, request_body
+
+    def _build_response(self, status_code, content_type, body_bytes, keep_alive, extra_headers=()):
+        header_lines = [
+            f"HTTP/1.1 {status_code} {HTTPStatus(status_code).phrase}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body_bytes)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        header_lines.extend(f"{header_name}: {header_value}" for header_name, header_value in extra_headers)
+        return ("\r\n".join(header_lines) + "\r\n\r\n").encode("latin-1") + body_bytes
+
+    async def _handle_connection(self, reader, writer):
+        client_ip = (writer.get_extra_info("peername") or ("unknown",))[0]
+        if self.active_connections >= self.config.MAX_CONNECTIONS:
+            self.latency_stats.interval_rejected += 1
+            writer.write(self._build_response(503, "text/plain", b"Server busy, retry later.", False, [("Retry-After", "1")]))
+            writer.close()
+            return
+        self.active_connections += 1
+        try:
+            while True:
+                try:
+                    parsed_request = await self._read_request(reader)
+                except RequestRejected as e:
+                    self.latency_stats.interval_rejected += 1
+                    writer.write(self._build_response(e.status_code, "text/plain", str(e).encode(), False))
+                    await writer.drain()
+                    if self.metrics is not None:
+                        self.metrics.record_request("", e.status_code, 0.0)
+                    break
+                if parsed_request is None:
+                    break
+                request_started = time.perf_counter()
+                method, raw_path, http_version, request_headers, request_body = parsed_request
+                connection_header = request_headers.get("connection", "").lower()
+                keep_alive = connection_header == "keep-alive" if http_version == "HTTP/1.0" else connection_header != "close"
+
+                if self.pending_requests >= self.config.MAX_PENDING_REQUESTS:
+                    self.latency_stats.interval_rejected += 1
+                    response_status = 503
+                    writer.write(self._build_response(503, "text/plain", b"Server busy, retry later.", keep_alive, [("Retry-After", "1")]))
+                else:
+                    self.pending_requests += 1
+                    try:
+                        route_result = self.request_router.handle_request(method, raw_path, client_ip, request_body, request_headers)
+                        if asyncio.iscoroutine(route_result):
+                            route_result = await route_result
+                    except Exception as e: # A failing handler answers 500; the connection stays usable
+                        self.log_line(f"[{format_log_timestamp()}] ERROR: {method} {raw_path} from {client_ip} failed: {e!r}")
+                        route_result = (500, "text/plain", b"Internal server error.")
+                    finally:
+                        self.pending_requests -= 1
+                    response_status = route_result[0]
+                    writer.write(self._build_response(*route_result[:3], keep_alive, route_result[3] if len(route_result) > 3 else ()))
+                await writer.drain()
+                request_latency = time.perf_counter() - request_started
+                self.latency_stats.record(request_latency)
+                if self.metrics is not None:
+                    self.metrics.record_request(raw_path, response_status, request_latency)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self.active_connections -= 1
+            writer.close()
+
+    async def _report_stats_periodically(self):
+        while True:
+            await asyncio.sleep(self.config.STATS_REPORT_INTERVAL_S)
+            self.log_line(f"[{format_log_timestamp()}] Server stats: {self.latency_stats.take_report()}, "
+                          f"{self.active_connections} open connections")
+            if self.inference_service is not None:
+                self.log_line(f"[{format_log_timestamp()}] Inference stats: {self.inference_service.take_report()}")
+
+    async def serve_forever(self):
+        tcp_server = await asyncio.start_server(
+            self._handle_connection,
+            self.config.LISTEN_ADDRESS,
+            self.config.LISTEN_PORT,
+            limit=self.config.MAX_REQUEST_HEADER_BYTES,
+            backlog=self.config.MAX_CONNECTIONS,
+        )
+        stats_task = None
+        if self.config.STATS_REPORT_INTERVAL_S > 0:
+            stats_task = asyncio.create_task(self._report_stats_periodically())
+        if self.inference_service is not None:
+            self.inference_service.start()
+        try:
+            async with tcp_server:
+                await tcp_server.serve_forever()
+        finally:
+            if stats_task:
+                stats_task.cancel()
+            if self.inference_service is not None:
+                await self.inference_service.stop()
 
 class CustomAlertHTTPServer:
     def __init__(self, config_obj):
         self.config = config_obj
         self.http_daemon = None
+        self.model_registry = None
 
     def display_startup_message(self):
         timestamp_str = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -46,16 +467,125 @@ class CustomAlertHTTPServer:
         print(f"Initializing server on {self.config.LISTEN_ADDRESS}:{self.config.LISTEN_PORT}")
         print(f"ESP32 should send alerts to this machine's actual IP on the network (e.g., 192.168.1.X) at port {self.config.LISTEN_PORT}.")
         print(f"Expected alert endpoint: {self.config.ALERT_ENDPOINT_PATH}?event_type=some_event")
+        print(f"Server mode: {self.config.SERVER_MODE}")
         print("Press Ctrl+C to terminate the server gracefully.")
 
+    def _open_alert_store(self):
+        if not self.config.ALERT_HISTORY_DB_PATH:
+            return None
+        class HistoryStoreConfig(AlertStoreConfig):
+            DATABASE_PATH = self.config.ALERT_HISTORY_DB_PATH
+        print(f"Alert history stored in: {self.config.ALERT_HISTORY_DB_PATH} (query at {self.config.ALERT_HISTORY_ENDPOINT_PATH})")
+        return AlertStore(HistoryStoreConfig)
+
+    def _create_correlation_engine(self):
+        if not self.config.ENABLE_ALERT_CORRELATION:
+            return None
+        return AlertCorrelationEngine(AlertCorrelationConfig)
+
+    def _open_model_registry(self, log_line):
+        if not self.config.INFERENCE_MODEL_PATH:
+            return None
+        class ServedModelConfig(ModelRegistryConfig):
+            MODEL_PATH = self.config.INFERENCE_MODEL_PATH
+            SCALER_PATH = self.config.INFERENCE_SCALER_PATH
+            RELOAD_CHECK_INTERVAL_S = self.config.MODEL_RELOAD_CHECK_INTERVAL_S
+        model_registry = ModelRegistry(ServedModelConfig, log_line)
+        if model_registry.load():
+            print(f"Window classification enabled at {self.config.INFERENCE_ENDPOINT_PATH}, model blob at {self.config.MODEL_BLOB_ENDPOINT_PATH} "
+                  f"(model: {self.config.INFERENCE_MODEL_PATH}, version {model_registry.current.model_version:08x})")
+        else:
+            print(f"Warning: No model loaded; {self.config.INFERENCE_ENDPOINT_PATH} and {self.config.MODEL_BLOB_ENDPOINT_PATH} "
+                  f"answer 503 until '{self.config.INFERENCE_MODEL_PATH}' can be loaded.")
+        model_registry.start_watching()
+        self.model_registry = model_registry
+        return model_registry
+
+    def _create_inference_service(self, model_registry):
+        if model_registry is None:
+            return None
+        class ServerInferenceConfig(WindowInferenceConfig):
+            MAX_BATCH_WINDOWS = self.config.INFERENCE_MAX_BATCH_WINDOWS
+            MAX_BATCH_DELAY_MS = self.config.INFERENCE_MAX_BATCH_DELAY_MS
+        served_model = model_registry.current
+        inference_service = MicroBatchInferenceService(served_model.window_classifier if served_model else None, ServerInferenceConfig)
+        # Reloads swap the classifier between batches; queued requests are classified by the next batch as usual
+        model_registry.add_reload_listener(lambda new_model: setattr(inference_service, 'window_classifier', new_model.window_classifier))
+        return inference_service
+
+    def _create_metrics(self, alert_store, model_registry):
+        if not self.config.ENABLE_METRICS:
+            return None
+        server_metrics = ServerMetrics([
+            self.config.ALERT_ENDPOINT_PATH, self.config.ALERT_BATCH_ENDPOINT_PATH, self.config.ALERT_HISTORY_ENDPOINT_PATH,
+            self.config.INFERENCE_ENDPOINT_PATH, self.config.METRICS_ENDPOINT_PATH, self.config.MODEL_BLOB_ENDPOINT_PATH,
+        ], ServerMetricsConfig)
+        if alert_store is not None:
+            server_metrics.register_gauge("alert_server_alert_store_queue_depth", "Alerts waiting for the history writer.",
+                                          lambda: alert_store.queue_depth)
+            server_metrics.register_gauge("alert_server_alert_store_dropped_alerts", "Alerts dropped so far because the history queue was full.",
+                                          lambda: alert_store.dropped_alerts)
+            server_metrics.register_gauge("alert_server_alert_store_failed_alerts", "Alerts lost so far because their batch could not be committed.",
+                                          lambda: alert_store.failed_alerts)
+        if model_registry is not None:
+            server_metrics.register_gauge("alert_server_model_version", "Version (CRC-32 of the model blob) of the served model.",
+                                          lambda: model_registry.current.model_version)
+            server_metrics.register_gauge("alert_server_model_reloads", "Times the model was reloaded from disk since the start.",
+                                          lambda: model_registry.reload_count)
+        print(f"Metrics available at {self.config.METRICS_ENDPOINT_PATH}")
+        return server_metrics
+
+    def _register_async_gauges(self, server_metrics, async_server, console_logger):
+        server_metrics.register_gauge("alert_server_open_connections", "Open client connections.",
+                                      lambda: async_server.active_connections)
+        server_metrics.register_gauge("alert_server_pending_requests", "Requests being handled.",
+                                      lambda: async_server.pending_requests)
+        server_metrics.register_gauge("alert_server_log_queue_depth", "Log lines waiting for the console writer.",
+                                      lambda: console_logger.pending_lines.qsize())
+        server_metrics.register_gauge("alert_server_log_lines_dropped", "Log lines dropped because the console writer fell behind.",
+                                      lambda: console_logger.dropped_lines)
+        inference_service = async_server.inference_service
+        if inference_service is not None:
+            server_metrics.register_gauge("alert_server_inference_queue_depth", "Window classification requests waiting for a batch.",
+                                          lambda: inference_service.pending_requests.qsize())
+
+    def _run_legacy_server(self, alert_store):
+        model_registry = self._open_model_registry(print)
+        ESP32NotificationHandler.request_router = AlertRequestRouter(
+            self.config, print, alert_store, self._create_correlation_engine(), model_registry,
+            metrics=self._create_metrics(alert_store, model_registry)
+        )
+        self.http_daemon = HTTPServer(
+            (self.config.LISTEN_ADDRESS, self.config.LISTEN_PORT), 
+            ESP32NotificationHandler # Using the renamed handler
+        )
+        self.http_daemon.serve_forever()
+
+    def _run_async_server(self, alert_store):
+        console_logger = NonBlockingConsoleLogger(self.config.MAX_PENDING_LOG_LINES)
+        try:
+            model_registry = self._open_model_registry(console_logger.log)
+            server_metrics = self._create_metrics(alert_store, model_registry)
+            request_router = AlertRequestRouter(
+                self.config, console_logger.log, alert_store, self._create_correlation_engine(),
+                model_registry, self._create_inference_service(model_registry), server_metrics
+            )
+            async_server = AsyncAlertHTTPServer(self.config, request_router, console_logger.log)
+            if server_metrics is not None:
+                self._register_async_gauges(server_metrics, async_server, console_logger)
+            asyncio.run(async_server.serve_forever())
+        finally:
+            console_logger.close()
+
     def start_service(self):
         self.display_startup_message()
+        alert_store = None
         try:
-            self.http_daemon = HTTPServer(
-                (self.config.LISTEN_ADDRESS, self.config.LISTEN_PORT), 
-                ESP32NotificationHandler # Using the renamed handler
-            )
-            self.http_daemon.serve_forever()
+            alert_store = self._open_alert_store()
+            if self.config.SERVER_MODE == "legacy":
+                self._run_legacy_server(alert_store)
+            else:
+                self._run_async_server(alert_store)
         except KeyboardInterrupt:
             print("\nCtrl+C detected. Shutting down server...")
         except OSError as e:
@@ -63,8 +593,12 @@ class CustomAlertHTTPServer:
         except Exception as e:
             print(f"An unexpected error occurred: {e}")
         finally:
+            if self.model_registry is not None:
+                self.model_registry.stop_watching()
             if self.http_daemon:
                 self.http_daemon.server_close()
+            if alert_store is not None:
+                alert_store.close() # Commits every alert still queued
             timestamp_str = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             print(f"[{timestamp_str}] Server has been shut down.")
 
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The pipeline modules import each other by bare name from scripts/ (like running them from that directory)
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS_DIR = os.path.join(REPO_ROOT, 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
@@ -0,0 +1,92 @@
+import os
+import numpy as np
+import pytest
+from sklearn.tree import DecisionTreeClassifier
+
+from conftest import REPO_ROOT
+from flat_tree import FlatDecisionTree, load_flat_model, save_flat_model
+from model_blob import decode_model_blob, encode_model_blob, read_model_blob_version
+from model_features import MODEL_FEATURE_NAMES
+from tree_export import generate_c_model_header
+
+FEATURE_COUNT = len(MODEL_FEATURE_NAMES)
+BOUNDARY_COLUMN = 3
+BOUNDARY_VALUE = 4.0 # Its float32 successor is far enough away (4.8e-7) for sklearn to split between them
+BOUNDARY_NEIGHBOUR = float(np.nextafter(np.float32(BOUNDARY_VALUE), np.float32(np.inf)))
+
+@pytest.fixture(scope='module')
+def fitted_tree():
+    """
+    A small tree over the 32 model features. BOUNDARY_COLUMN only takes the adjacent float32 values BOUNDARY_VALUE and
+    its successor, so its split threshold is their midpoint, which float32 cannot represent.
+    """
+    rng = np.random.default_rng(5)
+    feature_matrix = rng.normal(0, 2, (4000, FEATURE_COUNT))
+    feature_matrix[:, BOUNDARY_COLUMN] = rng.choice([BOUNDARY_VALUE, BOUNDARY_NEIGHBOUR], size=len(feature_matrix))
+    class_labels = 2 * (feature_matrix[:, BOUNDARY_COLUMN] > BOUNDARY_VALUE) + (feature_matrix[:, 10] + feature_matrix[:, 29] > 0.5)
+    return DecisionTreeClassifier(max_depth=6, random_state=0).fit(feature_matrix, class_labels)
+
+def threshold_boundary_rows(tree_model, rows_per_value=20, random_seed=9):
+    """Random rows with the split feature set exactly on, and one float64/float32 step around, every split threshold."""
+    rng = np.random.default_rng(random_seed)
+    tree_structure = tree_model.tree_
+    boundary_blocks = []
+    for node_number in np.flatnonzero(tree_structure.children_left != -1):
+        split_threshold = tree_structure.threshold[node_number]
+        float32_threshold = np.float32(split_threshold)
+        boundary_values = np.array([
+            split_threshold, np.nextafter(split_threshold, np.inf), np.nextafter(split_threshold, -np.inf),
+            float32_threshold, np.nextafter(float32_threshold, np.float32(np.inf)), np.nextafter(float32_threshold, np.float32(-np.inf)),
+        ], dtype=np.float64)
+        boundary_rows = rng.normal(0, 2, (len(boundary_values) * rows_per_value, FEATURE_COUNT))
+        boundary_rows[:, tree_structure.feature[node_number]] = np.repeat(boundary_values, rows_per_value)
+        boundary_blocks.append(boundary_rows)
+    return np.concatenate(boundary_blocks)
+
+def test_boundary_threshold_is_not_a_float32(fitted_tree):
+    tree_structure = fitted_tree.tree_
+    boundary_thresholds = tree_structure.threshold[tree_structure.feature == BOUNDARY_COLUMN]
+    assert (BOUNDARY_VALUE + BOUNDARY_NEIGHBOUR) / 2 in boundary_thresholds
+    assert np.any(np.float32(boundary_thresholds).astype(np.float64) != boundary_thresholds)
+
+def test_flat_tree_predicts_like_sklearn(fitted_tree):
+    flat_tree = FlatDecisionTree.from_sklearn(fitted_tree)
+    boundary_rows = threshold_boundary_rows(fitted_tree)
+    sklearn_predictions = fitted_tree.predict(boundary_rows)
+
+    np.testing.assert_array_equal(flat_tree.predict(boundary_rows), sklearn_predictions)
+    np.testing.assert_array_equal([flat_tree.predict_row(row) for row in boundary_rows], sklearn_predictions)
+    assert flat_tree.max_depth == fitted_tree.get_depth()
+
+def test_decoded_blob_predicts_like_sklearn(fitted_tree):
+    flat_tree = FlatDecisionTree.from_sklearn(fitted_tree)
+    model_blob = encode_model_blob(flat_tree, np.zeros(FEATURE_COUNT), np.ones(FEATURE_COUNT))
+    decoded_tree, _, _ = decode_model_blob(model_blob)
+    boundary_rows = threshold_boundary_rows(fitted_tree)
+
+    np.testing.assert_array_equal(decoded_tree.predict(boundary_rows), fitted_tree.predict(boundary_rows))
+    assert encode_model_blob(decoded_tree, np.zeros(FEATURE_COUNT), np.ones(FEATURE_COUNT)) == model_blob
+
+def test_saved_flat_model_predicts_like_sklearn(fitted_tree, tmp_path):
+    flat_model_path = os.path.join(tmp_path, 'flat_model.npz')
+    save_flat_model(flat_model_path, FlatDecisionTree.from_sklearn(fitted_tree), np.zeros(FEATURE_COUNT), np.ones(FEATURE_COUNT))
+    loaded_tree, _, _, feature_names = load_flat_model(flat_model_path)
+    boundary_rows = threshold_boundary_rows(fitted_tree)
+
+    np.testing.assert_array_equal(loaded_tree.predict(boundary_rows), fitted_tree.predict(boundary_rows))
+    assert feature_names == MODEL_FEATURE_NAMES
+
+def test_c_header_is_identified_by_model_version(fitted_tree):
+    flat_tree = FlatDecisionTree.from_sklearn(fitted_tree)
+    scaler_means, scaler_scales = np.zeros(FEATURE_COUNT), np.ones(FEATURE_COUNT)
+    model_version = read_model_blob_version(encode_model_blob(flat_tree, scaler_means, scaler_scales))
+    c_header = generate_c_model_header(flat_tree, scaler_means, scaler_scales)
+
+    assert f"DETECTOR_MODEL_VERSION = 0x{model_version:08x}u;" in c_header
+    assert generate_c_model_header(flat_tree, scaler_means, scaler_scales) == c_header # Same model, same header
+
+def test_deployed_header_matches_deployed_model():
+    flat_tree, scaler_means, scaler_scales, feature_names = load_flat_model(os.path.join(REPO_ROOT, 'decision_tree_parametros', 'decision_tree_flat.npz'))
+    with open(os.path.join(REPO_ROOT, 'firmware_v2', 'detector_serial_v2', 'detector_model_generated.h')) as header_file:
+        deployed_header = header_file.read()
+    assert deployed_header == generate_c_model_header(flat_tree, scaler_means, scaler_scales, feature_names)
@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+from sensor_frame_protocol import SensorFrameProtocol, encode_sensor_frames, find_valid_frames
+from serial_capture import BinaryFrameDecoder, CaptureCounters
+
+FRAME_BYTES = SensorFrameProtocol.FRAME_BYTES
+SAMPLE_PERIOD_US = 10000
+
+def build_frames(sequences, device_times_us=None):
+    """Frames whose ax is their (unwrapped) sequence number, so every decoded row can be traced back to its frame."""
+    sequences = np.asarray(sequences, dtype=np.int64)
+    if device_times_us is None:
+        device_times_us = 5_000_000 + sequences * SAMPLE_PERIOD_US
+    accel_values = np.stack([sequences, np.full(len(sequences), 0.5), np.full(len(sequences), -9.81)], axis=1)
+    return encode_sensor_frames(sequences, device_times_us, accel_values, np.zeros(len(sequences), dtype=np.uint8))
+
+def corrupt_frame(stream_bytes, frame_number, byte_offset=10):
+    corrupted = bytearray(stream_bytes)
+    corrupted[frame_number * FRAME_BYTES + byte_offset] ^= 0xFF
+    return bytes(corrupted)
+
+def test_clean_stream_is_decoded_completely():
+    frames, consumed_bytes, skipped_bytes, crc_errors = find_valid_frames(build_frames(range(100)))
+    assert frames['sequence'].tolist() == list(range(100))
+    assert consumed_bytes == 100 * FRAME_BYTES
+    assert (skipped_bytes, crc_errors) == (0, 0)
+
+def test_boot_text_before_the_frames_is_skipped():
+    boot_text = b"ets Jun  8 2016 00:22:57\r\nrst:0x1 (POWERON_RESET)\r\nINFO: Binary frames\r\n"
+    frames, consumed_bytes, skipped_bytes, crc_errors = find_valid_frames(boot_text + build_frames(range(10)))
+    assert frames['sequence'].tolist() == list(range(10))
+    assert consumed_bytes == len(boot_text) + 10 * FRAME_BYTES
+    assert (skipped_bytes, crc_errors) == (len(boot_text), 0)
+
+def test_corrupt_frame_is_dropped_and_the_stream_resynchronizes():
+    stream_bytes = corrupt_frame(build_frames(range(20)), frame_number=7)
+    frames, consumed_bytes, skipped_bytes, crc_errors = find_valid_frames(stream_bytes)
+    assert frames['sequence'].tolist() == [sequence for sequence in range(20) if sequence != 7]
+    assert crc_errors == 1
+    assert skipped_bytes == FRAME_BYTES # The corrupt frame, skipped while searching for the next sync word
+    assert consumed_bytes == len(stream_bytes)
+
+def test_sync_pattern_inside_a_frame_does_not_create_frames():
+    frames, _, _, crc_errors = find_valid_frames(build_frames(range(5)) + SensorFrameProtocol.SYNC_BYTES + bytes(FRAME_BYTES) + build_frames(range(5, 10)))
+    assert frames['sequence'].tolist() == list(range(10))
+    assert crc_errors == 1
+
+def test_incomplete_frame_is_left_for_the_next_read():
+    stream_bytes = build_frames(range(3))
+    frames, consumed_bytes, skipped_bytes, _ = find_valid_frames(stream_bytes[:2 * FRAME_BYTES + 11])
+    assert frames['sequence'].tolist() == [0, 1]
+    assert (consumed_bytes, skipped_bytes) == (2 * FRAME_BYTES, 0)
+
+@pytest.mark.parametrize('chunk_bytes', [1, 7, FRAME_BYTES - 1, FRAME_BYTES + 5, 1000])
+def test_decoder_reassembles_frames_split_across_reads(chunk_bytes):
+    stream_bytes = build_frames(range(200))
+    counters = CaptureCounters()
+    frame_decoder = BinaryFrameDecoder(counters)
+    decoded_rows = []
+    for chunk_start in range(0, len(stream_bytes), chunk_bytes):
+        decoded_rows += frame_decoder.decode(stream_bytes[chunk_start:chunk_start + chunk_bytes], read_time=100.0 + chunk_start * 1e-6)
+    assert [row[1] for row in decoded_rows] == list(range(200))
+    assert (counters.missing_frames, counters.crc_errors, counters.skipped_bytes, counters.device_resets) == (0, 0, 0, 0)
+
+def test_decoder_counts_dropped_and_corrupt_frames():
+    stream_bytes = build_frames([sequence for sequence in range(100) if sequence not in (10, 11, 12, 50)])
+    stream_bytes = corrupt_frame(stream_bytes, frame_number=70) # Sequence 74 (four frames missing before it)
+    counters = CaptureCounters()
+    decoded_rows = BinaryFrameDecoder(counters).decode(stream_bytes, read_time=100.0)
+    assert len(decoded_rows) == 95
+    assert counters.crc_errors == 1
+    assert counters.missing_frames == 5 # The dropped frames and the corrupt one, counted from the sequence numbers
+    row_times = np.array([row[0] for row in decoded_rows])
+    np.testing.assert_allclose(np.diff(row_times), np.diff([row[1] for row in decoded_rows]) * SAMPLE_PERIOD_US / 1e6)
+
+def test_sequence_and_device_clock_wraparound_are_not_losses():
+    sequences = np.arange(65500, 65600) # Sequence wraps at 65536
+    device_times_us = SensorFrameProtocol.DEVICE_CLOCK_MODULUS - 300_000 + (sequences - 65500) * SAMPLE_PERIOD_US # micros() wraps too
+    stream_bytes = build_frames(sequences, device_times_us)
+    counters = CaptureCounters()
+    frame_decoder = BinaryFrameDecoder(counters)
+    decoded_rows = frame_decoder.decode(stream_bytes[:40 * FRAME_BYTES], read_time=100.0)
+    decoded_rows += frame_decoder.decode(stream_bytes[40 * FRAME_BYTES:], read_time=100.6)
+    assert [row[1] for row in decoded_rows] == sequences.tolist()
+    assert (counters.missing_frames, counters.device_resets) == (0, 0)
+    np.testing.assert_allclose(np.diff([row[0] for row in decoded_rows]), SAMPLE_PERIOD_US / 1e6)
+
+def test_device_reset_restarts_sequence_and_clock_without_losses():
+    counters = CaptureCounters()
+    frame_decoder = BinaryFrameDecoder(counters)
+    rows_before_reset = frame_decoder.decode(build_frames(range(1000, 1100)), read_time=100.0)
+    # The board restarted: its sequence and micros() begin again at 0
+    rows_after_reset = frame_decoder.decode(build_frames(range(50), device_times_us=np.arange(50) * SAMPLE_PERIOD_US), read_time=103.0)
+
+    assert len(rows_before_reset) == 100 and len(rows_after_reset) == 50
+    assert counters.device_resets == 1
+    assert counters.missing_frames == 0
+    # Rows after the reset are anchored to their own read time, after the rows before it
+    assert rows_after_reset[-1][0] == pytest.approx(103.0)
+    assert rows_after_reset[0][0] > rows_before_reset[-1][0]
+    np.testing.assert_allclose(np.diff([row[0] for row in rows_after_reset]), SAMPLE_PERIOD_US / 1e6)
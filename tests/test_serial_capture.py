@@ -0,0 +1,84 @@
+import csv
+import io
+import time
+import pytest
+
+serial = pytest.importorskip('serial')
+pytest.importorskip('tty') # The fake device needs a POSIX pseudo-terminal
+
+from fake_serial_device import FakeDeviceConfig, PtyFakeSensorDevice
+from serial_capture import SerialCaptureConfig, SerialCaptureEngine
+
+BANNER_TEXT_LINES = sum(1 for banner_line in FakeDeviceConfig.BANNER_LINES if banner_line) # Decoded as malformed lines
+
+class SmallRingBufferConfig(SerialCaptureConfig):
+    RING_BUFFER_BYTES = 512 # Overflows as soon as the writer falls behind
+
+def run_capture(fake_device, config_obj=SerialCaptureConfig, row_callback=None, marker_commands=(), timeout_s=20.0):
+    """Captures the (not yet started) fake device's whole stream into an in-memory CSV. Returns (engine, csv rows)."""
+    # Opening the port flushes its input, so the device only starts sending once the port is open
+    serial_conn = serial.Serial(fake_device.device_path, 115200, timeout=0.05)
+    output_file = io.StringIO()
+    capture_engine = SerialCaptureEngine(serial_conn, csv.writer(output_file), output_file, config_obj, row_callback,
+                                         binary_frames=fake_device.binary_frames)
+    capture_engine.start()
+    fake_device.start()
+    try:
+        for command_delay_s, command_bytes in marker_commands:
+            time.sleep(command_delay_s)
+            capture_engine.write_command(command_bytes)
+        assert fake_device.finished.wait(timeout_s)
+        deadline = time.monotonic() + timeout_s
+        while serial_conn.in_waiting and time.monotonic() < deadline: # Let the reader take everything sent
+            time.sleep(0.05)
+        time.sleep(0.2)
+    finally:
+        capture_engine.stop()
+        serial_conn.close()
+        fake_device.stop()
+    return capture_engine, list(csv.reader(io.StringIO(output_file.getvalue())))
+
+def assert_rows_match_device(fake_device, captured_rows):
+    for sample_number, captured_row in enumerate(captured_rows):
+        # Binary frames carry float32 values, ASCII lines six decimals
+        assert [float(value) for value in captured_row[1:4]] == pytest.approx(fake_device.sample_values(sample_number), rel=1e-6)
+    captured_markers = [(sample_number, int(captured_row[4])) for sample_number, captured_row in enumerate(captured_rows) if captured_row[4] != '0']
+    assert captured_markers == fake_device.markers_sent
+
+@pytest.mark.parametrize('binary_frames', [False, True])
+def test_capture_records_every_sample_and_marker(binary_frames):
+    fake_device = PtyFakeSensorDevice(sample_rate_hz=2000, max_samples=3000, binary_frames=binary_frames,
+                                      malformed_line_interval=None if binary_frames else 250)
+    capture_engine, captured_rows = run_capture(fake_device, marker_commands=[(0.3, b'b'), (0.4, b'e')])
+
+    assert len(captured_rows) == 3000 == capture_engine.counters.rows_written
+    assert [marker for _, marker in fake_device.markers_sent] == [1, 2]
+    assert_rows_match_device(fake_device, captured_rows)
+    assert capture_engine.dropped_lines == 0
+    assert capture_engine.ring_buffer.dropped_bytes == 0
+    if binary_frames:
+        assert capture_engine.counters.missing_frames == 0
+        assert capture_engine.counters.crc_errors == 0
+        assert capture_engine.counters.malformed_lines == 0
+    else:
+        assert fake_device.malformed_lines_sent == 12
+        assert capture_engine.counters.malformed_lines == BANNER_TEXT_LINES + fake_device.malformed_lines_sent
+        assert capture_engine.counters.info_lines == 2
+
+def test_ring_buffer_overflow_is_counted_not_silent():
+    fake_device = PtyFakeSensorDevice(sample_rate_hz=5000, max_samples=3000)
+    slow_consumer = lambda decoded_row: time.sleep(0.0005) # Keeps the writer behind the reader
+    capture_engine, captured_rows = run_capture(fake_device, SmallRingBufferConfig, slow_consumer)
+
+    assert capture_engine.ring_buffer.dropped_bytes > 0
+    assert capture_engine.dropped_lines > 0
+    assert len(captured_rows) == capture_engine.counters.rows_written < 3000
+    # Every line the device sent was either written, reported as malformed or counted as dropped
+    # (the empty banner line is only counted when it is dropped)
+    accounted_lines = len(captured_rows) + capture_engine.counters.malformed_lines + capture_engine.dropped_lines
+    assert 3000 + BANNER_TEXT_LINES <= accounted_lines <= 3000 + len(FakeDeviceConfig.BANNER_LINES)
+    # The rows that made it are intact samples, in order
+    captured_samples = [tuple(float(value) for value in captured_row[1:4]) for captured_row in captured_rows]
+    sent_samples = [fake_device.sample_values(sample_number) for sample_number in range(3000)]
+    sample_positions = [sent_samples.index(captured_sample) for captured_sample in captured_samples]
+    assert sample_positions == sorted(sample_positions)
@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+import numpy as np
+import pytest
+from numpy.lib.stride_tricks import sliding_window_view
+
+from conftest import REPO_ROOT, SCRIPTS_DIR
+from model_features import ModelFeatureConfig, compute_model_features
+from streaming_detector import RollingWindowFeatures, measure_streaming_equivalence
+
+FLAT_MODEL_PATH = os.path.join(REPO_ROOT, 'decision_tree_parametros', 'decision_tree_flat.npz')
+WINDOW_SAMPLES = ModelFeatureConfig.WINDOW_SAMPLES
+
+def synthetic_sample_stream(num_samples=1500, random_seed=3):
+    """Resting sensor (gravity offset, small noise) with shaking bursts, so both classes are exercised."""
+    rng = np.random.default_rng(random_seed)
+    shake_amplitude = np.where((np.arange(num_samples) // 200) % 3 == 1, 2.5, 0.05)
+    return np.array([10.2, 0.25, -2.2]) + rng.normal(0, 1, (num_samples, 3)) * shake_amplitude[:, None]
+
+@pytest.mark.parametrize('hop_samples', [1, 7, 25, 50])
+def test_streaming_detector_matches_batch_pipeline(hop_samples):
+    samples = synthetic_sample_stream()
+    equivalence = measure_streaming_equivalence(samples, hop_samples, FLAT_MODEL_PATH)
+
+    assert equivalence.windows_classified == (len(samples) - WINDOW_SAMPLES) // hop_samples + 1
+    assert equivalence.pipeline_windows == equivalence.windows_classified
+    assert equivalence.batch_deviation < 1e-9
+    assert equivalence.pipeline_deviation < 1e-9
+    assert equivalence.predictions_identical
+
+def test_rolling_features_stay_exact_across_resyncs():
+    samples = synthetic_sample_stream(num_samples=600)
+    rolling_features = RollingWindowFeatures(WINDOW_SAMPLES, resync_interval=37)
+    streamed_features = []
+    for ax, ay, az in samples.tolist():
+        rolling_features.push_sample(ax, ay, az)
+        if rolling_features.is_window_full:
+            streamed_features.append(rolling_features.feature_vector())
+
+    batch_features = compute_model_features(sliding_window_view(samples, WINDOW_SAMPLES, axis=0).transpose(0, 2, 1))
+    np.testing.assert_allclose(np.array(streamed_features), batch_features, rtol=1e-9, atol=1e-9)
+
+def test_collector_imports_detector_only_for_live_classification():
+    imported_modules = subprocess.run(
+        [sys.executable, '-c', "import sys, marker_data_collector; print('streaming_detector' in sys.modules, 'pandas' in sys.modules)"],
+        cwd=SCRIPTS_DIR, capture_output=True, text=True, check=True,
+    ).stdout.split()
+    assert imported_modules == ['False', 'False']
@@ -0,0 +1,37 @@
+import os
+import pickle
+import numpy as np
+from sklearn.tree import DecisionTreeClassifier
+
+from flat_tree import FlatDecisionTree
+from model_features import MODEL_FEATURE_NAMES, features_read_by_model
+from train_model_selection import fit_final_model
+
+FEATURE_SUBSET = [3, 5, 20, 29, 31]
+TREE_PARAMETERS = {'max_depth': 5, 'min_samples_leaf': 1, 'criterion': 'entropy', 'class_weight': 'balanced'}
+
+def write_training_matrix(matrix_dir, num_rows=3000, random_seed=0):
+    rng = np.random.default_rng(random_seed)
+    training_features = rng.normal(0, 1, (num_rows, len(MODEL_FEATURE_NAMES))).astype(np.float32)
+    # Equally good splits on two columns: which one the tree uses depends on the splitter's random feature order,
+    # so a tree fitted on another column layout than the search's would differ
+    training_features[:, 29] = training_features[:, 5]
+    training_labels = (training_features[:, 5] + training_features[:, 20] > 0).astype(np.int64) + (training_features[:, 31] > 1)
+    np.save(os.path.join(matrix_dir, 'train_features.npy'), training_features)
+    np.save(os.path.join(matrix_dir, 'train_labels.npy'), training_labels)
+    return training_features, training_labels
+
+def test_final_model_is_the_cross_validated_tree_over_all_features(tmp_path):
+    training_features, training_labels = write_training_matrix(tmp_path)
+    final_model = fit_final_model(str(tmp_path), FEATURE_SUBSET, TREE_PARAMETERS, random_seed=42)
+    # What a search worker fits: the subset's columns only
+    subset_model = DecisionTreeClassifier(random_state=42, **TREE_PARAMETERS).fit(training_features[:, FEATURE_SUBSET], training_labels)
+
+    test_rows = np.random.default_rng(1).normal(0, 1.5, (5000, len(MODEL_FEATURE_NAMES)))
+    subset_predictions = subset_model.predict(test_rows[:, FEATURE_SUBSET])
+    assert final_model.n_features_in_ == len(MODEL_FEATURE_NAMES)
+    assert final_model.tree_.node_count == subset_model.tree_.node_count
+    np.testing.assert_array_equal(final_model.predict(test_rows), subset_predictions)
+    np.testing.assert_array_equal(FlatDecisionTree.from_sklearn(final_model).predict(test_rows), subset_predictions)
+    np.testing.assert_array_equal(pickle.loads(pickle.dumps(final_model)).predict(test_rows), subset_predictions)
+    assert set(features_read_by_model(final_model).tolist()) <= set(FEATURE_SUBSET)
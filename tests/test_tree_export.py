@@ -0,0 +1,107 @@
+import os
+import shutil
+import subprocess
+import numpy as np
+import pytest
+from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeClassifier
+
+from flat_tree import FlatDecisionTree
+from model_features import (ModelFeatureConfig, MODEL_FEATURE_NAMES, compute_model_features, compute_selected_model_features,
+                            features_read_by_model, standardize_features)
+from tree_export import generate_c_model_header, verify_pruned_features
+
+WINDOW_SAMPLES = ModelFeatureConfig.WINDOW_SAMPLES
+# Statistics of every stream, including the two-pass ones (std/var) and the derived ones (ptp, energy)
+TRAINING_FEATURE_NAMES = ['std_accel_x', 'var_accel_y', 'mav_accel_z', 'min_accel_z', 'energy_svm', 'ptp_svm']
+
+C_DRIVER_SOURCE = r"""
+#include <cstdio>
+#include <cstdlib>
+#include <vector>
+#include "detector_model_generated.h"
+
+// Reads float32 windows (samples x ax/ay/az) and prints the prediction and the scaled features of each one
+int main(int argc, char** argv) {
+    FILE* window_file = fopen(argv[1], "rb");
+    const int window_count = atoi(argv[2]), window_samples = atoi(argv[3]);
+    std::vector<float> window(window_samples * 3), ax(window_samples), ay(window_samples), az(window_samples);
+    float scaled_features[DETECTOR_MODEL_FEATURE_COUNT];
+    for (int window_number = 0; window_number < window_count; window_number++) {
+        if (fread(window.data(), sizeof(float), window.size(), window_file) != window.size()) return 1;
+        for (int i = 0; i < window_samples; i++) {
+            ax[i] = window[3 * i]; ay[i] = window[3 * i + 1]; az[i] = window[3 * i + 2];
+        }
+        for (int j = 0; j < DETECTOR_MODEL_FEATURE_COUNT; j++) scaled_features[j] = 0.0f;
+        detector_compute_scaled_features(ax.data(), ay.data(), az.data(), window_samples, scaled_features);
+        printf("%d", detector_tree_predict(scaled_features));
+        for (int j = 0; j < DETECTOR_MODEL_FEATURE_COUNT; j++) printf(" %.9g", scaled_features[j]);
+        printf("\n");
+    }
+    fclose(window_file);
+    return 0;
+}
+"""
+
+def synthetic_labeled_windows(num_windows=3000, random_seed=7):
+    """Resting windows (label 0) and windows shaken along x, y or z (labels 1-3), with random gravity orientation."""
+    rng = np.random.default_rng(random_seed)
+    window_labels = rng.integers(0, 4, num_windows)
+    gravity_offsets = rng.normal(0, 1, (num_windows, 1, 3))
+    gravity_offsets *= 9.81 / np.linalg.norm(gravity_offsets, axis=2, keepdims=True)
+    shake_amplitudes = np.full((num_windows, 1, 3), 0.05)
+    for shaken_axis in range(3):
+        shaken_windows = window_labels == shaken_axis + 1
+        shake_amplitudes[shaken_windows, 0, shaken_axis] = rng.uniform(0.3, 3.0, np.count_nonzero(shaken_windows))
+    sample_windows = gravity_offsets + rng.normal(0, 1, (num_windows, WINDOW_SAMPLES, 3)) * shake_amplitudes
+    return sample_windows.astype(np.float32), window_labels
+
+@pytest.fixture(scope='module')
+def exported_model():
+    """A tree trained on a few features of different streams, its flat form and the scaler."""
+    sample_windows, window_labels = synthetic_labeled_windows()
+    feature_scaler = StandardScaler().fit(compute_model_features(sample_windows))
+    scaled_features = feature_scaler.transform(compute_model_features(sample_windows))
+    training_columns = [MODEL_FEATURE_NAMES.index(feature_name) for feature_name in TRAINING_FEATURE_NAMES]
+    scaled_features[:, np.setdiff1d(np.arange(len(MODEL_FEATURE_NAMES)), training_columns)] = 0.0
+    tree_model = DecisionTreeClassifier(max_depth=5, random_state=0).fit(scaled_features, window_labels)
+    return FlatDecisionTree.from_sklearn(tree_model), feature_scaler
+
+def test_tree_reads_features_of_several_streams(exported_model):
+    flat_tree, _ = exported_model
+    used_feature_names = [MODEL_FEATURE_NAMES[feature_index] for feature_index in features_read_by_model(flat_tree)]
+    assert len(used_feature_names) >= 3
+    assert len({feature_name.split('_', 1)[1] for feature_name in used_feature_names}) >= 3
+
+def test_pruned_features_predict_like_full_features(exported_model):
+    flat_tree, feature_scaler = exported_model
+    sample_windows, _ = synthetic_labeled_windows(num_windows=5000, random_seed=11)
+    used_features = features_read_by_model(flat_tree)
+
+    full_features = compute_model_features(sample_windows)
+    pruned_features = compute_selected_model_features(sample_windows, used_features)
+    np.testing.assert_array_equal(pruned_features[:, used_features], full_features[:, used_features])
+    full_predictions = flat_tree.predict(standardize_features(full_features, feature_scaler.mean_, feature_scaler.scale_))
+    pruned_predictions = flat_tree.predict(standardize_features(pruned_features, feature_scaler.mean_, feature_scaler.scale_))
+    np.testing.assert_array_equal(pruned_predictions, full_predictions)
+    assert verify_pruned_features(flat_tree, feature_scaler.mean_, feature_scaler.scale_, num_windows=5000) == 0
+
+@pytest.mark.skipif(shutil.which('g++') is None, reason="needs a C++ compiler")
+def test_generated_c_header_matches_python(exported_model, tmp_path):
+    flat_tree, feature_scaler = exported_model
+    (tmp_path / 'detector_model_generated.h').write_text(generate_c_model_header(flat_tree, feature_scaler.mean_, feature_scaler.scale_))
+    (tmp_path / 'detector_driver.cpp').write_text(C_DRIVER_SOURCE)
+    subprocess.run(['g++', '-O2', '-o', str(tmp_path / 'detector_driver'), str(tmp_path / 'detector_driver.cpp')], check=True)
+
+    sample_windows, _ = synthetic_labeled_windows(num_windows=2000, random_seed=13)
+    sample_windows.tofile(tmp_path / 'windows.bin')
+    driver_output = subprocess.run([str(tmp_path / 'detector_driver'), str(tmp_path / 'windows.bin'), str(len(sample_windows)), str(WINDOW_SAMPLES)],
+                                   capture_output=True, text=True, check=True).stdout
+    c_results = np.loadtxt(driver_output.splitlines(), ndmin=2)
+
+    used_features = features_read_by_model(flat_tree)
+    python_features = standardize_features(compute_model_features(sample_windows), feature_scaler.mean_, feature_scaler.scale_)
+    np.testing.assert_allclose(c_results[:, 1:][:, used_features], python_features[:, used_features], rtol=1e-4, atol=1e-4)
+    unused_features = np.setdiff1d(np.arange(len(MODEL_FEATURE_NAMES)), used_features)
+    assert not c_results[:, 1:][:, unused_features].any() # The C code writes only the features the tree reads
+    np.testing.assert_array_equal(c_results[:, 0].astype(int), flat_tree.predict(python_features))